@@ -4,6 +4,7 @@ import pandas as pd
 import numpy as np
 import os
 import akshare as ak
+from stock_universe import to_symbol
 
 # ==========================================
 # 📍 路径补丁
@@ -96,7 +97,7 @@ class AIFilter:
 
         try:
             # 1. 构造代码
-            sina_symbol = f"sh{code}" if code.startswith('6') else f"sz{code}"
+            sina_symbol = to_symbol(code)
 
             # 2. 实时拉取 (预测必须用最新的)
             df = ak.stock_zh_a_daily(symbol=sina_symbol, adjust="qfq")
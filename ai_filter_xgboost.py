@@ -4,6 +4,7 @@ import pandas as pd
 import numpy as np
 import joblib
 import akshare as ak
+from stock_universe import to_symbol
 import warnings
 
 # 忽略 xgboost 版本警告
@@ -44,7 +45,7 @@ class AIFilter:
 
         try:
             # 1. 构造代码
-            sina_symbol = f"sh{code}" if code.startswith('6') else f"sz{code}"
+            sina_symbol = to_symbol(code)
 
             # 2. 实时拉取 (AKShare)
             # 注意：盘中实时数据可能不够30天，所以最好拉取日线历史
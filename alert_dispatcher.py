@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import json
+import time
+import queue
+import socket
+import shutil
+import threading
+import subprocess
+import urllib.request
+from datetime import datetime
+
+# ==========================================
+# 🔔 报警分发
+# 雷达只负责把触发的票丢进有界队列 (不阻塞轮询)，由唯一的分发线程:
+#   1. 攒 COALESCE_WINDOW 秒内陆续到达的报警合成一批 (同一只票只留最新一条)
+#   2. 依次交给各个出口: 终端 / 日志文件 / 本地 webhook / Unix socket / 桌面弹窗 (有桌面才开)
+#   3. 记录 "行情时间 -> 分发" 和 "发现 -> 分发" 两段延迟
+# 任一出口出错只影响它自己，不影响其他出口和雷达主循环。
+# ==========================================
+QUEUE_SIZE = 256  # 队列满了丢报警并计数，绝不阻塞雷达
+COALESCE_WINDOW = 0.2  # 秒；雷达一轮的触发本来就是一批，这里只合并紧挨着到达的
+ALERT_LOG = "radar_alerts.log"
+WEBHOOK_URL = None  # 例如 "http://127.0.0.1:9310/alert"，None = 不推
+ALERT_SOCKET = "/tmp/nrebound_alerts.sock"  # Unix 数据报 socket，没人监听就跳过 (Windows 不支持)
+DESKTOP = True  # 有桌面环境时弹窗/系统通知
+
+
+# ==========================================
+# 🚪 出口 (都实现 send(title, lines, alerts))
+# ==========================================
+class ConsoleSink:
+    def send(self, title, lines, alerts):
+        print(f"\n🔥 {title}")
+        for line in lines:
+            print(f"   {line}")
+
+
+class LogSink:
+    def __init__(self, path=ALERT_LOG):
+        self.path = path
+
+    def send(self, title, lines, alerts):
+        stamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(f"[{stamp}] {title}\n")
+            f.writelines(f"[{stamp}]    {line}\n" for line in lines)
+
+
+class WebhookSink:
+    """POST JSON 到本地 webhook (绕过代理)"""
+
+    def __init__(self, url=WEBHOOK_URL, timeout=2):
+        self.url = url
+        self.timeout = timeout
+        self._opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+
+    def send(self, title, lines, alerts):
+        body = json.dumps({"title": title, "lines": lines, "alerts": alerts}, ensure_ascii=False).encode("utf-8")
+        req = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+        self._opener.open(req, timeout=self.timeout).close()
+
+
+class UnixSocketSink:
+    """往 Unix 数据报 socket 丢一条 JSON；对面没在听就算了"""
+
+    def __init__(self, path=ALERT_SOCKET):
+        self.path = path
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+
+    def send(self, title, lines, alerts):
+        body = json.dumps({"title": title, "lines": lines, "alerts": alerts}, ensure_ascii=False).encode("utf-8")
+        try:
+            self.sock.sendto(body, self.path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            pass
+
+
+class DesktopSink:
+    """
+    Windows: 一个常驻的 Tk 线程，每批报警开一个置顶小窗 + 蜂鸣；
+    Linux  : 有 notify-send 就发系统通知。
+    """
+
+    def __init__(self):
+        self._queue = None
+        if os.name == "nt":
+            self._queue = queue.Queue()
+            threading.Thread(target=self._tk_loop, name="alert-desktop", daemon=True).start()
+
+    @staticmethod
+    def available():
+        if os.name == "nt":
+            return True
+        return bool(os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY")) and shutil.which("notify-send")
+
+    def send(self, title, lines, alerts):
+        if self._queue is not None:
+            self._queue.put((title, lines, bool(alerts)))
+        else:
+            subprocess.Popen(["notify-send", title, "\n".join(lines)],
+                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def _tk_loop(self):
+        import tkinter as tk
+        import winsound
+        root = tk.Tk()
+        root.withdraw()
+
+        def popup(title, lines, beep):
+            top = tk.Toplevel(root)
+            top.title(title)
+            top.configure(bg='#ffcccc')
+            top.attributes("-topmost", True)
+            height = min(100 + len(lines) * 30, 600)
+            w, h = top.winfo_screenwidth(), top.winfo_screenheight()
+            top.geometry(f"400x{height}+{(w - 400) // 2}+{(h - height) // 2}")
+            tk.Label(top, text=title, font=("微软雅黑", 14, "bold"), bg='#ffcccc', fg='red').pack(pady=10)
+            frame = tk.Frame(top, bg='white')
+            frame.pack(fill='both', expand=True, padx=10, pady=5)
+            for line in lines:
+                tk.Label(frame, text=line, font=("Consolas", 12, "bold"), bg='white', fg='red').pack(anchor='w')
+            tk.Button(top, text="朕已阅 (关闭)", command=top.destroy, font=("微软雅黑", 10), height=2).pack(pady=10,
+                                                                                                            fill='x')
+            if beep:
+                winsound.MessageBeep()  # 异步，不卡 UI 线程
+            else:
+                top.after(2000, top.destroy)
+
+        def poll():
+            while True:
+                try:
+                    popup(*self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            root.after(200, poll)
+
+        poll()
+        root.mainloop()
+
+
+def default_sinks():
+    sinks = [ConsoleSink(), LogSink()]
+    if WEBHOOK_URL:
+        sinks.append(WebhookSink())
+    if ALERT_SOCKET and hasattr(socket, "AF_UNIX") and os.name == "posix":
+        sinks.append(UnixSocketSink())
+    if DESKTOP and DesktopSink.available():
+        sinks.append(DesktopSink())
+    return sinks
+
+
+# ==========================================
+# 📮 分发器
+# ==========================================
+def format_batch(alerts):
+    title = f"N字异动 ({len(alerts)}只)"
+    lines = [f"{a['code']}   {a['name']}   +{a['pct']}%" for a in alerts]
+    return title, lines
+
+
+class AlertDispatcher:
+    """
+    submit(alerts): 雷达线程调用，非阻塞。alerts 里每条可带
+        quote_ts : 行情本身的时间戳 (新浪的日期+时间)
+        detect_ts: 雷达发现它的时刻
+    metrics: LoopMetrics，记录 alert_quote_to_dispatch / alert_detect_to_dispatch 两段延迟
+    """
+
+    def __init__(self, sinks=None, window=COALESCE_WINDOW, maxsize=QUEUE_SIZE, metrics=None):
+        self.sinks = default_sinks() if sinks is None else sinks
+        self.window = window
+        self.metrics = metrics
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+        self.dispatched = 0
+        self.sink_errors = 0
+        self._thread = threading.Thread(target=self._run, name="alert-dispatcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, alerts):
+        for a in alerts:
+            try:
+                self.queue.put_nowait(a)
+            except queue.Full:
+                self.dropped += 1
+
+    def notice(self, text):
+        """非报警的提示 (比如雷达停止)，同样走各个出口"""
+        try:
+            self.queue.put_nowait(("notice", text))
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout=5):
+        self.queue.put(None)
+        self._thread.join(timeout=timeout)
+
+    # --- 分发线程 ---
+    def _emit(self, title, lines, alerts):
+        for sink in self.sinks:
+            try:
+                sink.send(title, lines, alerts)
+            except Exception as e:
+                self.sink_errors += 1
+                print(f"\n[!] 报警出口 {type(sink).__name__} 失败: {e}", file=sys.stderr)
+
+    def _dispatch(self, batch):
+        alerts = sorted(batch.values(), key=lambda a: a['pct'], reverse=True)
+        self._emit(*format_batch(alerts), alerts)
+        now = time.time()
+        self.dispatched += len(alerts)
+        if self.metrics is not None:
+            for a in alerts:
+                if a.get('quote_ts'):
+                    self.metrics.observe("alert_quote_to_dispatch", max(now - a['quote_ts'], 0))
+                if a.get('detect_ts'):
+                    self.metrics.observe("alert_detect_to_dispatch", max(now - a['detect_ts'], 0))
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            stop = item is None
+            batch = {}
+            deadline = time.monotonic() + self.window
+            while item is not None:
+                if isinstance(item, tuple):  # notice: 单独发，不和报警合并
+                    self._emit(item[1], [], [])
+                else:
+                    batch[item['code']] = item  # 同一只票只留最新
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                stop = stop or item is None
+            if batch:
+                self._dispatch(batch)
+            if stop:
+                return
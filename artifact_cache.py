@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import time
+import shutil
+import hashlib
+
+# ==========================================
+# 📍 路径防走丢
+# ==========================================
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+# ==========================================
+# 🗄️ 中间产物缓存 (打标结果 / 特征矩阵 / 模型)
+# 每份产物按 (种类, 参数, 输入数据版本) 算哈希，存到 artifact_cache/<哈希>/ 下；
+# 切回用过的参数组合直接命中，不用重算。总大小超过 MAX_BYTES 时按最近使用时间淘汰。
+# 工作目录里的 n_rebound_dataset.csv / n_rebound_xgb.model 仍是 "当前在用" 的那份，
+# 缓存只负责存档和还原。
+# ==========================================
+CACHE_DIR = "artifact_cache"
+INDEX_FILE = "index.json"
+MAX_BYTES = 2 * 1024 ** 3  # 2 GB
+
+
+def artifact_key(kind, params, version=""):
+    blob = json.dumps({"kind": kind, "params": params, "version": version}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+
+def dir_version(path):
+    """目录版本: 各文件 名字+大小+修改时间 (K线库几千个文件，逐个读内容太慢)"""
+    h = hashlib.md5()
+    if os.path.isdir(path):
+        with os.scandir(path) as it:
+            for e in sorted(it, key=lambda e: e.name):
+                if e.is_file():
+                    st = e.stat()
+                    h.update(f"{e.name}:{st.st_size}:{st.st_mtime_ns};".encode())
+    return h.hexdigest()
+
+
+def file_md5(path):
+    h = hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class ArtifactCache:
+    def __init__(self, root=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+        self.index_path = os.path.join(root, INDEX_FILE)
+        self.index = self._load_index()
+
+    def _load_index(self):
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                pass
+        return {}
+
+    def _save_index(self):
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.index, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.index_path)
+
+    def _dir(self, key):
+        return os.path.join(self.root, key)
+
+    # --- 查询 ---
+    def get(self, kind, params, version=""):
+        """命中返回产物目录 (里面是 put 时存进去的文件)，否则 None"""
+        key = artifact_key(kind, params, version)
+        entry = self.index.get(key)
+        if entry is None or not os.path.isdir(self._dir(key)):
+            return None
+        entry["last_used"] = time.time()
+        self._save_index()
+        return self._dir(key)
+
+    def latest(self, kind, params):
+        """同种类、同参数下最近一次的产物目录 (不管输入版本)，用作增量计算的起点"""
+        hits = [(e["created"], k) for k, e in self.index.items()
+                if e["kind"] == kind and e["params"] == params and os.path.isdir(self._dir(k))]
+        if not hits:
+            return None
+        key = max(hits)[1]
+        self.index[key]["last_used"] = time.time()
+        self._save_index()
+        return self._dir(key)
+
+    # --- 写入 ---
+    def put(self, kind, params, version, files, meta=None):
+        """files: {存档文件名: 源路径}。先拷到临时目录再整体改名，写一半崩了不会留下半份产物"""
+        key = artifact_key(kind, params, version)
+        final = self._dir(key)
+        tmp = final + ".tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        size = 0
+        for name, src in files.items():
+            shutil.copyfile(src, os.path.join(tmp, name))
+            size += os.path.getsize(src)
+        if meta is not None:
+            with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False, indent=1)
+        shutil.rmtree(final, ignore_errors=True)
+        os.replace(tmp, final)
+        now = time.time()
+        self.index[key] = {"kind": kind, "params": params, "version": version, "size": size,
+                           "created": now, "last_used": now}
+        self.evict(keep=key)
+        self._save_index()
+        return final
+
+    def evict(self, keep=None):
+        """总大小超限时，按最近使用时间从旧到新删"""
+        total = sum(e["size"] for e in self.index.values())
+        for key, entry in sorted(self.index.items(), key=lambda kv: kv[1]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(self._dir(key), ignore_errors=True)
+            total -= entry["size"]
+            del self.index[key]
+            print(f"🧹 淘汰缓存产物: {entry['kind']} {key[:10]} ({entry['size'] / 1024 ** 2:.1f} MB)")
+
+    def summary(self):
+        by_kind = {}
+        for e in self.index.values():
+            n, size = by_kind.get(e["kind"], (0, 0))
+            by_kind[e["kind"]] = (n + 1, size + e["size"])
+        return by_kind
+
+
+def restore(src_dir, name, dest):
+    """把缓存里的文件还原到工作目录 (先写临时文件再改名)"""
+    shutil.copyfile(os.path.join(src_dir, name), dest + ".tmp")
+    os.replace(dest + ".tmp", dest)
+
+
+def read_meta(src_dir):
+    path = os.path.join(src_dir, "meta.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    cache = ArtifactCache()
+    total = 0
+    for kind, (n, size) in sorted(cache.summary().items()):
+        print(f"{kind:>10}: {n} 份, {size / 1024 ** 2:.1f} MB")
+        total += size
+    print(f"合计 {total / 1024 ** 2:.1f} MB / 上限 {cache.max_bytes / 1024 ** 3:.1f} GB")
@@ -4,6 +4,8 @@ import sys
 import time
 import subprocess
 from datetime import datetime
+import nrebound_service
+import pipeline
 
 # ==========================================
 # 📍 路径防走丢补丁
@@ -32,31 +34,21 @@ def log(msg):
 
 
 def run_task():
-    """执行选股任务"""
-    log("⏰ 时间已到，开始执行【自动选股】任务...")
-
-    # 调用 night_screener.py
-    # 强制使用 python.exe (有窗口模式下可以看到进度，但后台模式下我们需要捕获输出)
-    cmd = [sys.executable, "night_screener.py"]
+    """执行夜间流水线 (采集 -> 事件索引/面板 -> 打标 -> 训练 -> 选股)，已是最新的阶段自动跳过"""
+    log("⏰ 时间已到，开始执行【夜间流水线】...")
 
+    # 选股阶段优先交给常驻服务 (模型、名单都是热的)；服务起不来流水线自己起子进程
+    nrebound_service.ensure_service()
     try:
-        # 使用 gbk 解码防止中文系统崩溃
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            encoding='gbk',
-            errors='replace'
-        )
-
-        if result.returncode == 0:
-            log("✅ 自动选股成功！Excel文件已生成。")
+        results = pipeline.run()
+        failed = [k for k, v in results.items() if v in ("failed", "blocked")]
+        summary = ", ".join(f"{k}={v}" for k, v in sorted(results.items()))
+        if failed:
+            log(f"❌ 流水线有阶段失败 (日志见 {pipeline.LOG_DIR}/): {summary}")
         else:
-            log("❌ 自动选股失败！错误信息如下：")
-            log(result.stderr)
-
+            log(f"✅ 流水线完成: {summary}")
     except Exception as e:
-        log(f"❌ 启动脚本失败: {e}")
+        log(f"❌ 流水线启动失败: {e}")
 
 
 def main():
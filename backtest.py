@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+from price_panel import load_panel
+from trade_rules import (INIT_CASH, SINGLE_POS_CASH, TAKE_PROFIT, STOP_LOSS, MAX_HOLD_DAYS, AI_COEFF,
+                         BUY_THRESHOLD, DEFAULT_SCORE, TRIGGER_PCT, SKIP_HIGH_OPEN)  # 与 paper_bot 同一份规则
+
+# ==========================================
+# 📍 路径防走丢
+# ==========================================
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+# ==========================================
+# ⚙️ 回测输入/输出 (交易规则见 trade_rules.py)
+# ==========================================
+SIGNAL_FILE = "screener_asof.parquet"  # 候选名单: screener_replay 回放出的每日历史名单
+FALLBACK_SIGNAL_FILE = "n_rebound_dataset.csv"  # 没有回放结果时退回打标样本表
+TRADES_FILE = "backtest_trades.csv"
+EQUITY_FILE = "backtest_equity.csv"
+
+REASON_TP, REASON_SL, REASON_EXPIRE = 1, 2, 3
+REASON_TEXT = {REASON_TP: "止盈", REASON_SL: "止损", REASON_EXPIRE: "时间到期"}
+
+
+def load_signals(path=SIGNAL_FILE):
+    """
+    读取候选名单，统一成 [date, code, score]。
+    date 是"选股日" (收盘后出名单)，回测在下一个交易日按盘中规则尝试买入。
+    """
+    if path.endswith(".parquet"):
+        df = pd.read_parquet(path)
+        df["code"] = df["code"].astype(str)
+    else:
+        df = pd.read_csv(path, dtype={"code": str, "代码": str})
+    df = df.rename(columns={"代码": "code", "buy_date": "date", "最新日期": "date", "日期": "date"})
+    df["code"] = df["code"].str.zfill(6)
+    df["date"] = pd.to_datetime(df["date"])
+    if "score" not in df.columns:
+        df["score"] = DEFAULT_SCORE
+    return df[["date", "code", "score"]]
+
+
+def _signal_schedule(panel, signals):
+    """把名单映射成 {交易日下标: (股票下标数组, 评分数组)}，同一天按评分从高到低"""
+    sig = signals.copy()
+    sig["col"] = sig["code"].map(panel.code_pos)
+    sig = sig.dropna(subset=["col"])
+    # 名单日之后的第一个交易日才开始交易
+    sig["t"] = np.searchsorted(panel.dates, sig["date"].values.astype("datetime64[D]"), side="right")
+    sig = sig[sig["t"] < len(panel.dates)]
+    sig = sig.sort_values(by=["t", "score"], ascending=[True, False]).drop_duplicates(subset=["t", "col"])
+
+    schedule = {}
+    for t, g in sig.groupby("t"):
+        schedule[int(t)] = (g["col"].values.astype(np.int64), g["score"].values.astype(np.float64))
+    return schedule
+
+
+def run_backtest(panel, signals, start=None, end=None, take_profit=TAKE_PROFIT, stop_loss=STOP_LOSS,
+                 max_hold_days=MAX_HOLD_DAYS, buy_threshold=BUY_THRESHOLD, verbose=True):
+    """
+    用数组状态逐日回放 paper_bot 的规则:
+      - 买入: 次日盘中涨幅进入 [TRIGGER_PCT, SKIP_HIGH_OPEN] 且 评分×AI_COEFF >= 阈值
+      - 资金: 已用成本 + SINGLE_POS_CASH 不能超过 INIT_CASH；按整手买入，至少 1 手
+      - 卖出: T+1 锁仓；开盘先判止盈/止损/到期，盘中先判止损再判止盈 (保守)
+    返回 (trades DataFrame, equity DataFrame, stats dict)
+    """
+    t0 = time.time()
+    o, h, l, c = panel.open, panel.high, panel.low, panel.close
+    pc, c_ff = panel.prev_close, panel.close_ff
+
+    t_start = 0 if start is None else panel.date_index(start)
+    t_end = len(panel.dates) if end is None else panel.date_index(end, side="right")
+    schedule = _signal_schedule(panel, signals)
+
+    # --- 持仓槽位 (定长数组代替 DataFrame) ---
+    cap = 2 * INIT_CASH // SINGLE_POS_CASH + 8
+    slot_col = np.full(cap, -1, dtype=np.int64)
+    slot_t = np.zeros(cap, dtype=np.int64)
+    slot_price = np.zeros(cap)
+    slot_amount = np.zeros(cap)
+    slot_cost = np.zeros(cap)
+    slot_score = np.zeros(cap)
+
+    cash = float(INIT_CASH)
+    trade_rows = []
+    eq_dates, eq_cash, eq_mv, eq_pos = [], [], [], []
+
+    for t in range(t_start, t_end):
+        # ---------- 1. 卖出 ----------
+        held = np.flatnonzero((slot_col >= 0) & (slot_t < t))  # T+1: 当天买的不卖
+        if len(held):
+            cols = slot_col[held]
+            bp = slot_price[held]
+            to, th, tl = o[t, cols], h[t, cols], l[t, cols]
+            tradable = ~np.isnan(to)
+            tp_price, sl_price = bp * (1 + take_profit), bp * (1 + stop_loss)
+            hold_days = t - slot_t[held]  # 面板的行就是交易日，行号差 = 持有交易日数
+
+            reason = np.zeros(len(held), dtype=np.int8)
+            price = np.zeros(len(held))
+            # 开盘第一轮检查 (跳空直接按开盘价成交)
+            m = tradable & (to >= tp_price)
+            reason[m], price[m] = REASON_TP, to[m]
+            m = tradable & (reason == 0) & (to <= sl_price)
+            reason[m], price[m] = REASON_SL, to[m]
+            m = tradable & (reason == 0) & (hold_days >= max_hold_days)
+            reason[m], price[m] = REASON_EXPIRE, to[m]
+            # 盘中: 先止损后止盈
+            m = tradable & (reason == 0) & (tl <= sl_price)
+            reason[m], price[m] = REASON_SL, sl_price[m]
+            m = tradable & (reason == 0) & (th >= tp_price)
+            reason[m], price[m] = REASON_TP, tp_price[m]
+
+            for k in np.flatnonzero(reason):
+                s = held[k]
+                proceeds = price[k] * slot_amount[s]
+                pnl = proceeds - slot_cost[s]
+                cash += proceeds
+                trade_rows.append((panel.codes[slot_col[s]], panel.dates[slot_t[s]], slot_price[s],
+                                   panel.dates[t], price[k], slot_amount[s], pnl, pnl / slot_cost[s] * 100,
+                                   REASON_TEXT[int(reason[k])], slot_score[s], int(hold_days[k])))
+                slot_col[s] = -1
+
+        # ---------- 2. 买入 ----------
+        if t in schedule:
+            cols, scores = schedule[t]
+            p_close = pc[t, cols]
+            lo = p_close * (1 + TRIGGER_PCT / 100)
+            hi = p_close * (1 + SKIP_HIGH_OPEN / 100)
+            to, th, tl = o[t, cols], h[t, cols], l[t, cols]
+            touched = (th >= lo) & (tl <= hi) & ~np.isnan(to)
+            passed = (scores / 100.0) * AI_COEFF >= buy_threshold
+            fill = np.clip(to, lo, hi)  # 开盘在窗口内按开盘价，否则按穿越窗口的价格
+
+            for k in np.flatnonzero(touched & passed):
+                col = cols[k]
+                active = slot_col >= 0
+                if (slot_col[active] == col).any():
+                    continue
+                if slot_cost[active].sum() + SINGLE_POS_CASH > INIT_CASH:
+                    break  # 资金不足，后面的也买不了
+                free = np.flatnonzero(~active)
+                if len(free) == 0:
+                    break
+                price = float(fill[k])
+                shares = int(SINGLE_POS_CASH / price / 100) * 100
+                if shares == 0: shares = 100
+                s = free[0]
+                slot_col[s], slot_t[s], slot_price[s] = col, t, price
+                slot_amount[s], slot_cost[s], slot_score[s] = shares, shares * price, scores[k]
+                cash -= shares * price
+
+        # ---------- 3. 记账 ----------
+        active = slot_col >= 0
+        mv = float(np.nansum(c_ff[t, slot_col[active]] * slot_amount[active])) if active.any() else 0.0
+        eq_dates.append(panel.dates[t])
+        eq_cash.append(cash)
+        eq_mv.append(mv)
+        eq_pos.append(int(active.sum()))
+
+    trades = pd.DataFrame(trade_rows, columns=["code", "buy_date", "buy_price", "sell_date", "sell_price", "amount",
+                                               "pnl", "pnl_pct", "reason", "score", "hold_days"])
+    equity = pd.DataFrame({"date": eq_dates, "cash": eq_cash, "market_value": eq_mv, "positions": eq_pos})
+    equity["equity"] = equity["cash"] + equity["market_value"]
+
+    stats = summarize(trades, equity)
+    stats["seconds"] = round(time.time() - t0, 2)
+    if verbose:
+        print_stats(stats)
+    return trades, equity, stats
+
+
+def summarize(trades, equity):
+    """汇总统计"""
+    stats = {"trades": len(trades)}
+    if len(equity):
+        eq = equity["equity"].values
+        peak = np.maximum.accumulate(eq)
+        days = max(len(eq), 1)
+        daily_ret = np.diff(eq) / eq[:-1] if len(eq) > 1 else np.array([0.0])
+        stats.update({
+            "final_equity": float(eq[-1]),
+            "total_return_pct": float((eq[-1] / INIT_CASH - 1) * 100),
+            "annual_return_pct": float(((eq[-1] / INIT_CASH) ** (250 / days) - 1) * 100),
+            "max_drawdown_pct": float(((eq - peak) / peak).min() * 100),
+            "sharpe": float(daily_ret.mean() / (daily_ret.std() + 1e-12) * np.sqrt(250)),
+        })
+    if len(trades):
+        stats.update({
+            "win_rate_pct": float((trades["pnl"] > 0).mean() * 100),
+            "avg_pnl_pct": float(trades["pnl_pct"].mean()),
+            "total_pnl": float(trades["pnl"].sum()),
+            "avg_hold_days": float(trades["hold_days"].mean()),
+        })
+    return stats
+
+
+def print_stats(stats):
+    print("\n" + "=" * 40)
+    print("       📉 paper_bot 规则回测报告")
+    print("=" * 40)
+    print(f"🛒 成交笔数: {stats.get('trades', 0)}")
+    if "win_rate_pct" in stats:
+        print(f"🏆 胜率: {stats['win_rate_pct']:.2f}% | 平均单笔: {stats['avg_pnl_pct']:+.2f}%")
+    if "final_equity" in stats:
+        print(f"💰 期末权益: {stats['final_equity']:,.2f} 元 ({stats['total_return_pct']:+.2f}%)")
+        print(f"📈 年化: {stats['annual_return_pct']:+.2f}% | 最大回撤: {stats['max_drawdown_pct']:.2f}% "
+              f"| 夏普: {stats['sharpe']:.2f}")
+    print(f"⏱️ 回测耗时: {stats.get('seconds', 0)} 秒")
+    print("-" * 40)
+
+
+def main():
+    signal_file = sys.argv[1] if len(sys.argv) > 1 else SIGNAL_FILE
+    if len(sys.argv) <= 1 and not os.path.exists(signal_file):
+        print(f"⚠️ 未找到 {SIGNAL_FILE} (先运行 screener_replay.py)，改用 {FALLBACK_SIGNAL_FILE}")
+        signal_file = FALLBACK_SIGNAL_FILE
+    if not os.path.exists(signal_file):
+        print(f"❌ 找不到候选名单: {signal_file}")
+        return
+
+    panel = load_panel()
+    signals = load_signals(signal_file)
+    print(f"📋 候选信号: {len(signals)} 条 | 面板: {panel.shape[0]} 天 × {panel.shape[1]} 只")
+
+    trades, equity, _ = run_backtest(panel, signals)
+    trades.to_csv(TRADES_FILE, index=False, encoding='utf_8_sig')
+    equity.to_csv(EQUITY_FILE, index=False, encoding='utf_8_sig')
+    print(f"💾 成交明细: {os.path.abspath(TRADES_FILE)}")
+    print(f"💾 权益曲线: {os.path.abspath(EQUITY_FILE)}")
+
+
+if __name__ == "__main__":
+    main()
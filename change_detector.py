@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+# ==========================================
+# 🔁 行情变化检测
+# 新浪同一笔成交会被连续轮询到好几次 (午盘尤其安静)，
+# 按 (日期, 时间, 价格) 和上一次比，只把变了的票交给下游 (卖出/买入判断、报警、录像)。
+# ==========================================
+
+
+def quote_key(q):
+    return q.get('date', ''), q.get('time', ''), q['price']
+
+
+class ChangeDetector:
+    def __init__(self):
+        self.last = {}  # 代码 -> 上次的 (日期, 时间, 价格)
+        self.seen = 0
+        self.changed = 0
+
+    def diff(self, quotes):
+        """返回 quotes 里相对上一次有变化的部分 {代码: 行情}"""
+        out = {}
+        last = self.last
+        for code, q in quotes.items():
+            key = quote_key(q)
+            if last.get(code) != key:
+                last[code] = key
+                out[code] = q
+        self.seen += len(quotes)
+        self.changed += len(out)
+        return out
+
+    def reset(self):
+        """新的交易日重新开始 (第一轮所有票都算变化)"""
+        self.last.clear()
+
+    def dropped_ratio(self):
+        return 1 - self.changed / self.seen if self.seen else 0.0
@@ -5,6 +5,8 @@ import pandas as pd
 import akshare as ak
 from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from stock_universe import get_universe
+from pipeline import last_close_day
 
 # ==========================================
 # 📍 路径防走丢补丁
@@ -24,40 +26,49 @@ os.environ["https_proxy"] = f"http://127.0.0.1:{PROXY_PORT}"
 DATA_DIR = "training_data"
 START_DATE = "2020-01-01"  # 👈 只要2020年以后的 (新浪返回格式是 YYYY-MM-DD)
 MAX_WORKERS = 8  # 新浪接口快，可以开 8 线程
-OVERWRITE = False  # False = 跳过已存在的 (断点续传)
+OVERWRITE = False  # False = 跳过已经更新到最近收盘日的 (断点续传)，没跟上的重新拉
 
 if not os.path.exists(DATA_DIR):
     os.makedirs(DATA_DIR)
 
 
 def get_stock_list():
-    """获取全市场名单"""
+    """获取全市场名单 (股票池每天只拉一次，去掉退市整理)"""
     print("[*] 正在获取全市场股票名单...")
-    try:
-        df = ak.stock_info_a_code_name()
-        df = df[~df['name'].str.contains("退")]
-        return df
-    except Exception as e:
-        print(f"[!] 名单获取失败: {e}")
+    universe = get_universe()
+    if universe is None:
+        print("[!] 名单获取失败")
         return pd.DataFrame()
+    return universe.tradable(exclude_st=False)
+
+
+def last_bar_date(file_path):
+    """只读文件尾部，取最后一根K线的日期 (YYYY-MM-DD)；读不出来返回空串"""
+    try:
+        with open(file_path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(f.tell() - 512, 0))
+            lines = f.read().decode("utf-8", errors="ignore").strip().splitlines()
+        return lines[-1].split(",", 1)[0][:10] if lines else ""
+    except OSError:
+        return ""
 
 
-def fetch_history_data_sina(row):
+def fetch_history_data_sina(row, until=None):
     pure_code = row['code']
     name = row['name']
     file_path = os.path.join(DATA_DIR, f"{pure_code}.csv")
 
     # --- 断点续传 ---
+    # 已经有最近收盘日K线的跳过；旧文件整份重拉 (前复权会重算历史价格，不能只往后接)。
+    # 停牌的票拉回来也没有当天K线，重写后文件时间晚于收盘，事件索引据此认定它不缺数据
     if not OVERWRITE and os.path.exists(file_path):
-        if os.path.getsize(file_path) > 100:
+        if os.path.getsize(file_path) > 100 and (until is None or last_bar_date(file_path) >= until):
             return "SKIP"
 
     try:
-        # 1. 构造新浪需要的代码格式 (sh60xxxx, sz00xxxx)
-        if pure_code.startswith('6'):
-            sina_symbol = f"sh{pure_code}"
-        else:
-            sina_symbol = f"sz{pure_code}"
+        # 1. 新浪需要的代码格式 (sh60xxxx, sz00xxxx, bj8xxxxx)，股票池里已经算好
+        sina_symbol = row['symbol']
 
         # 2. 调用新浪接口 (adjust="qfq" 前复权)
         # 注意：新浪接口通常忽略 start_date，直接返回全量历史
@@ -101,6 +112,8 @@ def main():
 
     target_stocks = stocks
     total = len(target_stocks)
+    day = last_close_day()
+    until = f"{day[:4]}-{day[4:6]}-{day[6:]}"  # 新浪日期格式
 
     print(f"[*] 任务列表: {total} 只股票")
     print("[*] 正在全速采集 (新浪接口较快)...")
@@ -110,7 +123,7 @@ def main():
     failed = 0
 
     with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = {executor.submit(fetch_history_data_sina, row): row['code'] for _, row in target_stocks.iterrows()}
+        futures = {executor.submit(fetch_history_data_sina, row, until): row['code'] for _, row in target_stocks.iterrows()}
 
         count = 0
         for future in as_completed(futures):
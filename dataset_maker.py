@@ -1,9 +1,13 @@
 # -*- coding: utf-8 -*-
 import os
+import sys
+import json
 import pandas as pd
 import numpy as np
 from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from event_index import EventIndex, bars_fingerprint
+from artifact_cache import ArtifactCache, dir_version, restore
 
 # ==========================================
 # 📍 路径防走丢补丁
@@ -13,19 +17,66 @@ os.chdir(os.path.dirname(os.path.abspath(__file__)))
 # --- ⚙️ 配置 ---
 RAW_DATA_DIR = "training_data"
 OUTPUT_FILE = "n_rebound_dataset.csv"  # 结果文件
+STATE_FILE = "dataset_state.json"  # 增量水位线 (每只股票处理到哪一行 + 内容指纹)
+CACHE_KIND = "labels"  # 打标结果 + 水位线按 label_params() 存进产物缓存，切回旧参数不用重算
+INCREMENTAL = "--full" not in sys.argv  # 默认增量；加 --full 强制全量重建
 
 # 策略定义
 LOOKBACK_WINDOW = 30  # 回看30天形态
 FORWARD_WINDOW = 5  # 前瞻5天定胜负
 TARGET_PROFIT = 5.0  # 5天内涨超5%算赢
 STOP_LOSS = -5.0  # 5天内跌超5%算输
+CHECK_DAYS = 2  # 涨停后考察几天 (T+1, T+2)
+TAIL_GUARD = 5  # 末尾预留的安全天数
 
 
-def process_single_stock(file_path):
+def label_params():
+    """影响打标结果的参数；变了就换一套缓存 (缓存里有这套参数的旧结果就从它续跑增量，没有才全量)"""
+    return {
+        "LOOKBACK_WINDOW": LOOKBACK_WINDOW, "FORWARD_WINDOW": FORWARD_WINDOW,
+        "TARGET_PROFIT": TARGET_PROFIT, "STOP_LOSS": STOP_LOSS,
+        "CHECK_DAYS": CHECK_DAYS, "TAIL_GUARD": TAIL_GUARD,
+    }
+
+
+def load_state():
+    if not os.path.exists(STATE_FILE):
+        return {"params": None, "codes": {}}
+    try:
+        with open(STATE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {"params": None, "codes": {}}
+
+
+def save_state(state):
+    tmp = STATE_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp, STATE_FILE)
+
+
+def process_single_stock(file_path, prev=None, event_rows=None):
+    """
+    处理单只股票。
+    prev: 上次运行留下的水位线 {"size", "mtime_ns", "rows", "fingerprint"}，None 表示全量。
+    event_rows: 事件索引给出的涨停行号 (索引与文件同步时传入，省去逐行扫描)；None 则现场扫描。
+    返回: (code, samples, meta, restated)
+      - meta: 本次的新水位线
+      - restated: True 表示历史 K 线被改写 (除权/数据修订)，该股票旧样本需要全部作废
+    """
+    code = os.path.basename(file_path).replace(".csv", "")
+    st = os.stat(file_path)
+
+    # 文件大小和修改时间都没变 -> 连读都不用读
+    if prev and prev.get("size") == st.st_size and prev.get("mtime_ns") == st.st_mtime_ns:
+        return code, [], prev, False
+
     try:
         df = pd.read_csv(file_path)
+        meta = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "rows": len(df), "fingerprint": None}
         if len(df) < (LOOKBACK_WINDOW + FORWARD_WINDOW + 10):
-            return []
+            return code, [], meta, prev is not None
 
         # --- 1. 列名标准化 (中英文适配) ---
         # 建立映射字典，把各种可能的列名统一映射到标准中文名
@@ -43,7 +94,7 @@ def process_single_stock(file_path):
         required = ['日期', '开盘', '收盘', '最高', '最低']
         if not all(col in df.columns for col in required):
             # print(f"缺列: {file_path}")
-            return []
+            return code, [], meta, prev is not None
 
         # --- 2. 核心修复：手动计算涨跌幅 ---
         # 你的数据里没有'涨跌幅'，我们需要现算
@@ -55,15 +106,30 @@ def process_single_stock(file_path):
         # --- 3. 排序与准备 ---
         df['日期'] = pd.to_datetime(df['日期'])
         df = df.sort_values(by='日期').reset_index(drop=True)
+        meta["fingerprint"] = bars_fingerprint(df, len(df))
+
+        # --- 3.5 增量判定 ---
+        # 旧的前缀没变 -> 只处理"上次还不够前瞻窗口"的涨停 + 新追加的涨停
+        # 旧的前缀变了 -> 历史被改写，全量重打标
+        start_idx = 0
+        restated = prev is not None
+        if prev and prev.get("fingerprint") and 0 < prev.get("rows", 0) <= len(df):
+            if bars_fingerprint(df, prev["rows"]) == prev["fingerprint"]:
+                restated = False
+                # 上次合格的涨停满足 idx <= 旧行数 - FORWARD_WINDOW - TAIL_GUARD，这些不用再算
+                start_idx = prev["rows"] - FORWARD_WINDOW - TAIL_GUARD + 1
 
         samples = []
 
         # 找到所有涨停的日子 (>9.5%)
         # 排除首尾数据不足的
-        limit_up_indices = df[df['涨跌幅'] > 9.5].index
+        if event_rows is not None:
+            limit_up_indices = event_rows
+        else:
+            limit_up_indices = df[df['涨跌幅'] > 9.5].index
 
         for idx in limit_up_indices:
-            if idx < LOOKBACK_WINDOW or idx > len(df) - FORWARD_WINDOW - 5:
+            if idx < max(LOOKBACK_WINDOW, start_idx) or idx > len(df) - FORWARD_WINDOW - TAIL_GUARD:
                 continue
 
             # T日信息
@@ -72,7 +138,7 @@ def process_single_stock(file_path):
 
             # --- 4. 筛选逻辑：N字结构 ---
             # 考察涨停后 2 天 (T+1, T+2)
-            check_days = 2
+            check_days = CHECK_DAYS
             check_period = df.iloc[idx + 1: idx + 1 + check_days]
             if check_period.empty: continue
 
@@ -115,17 +181,27 @@ def process_single_stock(file_path):
             # 如果5天走完，既没止盈也没止损 (死鱼横盘)，算作 0 (浪费时间成本)
 
             samples.append({
-                "code": os.path.basename(file_path).replace(".csv", ""),
+                "code": code,
                 "buy_date": df.iloc[buy_idx]['日期'].strftime('%Y-%m-%d'),
                 "label": label,
                 # 这里的 profit 仅作参考，不影响训练
                 "profit": TARGET_PROFIT if label == 1 else STOP_LOSS
             })
 
-        return samples
+        return code, samples, meta, restated
 
     except Exception:
-        return []
+        # 读不出来的文件保留旧水位线，下次再试
+        return code, [], prev, False
+
+
+def load_existing_dataset():
+    """读取已有样本表 (code 统一成 6 位字符串)"""
+    if not os.path.exists(OUTPUT_FILE):
+        return pd.DataFrame(columns=["code", "buy_date", "label", "profit"])
+    df = pd.read_csv(OUTPUT_FILE, dtype={"code": str})
+    df['code'] = df['code'].str.zfill(6)
+    return df
 
 
 def main():
@@ -140,25 +216,86 @@ def main():
     total_files = len(all_files)
     print(f"📊 待扫描文件数: {total_files}")
 
+    # --- 产物缓存: 同一套参数 + 同一版 K 线库算过就直接还原 ---
+    params = label_params()
+    version = dir_version(RAW_DATA_DIR)
+    cache = ArtifactCache()
+    if INCREMENTAL:
+        hit = cache.get(CACHE_KIND, params, version)
+        if hit is not None:
+            restore(hit, OUTPUT_FILE, OUTPUT_FILE)
+            restore(hit, STATE_FILE, STATE_FILE)
+            print(f"⚡ 缓存命中 (参数与 K 线库均未变)，已还原: {os.path.abspath(OUTPUT_FILE)}")
+            return
+
+    # --- 增量状态 (水位线跟着参数走) ---
+    state = load_state()
+    if INCREMENTAL and state.get("params") != params:
+        base = cache.latest(CACHE_KIND, params)
+        if base is not None:
+            restore(base, OUTPUT_FILE, OUTPUT_FILE)
+            restore(base, STATE_FILE, STATE_FILE)
+            state = load_state()
+            print("♻️ 切回用过的打标参数，从缓存里的上次结果续跑增量")
+    incremental = INCREMENTAL and state.get("params") == params and os.path.exists(OUTPUT_FILE)
+    if INCREMENTAL and not incremental:
+        print("⚠️ 打标参数没有可用的历史结果，本次执行全量重建")
+    prev_codes = state.get("codes", {}) if incremental else {}
+    print(f"🧭 模式: {'增量' if incremental else '全量'}")
+
+    # --- 涨停事件索引 (与文件同步的股票直接读事件行号) ---
+    events = EventIndex.load()
+    event_rows = {}
+    if events is not None:
+        ev = events.query(min_pct=9.5)
+        event_rows = {c: g['row'].values for c, g in ev.groupby('code')}
+        print(f"🗂️ 已加载涨停事件索引: {len(ev)} 条")
+
+    def rows_for(file_path):
+        code = os.path.basename(file_path)[:-4]
+        if events is None or not events.in_sync(code, file_path):
+            return None
+        return event_rows.get(code, np.array([], dtype=np.int32))
+
     all_samples = []
+    new_codes = {}
+    restated_codes = set()
 
     with ThreadPoolExecutor(max_workers=8) as executor:
-        futures = {executor.submit(process_single_stock, f): f for f in all_files}
+        futures = {executor.submit(process_single_stock, f, prev_codes.get(os.path.basename(f)[:-4]), rows_for(f)): f
+                   for f in all_files}
 
         count = 0
         for future in as_completed(futures):
             count += 1
-            res = future.result()
+            code, res, meta, restated = future.result()
+            if meta:
+                new_codes[code] = meta
+            if restated:
+                restated_codes.add(code)
             if res:
                 all_samples.extend(res)
 
             if count % 100 == 0:
-                print(f"\r进度: {count}/{total_files} | 累计样本: {len(all_samples)}", end="")
+                print(f"\r进度: {count}/{total_files} | 新增样本: {len(all_samples)}", end="")
 
     print(f"\n\n✅ 数据集构建完成！")
 
-    if all_samples:
-        df_samples = pd.DataFrame(all_samples)
+    # --- 合并到已有样本表 ---
+    df_new = pd.DataFrame(all_samples, columns=["code", "buy_date", "label", "profit"])
+    if incremental:
+        df_old = load_existing_dataset()
+        if restated_codes:
+            print(f"♻️ 历史数据被改写，重新打标: {len(restated_codes)} 只")
+            df_old = df_old[~df_old['code'].isin(restated_codes)]
+        print(f"➕ 本次新增/更新样本: {len(df_new)} 条")
+        df_all = pd.concat([df_old, df_new], ignore_index=True)
+        df_all = df_all.drop_duplicates(subset=["code", "buy_date"], keep="last")
+    else:
+        df_all = df_new
+
+    if not df_all.empty:
+        df_samples = df_all.sort_values(by=["buy_date", "code"]).reset_index(drop=True)
 
         pos_count = len(df_samples[df_samples['label'] == 1])
         neg_count = len(df_samples[df_samples['label'] == 0])
@@ -169,6 +306,10 @@ def main():
 
         df_samples.to_csv(OUTPUT_FILE, index=False)
         print(f"💾 样本索引表: {os.path.abspath(OUTPUT_FILE)}")
+
+        prev_codes.update(new_codes)
+        save_state({"params": params, "codes": prev_codes})
+        cache.put(CACHE_KIND, params, version, {OUTPUT_FILE: OUTPUT_FILE, STATE_FILE: STATE_FILE})
     else:
         print("❌ 依然没有提取到样本。请检查：")
         print("1. training_data 文件夹里有 CSV 文件吗？")
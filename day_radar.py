@@ -10,158 +10,170 @@ os.chdir(os.path.dirname(os.path.abspath(__file__)))
 
 import time
 import pandas as pd
-import requests
-import threading
-import tkinter as tk
-import winsound
 from datetime import datetime
-
-# ==========================================
-# 🛡️ 网络配置
-# ==========================================
-PROXY_PORT = "7890"
-proxies = {
-    "http": f"http://127.0.0.1:{PROXY_PORT}",
-    "https": f"http://127.0.0.1:{PROXY_PORT}",
-}
-# ==========================================
+from tick_recorder import TickRecorder
+from quote_source import SinaQuoteSource, RealClock
+from quote_bus import BusQuoteSource
+from change_detector import ChangeDetector
+from poll_scheduler import TieredQuoteSource, TICK_INTERVAL, WARM, COLD
+from loop_metrics import LoopMetrics
+from alert_dispatcher import AlertDispatcher
+from result_stream import ResultFollower, LATEST_FILE
+from stock_universe import to_symbol
 
 # --- ⚡ 核心参数 ---
-REFRESH_INTERVAL = 3
+REFRESH_INTERVAL = TICK_INTERVAL  # 节拍；每只票多久真正刷新一次由档位决定 (poll_scheduler.py)
+WARM_BAND = 0.5  # 涨幅离触发线不到 0.5 个点 -> warm，其余 (含冷却中的) -> cold
 TRIGGER_PCT = 0.5
 COOLDOWN_SECONDS = 1800
 SKIP_ALREADY_HIGH = 1.0
 STOP_SIGNAL_FILE = "STOP_RADAR_SIGNAL"  # 🛑 停止信号文件名
+RECORD_TICKS = True  # 每次轮询的行情快照落盘到 tick_data/，供盘后回放
+USE_QUOTE_BUS = True  # 和 paper_bot 共用一个行情总线
+METRICS_PORT = 9302  # 耗时指标 http://127.0.0.1:9302/metrics (0 = 不开)
+
+
+def quote_timestamp(info):
+    """行情自带的交易所时间 -> 时间戳 (没有日期/时间字段时返回 None)"""
+    if not info.get('date') or not info.get('time'):
+        return None
+    try:
+        return datetime.strptime(f"{info['date']} {info['time']}", "%Y-%m-%d %H:%M:%S").timestamp()
+    except ValueError:
+        return None
 
 
 class StockRadarLite:
-    def __init__(self):
+    """
+    quote_source / clock: 同 paper_bot.PaperTrader，回放时替换
+    on_alert: 报警回调 (参数为本轮触发列表)，默认交给 AlertDispatcher (终端/日志/webhook/socket/桌面)
+    metrics : LoopMetrics，默认写 metrics/day_radar.json 并开 METRICS_PORT
+    """
+
+    def __init__(self, quote_source=None, clock=None, on_alert=None, watch_file=None, metrics=None):
         self.watch_list = {}
         self.sina_codes = []
-        self.load_watch_list()
-
-    def load_watch_list(self):
+        self.results = None  # 跟随选股结果流时的 ResultFollower
+        self._retired = {}  # 换了一轮选股后，旧名单的状态 (报警冷却) 留着给重新入选的票用
+        self.metrics = metrics or LoopMetrics("day_radar", REFRESH_INTERVAL, port=METRICS_PORT)
+        self.clock = clock or RealClock()
+        if quote_source is None:
+            quote_source = TieredQuoteSource(
+                SinaQuoteSource(TickRecorder("day_radar") if RECORD_TICKS else None, self.metrics), clock=self.clock)
+            if USE_QUOTE_BUS:
+                quote_source = BusQuoteSource("day_radar", fallback=quote_source)
+        self.quote_source = quote_source
+        self.changes = ChangeDetector()  # 只扫行情有变化的票
+        self.dispatcher = None
+        if on_alert is None:
+            self.dispatcher = AlertDispatcher(metrics=self.metrics)
+            on_alert = self.dispatcher.submit
+        self.on_alert = on_alert
+        self.load_watch_list(watch_file)
+
+    def load_watch_list(self, target_file=None):
+        """指定 target_file 就读那份 CSV (回放用)；否则跟随选股结果流，新命中随到随加"""
+        if target_file is None and os.path.exists(LATEST_FILE):
+            self.results = ResultFollower()
+            self.refresh_watch_list()
+            return
         try:
-            files = [f for f in os.listdir('.') if f.startswith('N_Rebound_Result') and f.endswith('.csv')]
-            if not files: return
+            if target_file is None:
+                files = [f for f in os.listdir('.') if f.startswith('N_Rebound_Result') and f.endswith('.csv')]
+                if not files: return
 
-            files.sort(key=lambda x: os.path.getmtime(x), reverse=True)
-            target_file = files[0]
+                files.sort(key=lambda x: os.path.getmtime(x), reverse=True)
+                target_file = files[0]
 
             df = pd.read_csv(target_file)
             df['代码'] = df['代码'].astype(str).str.zfill(6)
 
-            count = 0
             for _, row in df.iterrows():
-                code = row['代码']
-                if row['回调幅度%'] > SKIP_ALREADY_HIGH: continue
-
-                self.watch_list[code] = {
-                    'name': row['名称'],
-                    'last_alert': 0
-                }
-
-                prefix = 'sh' if code.startswith('6') else 'sz'
-                self.sina_codes.append(f"{prefix}{code}")
-                count += 1
+                self.add_watch(row)
 
         except Exception:
             pass
 
-    def fetch_sina_batch(self):
-        chunk_size = 80
-        all_data = {}
+    def add_watch(self, row):
+        code = str(row['代码']).zfill(6)
+        if row['回调幅度%'] > SKIP_ALREADY_HIGH or code in self.watch_list: return
 
-        for i in range(0, len(self.sina_codes), chunk_size):
-            chunk = self.sina_codes[i:i + chunk_size]
-            query_str = ",".join(chunk)
-            url = f"http://hq.sinajs.cn/list={query_str}"
+        self.watch_list[code] = self._retired.pop(code, None) or {
+            'name': row.get('名称', code),
+            'last_alert': 0
+        }
 
-            try:
-                headers = {'Referer': 'https://finance.sina.com.cn'}
-                resp = requests.get(url, headers=headers, proxies=proxies, timeout=5)
-                text = resp.text
-
-                lines = text.strip().split('\n')
-                for line in lines:
-                    if '="' not in line: continue
-                    code_part = line.split('=')[0]
-                    sina_code = code_part.split('_')[-1]
-                    pure_code = sina_code[2:]
-                    data_part = line.split('="')[1].strip('";')
-                    if not data_part: continue
-                    fields = data_part.split(',')
-                    if len(fields) < 4: continue
-
-                    name = fields[0]
-                    prev_close = float(fields[2])
-                    current_price = float(fields[3])
-                    if prev_close == 0: continue
-                    pct = (current_price - prev_close) / prev_close * 100
-
-                    all_data[pure_code] = {
-                        'price': current_price, 'pct': round(pct, 2), 'name': name
-                    }
-            except Exception:
-                pass
+        self.sina_codes.append(to_symbol(code))
+
+    def refresh_watch_list(self):
+        """续读结果流的新命中 (每轮只 stat 两个文件)；选股重跑了就换成新名单"""
+        if self.results is None: return
+        reset, hits = self.results.poll()
+        if reset:
+            self._retired.update(self.watch_list)
+            self.watch_list = {}
+            self.sina_codes = []
+        for hit in hits:
+            self.add_watch(hit)
+
+    def fetch_sina_batch(self):
+        all_data = self.quote_source.fetch(list(self.watch_list.keys()))
+        for info in all_data.values():
+            info['pct'] = round(info['pct'], 2)
         return all_data
 
-    def show_batch_alert(self, alert_list):
-        def popup():
-            top = tk.Tk()
-            title_text = f"🔥 N字异动 ({len(alert_list)}只)"
-            top.title(title_text)
-            top.configure(bg='#ffcccc')
-            top.attributes("-topmost", True)
-
-            rows = len(alert_list)
-            height = 100 + (rows * 30)
-            if height > 600: height = 600
-
-            w = top.winfo_screenwidth()
-            h = top.winfo_screenheight()
-            top.geometry(f"400x{height}+{(w - 400) // 2}+{(h - height) // 2}")
-
-            tk.Label(top, text="⚠ 发现目标启动", font=("微软雅黑", 16, "bold"), bg='#ffcccc', fg='red').pack(pady=10)
-            frame = tk.Frame(top, bg='white')
-            frame.pack(fill='both', expand=True, padx=10, pady=5)
-            tk.Label(frame, text="代码      名称        涨幅", font=("Consolas", 10, "bold"), bg='white').pack(
-                anchor='w')
-            tk.Label(frame, text="----------------------------------", bg='white').pack(anchor='w')
-
-            for item in alert_list:
-                line = f"{item['code']}   {item['name']}   +{item['pct']}%"
-                tk.Label(frame, text=line, font=("Consolas", 12, "bold"), bg='white', fg='red').pack(anchor='w')
-
-            tk.Button(top, text="朕已阅 (关闭)", command=top.destroy, font=("微软雅黑", 10), height=2).pack(pady=10,
-                                                                                                            fill='x')
-            for _ in range(3): winsound.Beep(1000, 100)
-            top.mainloop()
-
-        t = threading.Thread(target=popup)
-        t.start()
-
-    def show_shutdown_alert(self):
-        """退出时的提示弹窗"""
-
-        def popup():
-            top = tk.Tk()
-            top.title("N字猎手")
-            top.geometry("300x150")
-            top.attributes("-topmost", True)
-            w = top.winfo_screenwidth()
-            h = top.winfo_screenheight()
-            top.geometry(f"+{(w - 300) // 2}+{(h - 150) // 2}")
-            tk.Label(top, text="🛑 雷达监控已停止", font=("微软雅黑", 14, "bold"), fg="red").pack(pady=40)
-            # 2秒后自动关闭提示窗
-            top.after(2000, top.destroy)
-            top.mainloop()
-
-        t = threading.Thread(target=popup)
-        t.start()
-
-    def start_monitoring(self):
-        if not self.sina_codes: return
+    def poll_tiers(self, data_map, now):
+        """离触发线近、又不在冷却期的票刷快一点"""
+        tiers = {}
+        for code, item in self.watch_list.items():
+            info = data_map.get(code)
+            if info is None:
+                tiers[code] = WARM
+            elif now - item['last_alert'] <= COOLDOWN_SECONDS:
+                tiers[code] = COLD
+            else:
+                tiers[code] = WARM if info['pct'] >= TRIGGER_PCT - WARM_BAND else COLD
+        return tiers
+
+    def scan_once(self):
+        """拉一轮行情，找出新触发的票 (已按涨幅排序)，交给 on_alert"""
+        m = self.metrics
+        m.loop_start()
+        with m.stage("fetch"):
+            data_map = self.fetch_sina_batch()
+        current_batch_triggers = []
+        now = self.clock.time()
+        changed = self.changes.diff(data_map)
+        m.count("quotes_seen", len(data_map))
+        m.count("quotes_changed", len(changed))
+
+        with m.stage("scan"):
+            for code, info in changed.items():
+                if code not in self.watch_list: continue
+                current_pct = info['pct']
+
+                if current_pct > TRIGGER_PCT:
+                    last_time = self.watch_list[code]['last_alert']
+                    if now - last_time > COOLDOWN_SECONDS:
+                        current_batch_triggers.append({
+                            'code': code, 'name': info['name'], 'price': info['price'], 'pct': current_pct,
+                            'quote_ts': quote_timestamp(info), 'detect_ts': now
+                        })
+                        self.watch_list[code]['last_alert'] = now
+
+        if changed and hasattr(self.quote_source, "set_tiers"):
+            self.quote_source.set_tiers(self.poll_tiers(data_map, now))
+
+        if current_batch_triggers:
+            current_batch_triggers.sort(key=lambda x: x['pct'], reverse=True)
+            with m.stage("alert"):
+                self.on_alert(current_batch_triggers)
+        m.loop_end()
+        return current_batch_triggers
+
+    def start_monitoring(self, stop_event=None):
+        """stop_event: threading.Event，常驻服务里用它叫停；单独运行时仍认 STOP_SIGNAL_FILE"""
+        if not self.sina_codes and self.results is None: return
 
         # 启动时先清理可能存在的旧停止信号
         if os.path.exists(STOP_SIGNAL_FILE):
@@ -171,48 +183,37 @@ class StockRadarLite:
                 pass
 
         while True:
+            # --- 🛑 核心：检查停止信号 ---
+            if stop_event is not None and stop_event.is_set():
+                break
+            if os.path.exists(STOP_SIGNAL_FILE):
+                print("收到停止信号，正在退出...")
+                try:
+                    os.remove(STOP_SIGNAL_FILE)
+                except:
+                    pass
+                break
+            # ---------------------------
+
             try:
-                # --- 🛑 核心：检查自杀信号 ---
-                if os.path.exists(STOP_SIGNAL_FILE):
-                    print("收到停止信号，正在退出...")
-                    # 删除信号文件
-                    try:
-                        os.remove(STOP_SIGNAL_FILE)
-                    except:
-                        pass
-
-                    # 提示用户
-                    winsound.Beep(500, 500)  # 低沉的声音提示退出
-                    self.show_shutdown_alert()
-                    sys.exit(0)  # 退出程序
-                # ---------------------------
-
-                data_map = self.fetch_sina_batch()
-                current_batch_triggers = []
-                now = time.time()
-
-                for code, info in data_map.items():
-                    if code not in self.watch_list: continue
-                    current_pct = info['pct']
-
-                    if current_pct > TRIGGER_PCT:
-                        last_time = self.watch_list[code]['last_alert']
-                        if now - last_time > COOLDOWN_SECONDS:
-                            current_batch_triggers.append({
-                                'code': code, 'name': info['name'], 'price': info['price'], 'pct': current_pct
-                            })
-                            self.watch_list[code]['last_alert'] = now
-
-                if current_batch_triggers:
-                    current_batch_triggers.sort(key=lambda x: x['pct'], reverse=True)
-                    self.show_batch_alert(current_batch_triggers)
-
-                time.sleep(REFRESH_INTERVAL)
-
-            except SystemExit:
-                break  # 响应 sys.exit
+                self.refresh_watch_list()
+                if self.watch_list:
+                    self.scan_once()
             except Exception:
-                time.sleep(3)
+                pass
+            if stop_event is not None:
+                stop_event.wait(REFRESH_INTERVAL)
+            else:
+                self.clock.sleep(REFRESH_INTERVAL)
+
+        self.close()
+
+    def close(self):
+        if self.dispatcher is not None:
+            self.dispatcher.notice("🛑 雷达监控已停止")
+            self.dispatcher.close()
+        self.quote_source.close()
+        self.metrics.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from stock_universe import classify_board, BOARD_LIMITS  # 板块规则统一放在股票池模块
+
+# ==========================================
+# 📍 路径防走丢
+# ==========================================
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+# --- ⚙️ 配置 ---
+RAW_DATA_DIR = "training_data"
+INDEX_FILE = "limit_up_events.parquet"  # 事件表
+STATE_FILE = "limit_up_events_state.json"  # 每只股票的增量水位线
+MAX_WORKERS = 8
+
+# 入库口径 (宽进：查询时再按需收紧)
+MIN_PCT = 9.5  # 收盘涨幅 > 9.5% (与选股/打标的老口径一致)
+GAP_MIN_PCT = 2.0  # 或者 高开 >= 2% (供早盘策略回测使用)
+
+EVENT_COLUMNS = ["date", "code", "board", "pct_chg", "gap_pct", "open", "close", "volume", "limit_up", "row"]
+
+
+# ==========================================
+# 🧰 K线工具 (数据集/回测共用)
+# ==========================================
+def normalize_bars(df):
+    """列名统一成中文，按日期排序，补齐 昨收/涨跌幅"""
+    col_map = {
+        'date': '日期', 'Date': '日期',
+        'open': '开盘', 'Open': '开盘',
+        'close': '收盘', 'Close': '收盘',
+        'high': '最高', 'High': '最高',
+        'low': '最低', 'Low': '最低',
+        'volume': '成交量', 'Volume': '成交量'
+    }
+    df = df.rename(columns=col_map)
+    df['日期'] = pd.to_datetime(df['日期'])
+    df = df.sort_values(by='日期').reset_index(drop=True)
+    df['昨收'] = df['收盘'].shift(1)
+    if '涨跌幅' not in df.columns:
+        df['涨跌幅'] = (df['收盘'] - df['昨收']) / df['昨收'] * 100
+        df['涨跌幅'] = df['涨跌幅'].fillna(0)  # 第一天设为0
+    return df
+
+
+def bars_fingerprint(df, rows):
+    """前 rows 行 K 线的内容指纹 (前复权数据一旦除权，历史价格会整体重算，指纹随之改变)"""
+    part = df[['日期', '开盘', '收盘', '最高', '最低']].iloc[:rows]
+    return hashlib.md5(pd.util.hash_pandas_object(part, index=False).values.tobytes()).hexdigest()
+
+
+def file_stat(file_path):
+    st = os.stat(file_path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+# ==========================================
+# 🗂️ 事件索引 (按日期排序 + 按代码倒排)
+# ==========================================
+class EventIndex:
+    def __init__(self, df, state=None):
+        df = df.sort_values(by=["date", "code"]).reset_index(drop=True)
+        self.df = df
+        self.state = state or {}
+        self._dates = df["date"].values
+        # 倒排表: code -> 行号数组 (天然按日期升序)
+        self._by_code = {code: idx for code, idx in df.groupby("code", sort=False).indices.items()}
+
+    @classmethod
+    def load(cls, path=INDEX_FILE, state_path=STATE_FILE):
+        """读取事件索引，不存在返回 None"""
+        if not os.path.exists(path):
+            return None
+        try:
+            df = pd.read_parquet(path)
+            df["code"] = df["code"].astype(str)
+            state = {}
+            if os.path.exists(state_path):
+                with open(state_path, "r", encoding="utf-8") as f:
+                    state = json.load(f).get("codes", {})
+            return cls(df, state)
+        except Exception as e:
+            print(f"[!] 事件索引读取失败: {e}")
+            return None
+
+    def __len__(self):
+        return len(self.df)
+
+    def latest_date(self):
+        return pd.Timestamp(self._dates[-1]) if len(self._dates) else None
+
+    def recent_dates(self, n):
+        """索引里最近 n 个有事件的日期 (全市场几乎每个交易日都有涨停，可近似当作交易日)"""
+        uniq = np.unique(self._dates)
+        return [pd.Timestamp(d) for d in uniq[-n:]]
+
+    def _positions(self, start=None, end=None, codes=None):
+        lo = 0 if start is None else np.searchsorted(self._dates, np.datetime64(pd.Timestamp(start)), side="left")
+        hi = len(self._dates) if end is None else np.searchsorted(self._dates, np.datetime64(pd.Timestamp(end)),
+                                                                  side="right")
+        if codes is None:
+            return np.arange(lo, hi)
+        parts = [self._by_code[c] for c in codes if c in self._by_code]
+        if not parts:
+            return np.array([], dtype=np.int64)
+        pos = np.sort(np.concatenate(parts))
+        return pos[(pos >= lo) & (pos < hi)]
+
+    def query(self, start=None, end=None, codes=None, min_pct=None, limit_up=None, gap_min=None, gap_max=None):
+        """
+        按 日期区间 / 代码 / 涨幅条件 查询事件。
+        min_pct: 收盘涨幅下限 (严格大于，与老代码的 > 9.5 口径一致)
+        limit_up: True 只要按板块口径真正涨停的
+        gap_min/gap_max: 高开幅度区间 (闭区间)
+        """
+        sub = self.df.iloc[self._positions(start, end, codes)]
+        mask = np.ones(len(sub), dtype=bool)
+        if min_pct is not None:
+            mask &= sub["pct_chg"].values > min_pct
+        if limit_up is not None:
+            mask &= sub["limit_up"].values == limit_up
+        if gap_min is not None:
+            mask &= sub["gap_pct"].values >= gap_min
+        if gap_max is not None:
+            mask &= sub["gap_pct"].values <= gap_max
+        return sub[mask]
+
+    def in_sync(self, code, file_path):
+        """索引中该股票的水位线是否与磁盘文件一致 (一致时 row 列可以直接当 iloc 用)"""
+        meta = self.state.get(code)
+        if not meta:
+            return False
+        try:
+            st = file_stat(file_path)
+        except OSError:
+            return False
+        return meta.get("size") == st["size"] and meta.get("mtime_ns") == st["mtime_ns"]
+
+    def uncovered_codes(self, codes, day, refreshed_after):
+        """
+        索引替它们说不了话的股票: 没有水位线 (新股/没采到)，或者K线没到 day 且文件是在
+        refreshed_after (Unix 时间戳，一般取 day 的收盘时刻) 之前写的。
+        收盘后重新拉过、仍然没有 day 的K线，说明当天停牌，不算缺数据。
+        """
+        day = pd.Timestamp(day).strftime("%Y-%m-%d")
+        after_ns = int(refreshed_after * 1e9)
+        out = []
+        for c in codes:
+            meta = self.state.get(c)
+            if not meta or (meta.get("last_date", "") < day and meta.get("mtime_ns", 0) < after_ns):
+                out.append(c)
+        return out
+
+
+# ==========================================
+# 🏗️ 构建 / 增量更新
+# ==========================================
+def extract_events(df, code, start_row=0):
+    """从标准化后的K线中抽取 start_row 之后的事件"""
+    prev_close = df['昨收'].values
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gap = (df['开盘'].values - prev_close) / prev_close * 100
+    gap = np.nan_to_num(gap, nan=0.0, posinf=0.0, neginf=0.0)
+    pct = df['涨跌幅'].values
+
+    mask = (pct > MIN_PCT) | (gap >= GAP_MIN_PCT)
+    mask[:max(start_row, 1)] = False  # 第一根K线没有昨收
+    rows = np.flatnonzero(mask)
+    if len(rows) == 0:
+        return pd.DataFrame(columns=EVENT_COLUMNS)
+
+    board = classify_board(code)
+    limit = BOARD_LIMITS[board]
+    volume = df['成交量'].values[rows] if '成交量' in df.columns else np.zeros(len(rows))
+    return pd.DataFrame({
+        "date": df['日期'].values[rows],
+        "code": code,
+        "board": board,
+        "pct_chg": pct[rows],  # 保持 float64: 查询时还要和 9.5 这类阈值比，转 float32 会把临界值挤到线上
+        "gap_pct": gap[rows],
+        "open": df['开盘'].values[rows].astype(np.float32),
+        "close": df['收盘'].values[rows].astype(np.float32),
+        "volume": volume.astype(np.float64),
+        "limit_up": pct[rows] >= limit - 0.5,
+        "row": rows.astype(np.int32),
+    })
+
+
+def scan_file(file_path, prev=None):
+    """
+    扫描单只股票。返回 (code, events, meta, restated)
+    events 为 None 表示文件没变，沿用旧事件。
+    """
+    code = os.path.basename(file_path).replace(".csv", "")
+    try:
+        st = file_stat(file_path)
+        # 老水位线没有 last_date 的重读一遍补上 (前缀指纹不变，不会重复入库)
+        if prev and prev.get("size") == st["size"] and prev.get("mtime_ns") == st["mtime_ns"] and "last_date" in prev:
+            return code, None, prev, False
+
+        df = normalize_bars(pd.read_csv(file_path))
+        meta = dict(st, rows=len(df), fingerprint=bars_fingerprint(df, len(df)),
+                    last_date=df['日期'].iloc[-1].strftime("%Y-%m-%d") if len(df) else "")
+
+        start_row = 0
+        restated = prev is not None
+        if prev and 0 < prev.get("rows", 0) <= len(df) and bars_fingerprint(df, prev["rows"]) == prev.get(
+                "fingerprint"):
+            restated = False
+            start_row = prev["rows"]  # 只看新追加的K线
+
+        return code, extract_events(df, code, start_row), meta, restated
+    except Exception:
+        return code, None, prev, False
+
+
+def update_index(full=False):
+    """增量更新事件索引，返回最新的 EventIndex"""
+    if not os.path.exists(RAW_DATA_DIR):
+        print(f"❌ 错误: 找不到目录 {RAW_DATA_DIR}，请先运行采集脚本！")
+        return None
+
+    old = None if full else EventIndex.load()
+    if old is not None and len(old) and old.df["pct_chg"].dtype != np.float64:
+        print("[索引] 旧索引的涨幅列是 float32，全量重建一次")
+        old = None
+    old_df = old.df if old is not None else pd.DataFrame(columns=EVENT_COLUMNS)
+    prev_codes = old.state if old is not None else {}
+
+    files = [os.path.join(RAW_DATA_DIR, f) for f in os.listdir(RAW_DATA_DIR) if f.endswith(".csv")]
+    print(f"🗂️ 更新涨停事件索引 ({'全量' if old is None else '增量'}) | 文件数: {len(files)}")
+
+    new_parts = []
+    drop_codes = set()
+    new_state = dict(prev_codes)
+    changed = 0
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = [executor.submit(scan_file, f, prev_codes.get(os.path.basename(f)[:-4])) for f in files]
+        for future in as_completed(futures):
+            code, events, meta, restated = future.result()
+            if meta:
+                new_state[code] = meta
+            if events is None:
+                continue
+            changed += 1
+            if restated:
+                drop_codes.add(code)
+            if not events.empty:
+                new_parts.append(events)
+
+    if drop_codes:
+        old_df = old_df[~old_df["code"].isin(drop_codes)]
+    df = pd.concat([old_df] + new_parts, ignore_index=True) if new_parts else old_df
+    df = df.drop_duplicates(subset=["code", "date"], keep="last")
+
+    index = EventIndex(df, new_state)
+    index.df.to_parquet(INDEX_FILE + ".tmp", index=False)
+    os.replace(INDEX_FILE + ".tmp", INDEX_FILE)
+    with open(STATE_FILE + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"updated": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "codes": new_state}, f)
+    os.replace(STATE_FILE + ".tmp", STATE_FILE)
+
+    print(f"✅ 索引已更新: 变动文件 {changed} 个 | 重建 {len(drop_codes)} 只 | 事件总数 {len(index)}")
+    return index
+
+
+if __name__ == "__main__":
+    update_index(full="--full" in sys.argv)
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import math
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ==========================================
+# ⏱️ 盘中循环耗时统计
+#   - 每个阶段 (拉行情/解析/卖出检查/评分/写盘...) 一个对数分桶直方图，记录开销只有一次 log + 一次加法
+#   - 每轮总耗时超过节拍 (budget) 记一次超时
+#   - 另有简单计数器 (请求次数、拉取代码数...)，只累加
+#   - 每 WRITE_INTERVAL 秒原子写一次 metrics/<名字>.json，每 ROLL_SECONDS 秒滚动一次 "最近窗口"
+#   - 可选在 127.0.0.1 上开一个纯文本 HTTP 端点 (/metrics)，监控页面直接读
+# ==========================================
+METRICS_DIR = "metrics"
+WRITE_INTERVAL = 10
+ROLL_SECONDS = 300
+
+# 对数分桶: 10μs 起，每桶 ×2^(1/4) (相对误差 < 19%)，共 96 桶覆盖到 ~170 秒
+BUCKET_BASE = 1e-5
+BUCKET_GROWTH = 2 ** 0.25
+BUCKET_COUNT = 96
+_LOG_GROWTH = math.log(BUCKET_GROWTH)
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * BUCKET_COUNT
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        if seconds <= BUCKET_BASE:
+            i = 0
+        else:
+            i = min(int(math.log(seconds / BUCKET_BASE) / _LOG_GROWTH) + 1, BUCKET_COUNT - 1)
+        self.counts[i] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other):
+        for i, c in enumerate(other.counts):
+            self.counts[i] += c
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q):
+        """返回所在桶的上界 (秒)"""
+        if self.count == 0:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= target:
+                return min(BUCKET_BASE * BUCKET_GROWTH ** i, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile(0.5) * 1000, 3),
+            "p99_ms": round(self.percentile(0.99) * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+class _StageTimer:
+    __slots__ = ("metrics", "stage", "t0")
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.stage, time.perf_counter() - self.t0)
+        return False
+
+
+class LoopMetrics:
+    """
+    name  : 进程名 (paper_bot / day_radar)，决定输出文件名
+    budget: 每轮的节拍 (秒)，单轮耗时超过它记一次 overrun
+    port  : HTTP 端点端口，None/0 不开
+    """
+
+    def __init__(self, name, budget, port=None, metrics_dir=METRICS_DIR):
+        self.name = name
+        self.budget = budget
+        self.path = os.path.join(metrics_dir, f"{name}.json")
+        os.makedirs(metrics_dir, exist_ok=True)
+        self.started = time.time()
+        self.loops = 0
+        self.overruns = 0
+        self.worst_overrun = 0.0
+        self.total = {}  # 阶段 -> 启动以来的直方图
+        self.window = {}  # 阶段 -> 当前窗口
+        self.last_window = {}  # 阶段 -> 上一个完整窗口的摘要
+        self.counters = {}  # 名字 -> 启动以来的累计值
+        self._window_start = time.time()
+        self._last_write = 0.0
+        self._loop_t0 = None
+        self._lock = threading.Lock()
+        self._server = None
+        if port:
+            self.serve(port)
+
+    # --- 热路径 ---
+    def stage(self, name):
+        """with metrics.stage("fetch"): ..."""
+        return _StageTimer(self, name)
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            h = self.window.get(stage)
+            if h is None:
+                h = self.window[stage] = Histogram()
+                self.total.setdefault(stage, Histogram())
+            h.record(seconds)
+            self.total[stage].record(seconds)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def loop_start(self):
+        self._loop_t0 = time.perf_counter()
+
+    def loop_end(self):
+        """结束一轮: 记总耗时、判断超时，到点了顺便落盘"""
+        if self._loop_t0 is None:
+            return
+        elapsed = time.perf_counter() - self._loop_t0
+        self._loop_t0 = None
+        self.loops += 1
+        if elapsed > self.budget:
+            self.overruns += 1
+            self.worst_overrun = max(self.worst_overrun, elapsed - self.budget)
+        self.observe("loop", elapsed)
+        self.maybe_write()
+
+    # --- 导出 ---
+    def snapshot(self):
+        with self._lock:
+            now = time.time()
+            if now - self._window_start >= ROLL_SECONDS:
+                self.last_window = {k: h.summary() for k, h in self.window.items()}
+                self.window = {}
+                self._window_start = now
+            return {
+                "name": self.name,
+                "updated": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "uptime_s": round(now - self.started, 1),
+                "budget_s": self.budget,
+                "loops": self.loops,
+                "overruns": self.overruns,
+                "worst_overrun_ms": round(self.worst_overrun * 1000, 3),
+                "window_s": ROLL_SECONDS,
+                "recent": self.last_window or {k: h.summary() for k, h in self.window.items()},
+                "total": {k: h.summary() for k, h in self.total.items()},
+                "counters": dict(self.counters),
+            }
+
+    def maybe_write(self, force=False):
+        now = time.time()
+        if not force and now - self._last_write < WRITE_INTERVAL:
+            return
+        self._last_write = now
+        snap = self.snapshot()
+        try:
+            with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(snap, f, ensure_ascii=False, indent=1)
+            os.replace(self.path + ".tmp", self.path)
+        except OSError:
+            pass
+
+    def to_text(self):
+        """纯文本格式 (一行一个指标)，方便 curl / 监控页面解析"""
+        snap = self.snapshot()
+        lines = [f'nrebound_loops{{loop="{self.name}"}} {snap["loops"]}',
+                 f'nrebound_overruns{{loop="{self.name}"}} {snap["overruns"]}',
+                 f'nrebound_uptime_seconds{{loop="{self.name}"}} {snap["uptime_s"]}']
+        for key, value in snap["counters"].items():
+            lines.append(f'nrebound_counter{{loop="{self.name}",name="{key}"}} {value}')
+        for scope in ("recent", "total"):
+            for stage, s in snap[scope].items():
+                for key in ("count", "p50_ms", "p99_ms", "max_ms"):
+                    lines.append(f'nrebound_stage_{key}{{loop="{self.name}",stage="{stage}",scope="{scope}"}} {s[key]}')
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port):
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") in ("", "/metrics"):
+                    body = metrics.to_text().encode("utf-8")
+                    ctype = "text/plain; charset=utf-8"
+                elif self.path.rstrip("/") == "/json":
+                    body = json.dumps(metrics.snapshot(), ensure_ascii=False).encode("utf-8")
+                    ctype = "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass  # 别刷屏
+
+        try:
+            self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        except OSError as e:
+            print(f"\n[!] 指标端口 {port} 打不开: {e}")
+            return
+        threading.Thread(target=self._server.serve_forever, name=f"metrics-{self.name}", daemon=True).start()
+
+    def close(self):
+        self.maybe_write(force=True)
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()  # shutdown 只停循环，还要关掉监听 socket
+
+
+def read_metrics(metrics_dir=METRICS_DIR):
+    """读所有进程最近一次落盘的指标 {名字: 快照}"""
+    out = {}
+    if not os.path.exists(metrics_dir):
+        return out
+    for f in sorted(os.listdir(metrics_dir)):
+        if f.endswith(".json"):
+            try:
+                with open(os.path.join(metrics_dir, f), "r", encoding="utf-8") as fh:
+                    out[f[:-5]] = json.load(fh)
+            except (OSError, ValueError):
+                pass
+    return out
@@ -8,6 +8,10 @@ import pandas as pd
 from datetime import datetime, timedelta
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import akshare as ak
+from event_index import EventIndex
+from stock_universe import get_universe
+from pipeline import last_close_day, CLOSE_TIME
+from result_stream import ResultWriter, RESULT_PREFIX
 
 # ==========================================
 # 🛡️ 网络配置
@@ -24,10 +28,17 @@ N_DAYS = 7  # 只看最近7天
 VOL_SHRINK_RATIO = 1.2  # 缩量
 UPPER_SHADOW_LIMIT = 0.06  # 上影线
 MAX_POSITION_PCT = 0.6
+ZT_PCT = 9.5  # 涨停判定 (收盘涨幅 > 9.5%)
 
-# 文件名
-TODAY = datetime.now().strftime("%Y%m%d")
-RESULT_FILE = f"N_Rebound_Result_{TODAY}.csv"
+# 涨停事件索引预筛 (名单里每只股票的本地K线都覆盖到最近收盘日时，只联网细查最近有涨停的股票；
+# 否则索引只用来排序，候选先扫，仍然全市场扫描)
+USE_EVENT_INDEX = True
+
+# 文件名按所筛的收盘日取 (YYYYMMDD，与流水线 screen 阶段的 key 一致)，
+# 16:00 跑出来的名单第二天早上再查也认得；常驻服务跨天运行也不会写错文件
+# 命中逐条写进结果流 (result_stream.py)，交易员/雷达随到随读；收尾再写一份排好序的 CSV
+def result_file(day=None):
+    return f"{RESULT_PREFIX}_{day or last_close_day()}.csv"
 
 
 def clean_old_files(days=3):
@@ -39,7 +50,7 @@ def clean_old_files(days=3):
     deleted_count = 0
     try:
         for f in os.listdir('.'):
-            if f.startswith("N_Rebound_Result") and f.endswith(".csv"):
+            if f.startswith(RESULT_PREFIX) and f.endswith((".csv", ".jsonl")):
                 file_path = os.path.join('.', f)
                 file_mtime = os.path.getmtime(file_path)
 
@@ -60,33 +71,48 @@ def clean_old_files(days=3):
 
 
 def get_stock_list_simple():
-    """获取股票列表"""
-    print("[1/3] 正在拉取股票名单...")
-    try:
-        df = ak.stock_info_a_code_name()
-        df = df[~df['name'].str.contains("ST")]
-        df = df[~df['name'].str.contains("退")]
-
-        def add_prefix(code):
-            if code.startswith('6'):
-                return f"sh{code}"
-            else:
-                return f"sz{code}"
-
-        df['sina_code'] = df['code'].apply(add_prefix)
-        return df
-    except Exception as e:
-        print(f"[Error] 名单获取失败: {e}")
+    """获取股票列表 (去掉 ST/退市整理；股票池每天只拉一次，常驻服务里直接用内存里的)"""
+    print("[1/3] 正在读取股票名单...")
+    universe = get_universe()
+    if universe is None:
+        print("[Error] 名单获取失败")
         return pd.DataFrame()
-
-
-def save_result_batch(results):
-    """批量保存"""
+    df = universe.tradable(exclude_st=True)
+    df['sina_code'] = df['symbol']
+    return df
+
+
+def candidate_codes_from_index(codes):
+    """
+    用涨停事件索引找候选: 最近 N_DAYS 个交易日内出现过大阳线的股票。
+    返回 (要扫的代码集合, 其中索引给出的候选数)；没有索引返回 (None, 0)，执行全市场扫描。
+    索引只对本地K线覆盖到最近收盘日的股票有效 (停牌的算覆盖)，
+    没覆盖到的 (新股、没采到、采集没跟上) 索引说不清，原样加进扫描名单。
+    """
+    index = EventIndex.load()
+    if index is None or len(index) == 0:
+        print("[索引] 未找到涨停事件索引，执行全市场扫描")
+        return None, 0
+
+    # 多取一天做冗余: 选股窗口是 tail(N_DAYS + 1)，最后一天本身不算
+    dates = index.recent_dates(N_DAYS + 1)
+    candidates = set(index.query(start=dates[0], min_pct=ZT_PCT)['code']) if dates else set()
+
+    day = last_close_day()
+    close_ts = datetime.combine(datetime.strptime(day, "%Y%m%d"), CLOSE_TIME).timestamp()
+    uncovered = index.uncovered_codes(codes, day, close_ts)
+    if uncovered:
+        print(f"[索引] {len(uncovered)} 只股票的本地K线没覆盖到 {day}，直接加进扫描名单")
+    return candidates | set(uncovered), len(candidates)
+
+
+def save_result_batch(results, path):
+    """收尾时写一次排好序的 CSV (人看 / web_monitor / 流水线产物)"""
     if not results: return
     df = pd.DataFrame(results)
     df = df.sort_values(by="回调幅度%", ascending=False)
-    df.to_csv(RESULT_FILE, index=False, encoding='utf_8_sig')
-    print(f"[保存] 结果已更新: {RESULT_FILE}")
+    df.to_csv(path, index=False, encoding='utf_8_sig')
+    print(f"[保存] 结果已更新: {path}")
 
 
 def check_stock_sina(row):
@@ -132,7 +158,7 @@ def check_stock_sina(row):
 
         # 只在最近 N_DAYS (比如7天) 里找涨停
         recent_df = df.tail(N_DAYS + 1)
-        zt_days = recent_df[recent_df['涨跌幅'] > 9.5]
+        zt_days = recent_df[recent_df['涨跌幅'] > ZT_PCT]
         if zt_days.empty: return None
 
         last_row = df.iloc[-1]
@@ -176,41 +202,56 @@ def check_stock_sina(row):
 
 
 def main():
+    """跑一次选股，返回结果文件路径 (无命中/失败返回 None)"""
     print(f"[{datetime.now()}] N-Rebound (Sina严选版) 启动...")
+    path = result_file()
 
     clean_old_files(days=3)
 
     all_stocks = get_stock_list_simple()
-    if all_stocks.empty: return
+    if all_stocks.empty: return None
+
+    if USE_EVENT_INDEX:
+        scan, n_hot = candidate_codes_from_index(all_stocks['code'].tolist())
+        if scan is not None:
+            all_stocks = all_stocks[all_stocks['code'].isin(scan)]
+            print(f"[索引] 事件索引预筛后剩 {len(all_stocks)} 只 (候选 {n_hot} 只)")
 
     total = len(all_stocks)
     print(f"[2/3] 开始扫描 {total} 只股票 (并发{MAX_WORKERS})...")
 
     results = []
+    stream = ResultWriter()  # 每个命中立刻落盘并对消费方可见
 
     count = 0
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = {executor.submit(check_stock_sina, row): row for _, row in all_stocks.iterrows()}
-
-        for future in as_completed(futures):
-            count += 1
-            if count % 50 == 0:
-                print(f"\r   进度: {count}/{total} | 命中: {len(results)} ", end="")
-
-            res = future.result()
-            if res:
-                results.append(res)
-                # 将 emoji 换成普通的 [+] 号
-                print(f"\n   [+] 严选命中: {res['名称']} ({res['代码']}) 跌幅: {res['回调幅度%']}%")
-                if len(results) % 5 == 0:
-                    save_result_batch(results)
+    try:
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            futures = {executor.submit(check_stock_sina, row): row for _, row in all_stocks.iterrows()}
+
+            for future in as_completed(futures):
+                count += 1
+                if count % 50 == 0:
+                    print(f"\r   进度: {count}/{total} | 命中: {len(results)} ", end="")
+
+                res = future.result()
+                if res:
+                    results.append(res)
+                    stream.append(res)
+                    # 将 emoji 换成普通的 [+] 号
+                    print(f"\n   [+] 严选命中: {res['名称']} ({res['代码']}) 跌幅: {res['回调幅度%']}%")
+    except BaseException:
+        stream.finish(status="failed")
+        raise
 
     if results:
-        save_result_batch(results)
+        save_result_batch(results, path)
+        stream.finish(path)
         print(f"\n\n[完成] 扫描完成！共选出 {len(results)} 只精品。")
-        print(f"[文件] 结果文件: {os.path.abspath(RESULT_FILE)}")
-    else:
-        print("\n\n[完成] 扫描完成，严苛条件下无标的入选。")
+        print(f"[文件] 结果文件: {os.path.abspath(path)}")
+        return path
+    stream.finish()
+    print("\n\n[完成] 扫描完成，严苛条件下无标的入选。")
+    return None
 
 
 if __name__ == "__main__":
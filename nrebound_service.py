@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import json
+import time
+import socket
+import threading
+import subprocess
+import socketserver
+import traceback
+from datetime import datetime
+
+# ==========================================
+# 📍 路径防走丢
+# ==========================================
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+# ==========================================
+# 🏠 常驻服务
+# 一个进程把 akshare/xgboost、AI 模型、股票名单、行情连接都留在内存里，
+# 通过本地控制接口接活:
+#   screen  选股 (night_screener.main)         score  单票 AI 打分
+#   trade_start / trade_stop  模拟交易员        radar_start / radar_stop  雷达
+#   status / ping / shutdown
+# 协议: 一行 JSON 请求 {"cmd": ..., 其它参数} -> 一行 JSON 应答 {"ok": bool, ...}
+# 传输: Unix socket (SOCKET_PATH)，没有 AF_UNIX 的系统 (老 Windows) 退回 127.0.0.1:CONTROL_PORT
+# 停止交易员/雷达用线程 Event，不再需要停止信号文件。
+# ==========================================
+SOCKET_PATH = "nrebound_service.sock"
+CONTROL_PORT = 9300
+LOG_FILE = "service.log"
+START_TIMEOUT = 60  # 客户端拉起服务后最多等多久 (首次要加载模型)
+WARM_ON_START = True  # 启动后台预热: 模型 + 股票名单
+USE_UNIX_SOCKET = hasattr(socket, "AF_UNIX")
+
+
+def log(msg):
+    line = f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {msg}"
+    print(line, flush=True)
+    try:
+        with open(LOG_FILE, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    except OSError:
+        pass
+
+
+# ==========================================
+# 📞 客户端
+# ==========================================
+def _connect(timeout):
+    if USE_UNIX_SOCKET:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        sock.connect(SOCKET_PATH)
+    else:
+        sock = socket.create_connection(("127.0.0.1", CONTROL_PORT), timeout=timeout)
+    return sock
+
+
+def call(cmd, timeout=10, **args):
+    """发一条命令，返回应答字典；服务没在跑 (或超时) 返回 None，调用方自己退回老办法"""
+    try:
+        with _connect(timeout) as sock:
+            sock.sendall((json.dumps({"cmd": cmd, **args}, ensure_ascii=False) + "\n").encode("utf-8"))
+            with sock.makefile("r", encoding="utf-8") as f:
+                line = f.readline()
+        return json.loads(line) if line else None
+    except (OSError, ValueError):
+        return None
+
+
+def is_running():
+    return call("ping", timeout=2) is not None
+
+
+def ensure_service(wait=START_TIMEOUT):
+    """服务没起来就在后台拉起，等到能 ping 通为止；失败返回 False"""
+    if is_running():
+        return True
+    python_dir = os.path.dirname(sys.executable)
+    pythonw = os.path.join(python_dir, "pythonw.exe")
+    if not os.path.exists(pythonw): pythonw = sys.executable
+    script = os.path.abspath(__file__)
+    if os.name == "nt":
+        subprocess.Popen([pythonw, script], creationflags=0x08000000)
+    else:
+        subprocess.Popen([sys.executable, script], start_new_session=True,
+                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + wait
+    while time.time() < deadline:
+        time.sleep(0.5)
+        if is_running():
+            return True
+    return False
+
+
+# ==========================================
+# ⚙️ 服务端
+# ==========================================
+class Service:
+    def __init__(self):
+        self.started = time.time()
+        self.jobs = {}  # 任务号 -> 状态字典
+        self._job_seq = 0
+        self._lock = threading.Lock()
+        self._screen_lock = threading.Lock()
+        self.workers = {}  # "trade"/"radar" -> (线程, 停止 Event)
+        self.server = None
+        if WARM_ON_START:
+            threading.Thread(target=self.warm, name="warmup", daemon=True).start()
+
+    # --- 常驻资源 ---
+    def warm(self):
+        t0 = time.time()
+        try:
+            import paper_bot  # 顺带加载 AI 模型 (paper_bot.ai_engine)
+            import night_screener
+            night_screener.get_stock_list_simple()
+            log(f"🔥 预热完成 ({time.time() - t0:.1f}s) | AI 模型: {'有' if paper_bot.HAS_AI else '无'}")
+        except Exception as e:
+            log(f"⚠️ 预热失败: {e}")
+
+    # --- 后台任务 ---
+    def _new_job(self, kind):
+        with self._lock:
+            self._job_seq += 1
+            job = {"id": self._job_seq, "kind": kind, "status": "running",
+                   "started": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "finished": None,
+                   "result": None, "error": None}
+            self.jobs[job["id"]] = job
+        return job
+
+    def _run_job(self, job, fn):
+        t0 = time.time()
+        try:
+            job["result"] = fn()
+            job["status"] = "done"
+        except Exception as e:
+            job["status"] = "failed"
+            job["error"] = f"{type(e).__name__}: {e}"
+            log(traceback.format_exc())
+        job["finished"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        job["seconds"] = round(time.time() - t0, 2)
+        log(f"📋 任务 #{job['id']} {job['kind']} {job['status']} ({job['seconds']}s)")
+
+    def screen(self, wait=False):
+        """同一时间只跑一个选股；已经在跑就返回那个任务"""
+        import night_screener
+        with self._lock:
+            for job in self.jobs.values():
+                if job["kind"] == "screen" and job["status"] == "running":
+                    return {"ok": True, "job": job}
+            job = self._new_job("screen")
+
+        def work():
+            with self._screen_lock:
+                return night_screener.main()
+
+        t = threading.Thread(target=self._run_job, args=(job, work), name=f"job-{job['id']}", daemon=True)
+        t.start()
+        if wait:
+            t.join()
+        return {"ok": job["status"] != "failed", "job": job}
+
+    def score(self, code):
+        import paper_bot
+        if not paper_bot.HAS_AI:
+            return {"ok": False, "error": "未找到 AI 模型"}
+        score, advice, _ = paper_bot.ai_engine.predict(code)
+        return {"ok": True, "code": code, "score": score, "advice": advice}
+
+    def _start_worker(self, name, make, run):
+        old = self.workers.get(name)
+        if old is not None and old[0].is_alive():
+            return {"ok": True, "running": True, "note": "已在运行"}
+        stop = threading.Event()
+
+        def target():
+            try:
+                run(make(), stop)
+            except Exception:
+                log(traceback.format_exc())
+            log(f"⏹ {name} 已停止")
+
+        t = threading.Thread(target=target, name=name, daemon=True)
+        t.start()
+        self.workers[name] = (t, stop)
+        log(f"▶ {name} 已启动")
+        return {"ok": True, "running": True}
+
+    def _stop_worker(self, name, timeout=15):
+        w = self.workers.get(name)
+        if w is None or not w[0].is_alive():
+            return {"ok": True, "running": False}
+        w[1].set()
+        w[0].join(timeout)
+        return {"ok": not w[0].is_alive(), "running": w[0].is_alive()}
+
+    def trade_start(self):
+        import paper_bot
+        return self._start_worker("trade", paper_bot.PaperTrader, lambda bot, stop: bot.run(stop_event=stop))
+
+    def radar_start(self):
+        import day_radar
+        return self._start_worker("radar", day_radar.StockRadarLite,
+                                  lambda radar, stop: radar.start_monitoring(stop_event=stop))
+
+    def status(self):
+        return {"ok": True, "pid": os.getpid(), "uptime_s": round(time.time() - self.started, 1),
+                "workers": {k: t.is_alive() for k, (t, _) in self.workers.items()},
+                "jobs": list(self.jobs.values())[-20:]}
+
+    def shutdown(self):
+        for name in list(self.workers):
+            self._stop_worker(name)
+        threading.Thread(target=self.server.shutdown, daemon=True).start()
+        return {"ok": True}
+
+    def handle(self, req):
+        cmd = req.get("cmd")
+        if cmd == "ping":
+            return {"ok": True, "pid": os.getpid()}
+        if cmd == "status":
+            return self.status()
+        if cmd == "screen":
+            return self.screen(wait=bool(req.get("wait")))
+        if cmd == "job":
+            job = self.jobs.get(req.get("id"))
+            return {"ok": job is not None, "job": job}
+        if cmd == "score":
+            return self.score(str(req.get("code", "")).zfill(6))
+        if cmd == "trade_start":
+            return self.trade_start()
+        if cmd == "trade_stop":
+            return self._stop_worker("trade")
+        if cmd == "radar_start":
+            return self.radar_start()
+        if cmd == "radar_stop":
+            return self._stop_worker("radar")
+        if cmd == "shutdown":
+            return self.shutdown()
+        return {"ok": False, "error": f"未知命令: {cmd}"}
+
+
+def _make_handler(service):
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            line = self.rfile.readline()
+            if not line:
+                return
+            try:
+                resp = service.handle(json.loads(line))
+            except Exception as e:
+                resp = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            self.wfile.write((json.dumps(resp, ensure_ascii=False, default=str) + "\n").encode("utf-8"))
+
+    return Handler
+
+
+def serve():
+    if is_running():
+        print("🏠 服务已经在运行")
+        return
+    service = Service()
+    handler = _make_handler(service)
+    if USE_UNIX_SOCKET:
+        if os.path.exists(SOCKET_PATH):
+            os.remove(SOCKET_PATH)  # 上次异常退出留下的
+        server = socketserver.ThreadingUnixStreamServer(SOCKET_PATH, handler)
+        where = os.path.abspath(SOCKET_PATH)
+    else:
+        server = socketserver.ThreadingTCPServer(("127.0.0.1", CONTROL_PORT), handler)
+        where = f"127.0.0.1:{CONTROL_PORT}"
+    server.daemon_threads = True
+    service.server = server
+    log(f"🏠 N-Rebound 常驻服务已启动 (pid {os.getpid()}) | 控制接口: {where}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        for name in list(service.workers):
+            service._stop_worker(name)
+    finally:
+        server.server_close()
+        if USE_UNIX_SOCKET and os.path.exists(SOCKET_PATH):
+            os.remove(SOCKET_PATH)
+        log("🏠 常驻服务已退出")
+
+
+if __name__ == "__main__":
+    # 用法: python nrebound_service.py            启动服务
+    #       python nrebound_service.py <命令>     发命令 (status / screen / trade_start / shutdown ...)
+    if len(sys.argv) > 1:
+        print(json.dumps(call(sys.argv[1], timeout=3600), ensure_ascii=False, indent=1, default=str))
+    else:
+        serve()
@@ -3,9 +3,21 @@ import os
 import sys
 import time
 import pandas as pd
-import requests
 from datetime import datetime
 import random
+from tick_recorder import TickRecorder
+from quote_source import SinaQuoteSource, RealClock
+from quote_bus import BusQuoteSource
+from change_detector import ChangeDetector
+from poll_scheduler import TieredQuoteSource, TICK_INTERVAL, HOT, WARM, COLD
+from portfolio_store import PortfolioStore
+from trade_ledger import TradeLedger, LEDGER_NAME
+from scoring_pool import ScoringPool, SCORE_WORKERS
+from loop_metrics import LoopMetrics
+from trade_calendar import get_calendar
+from result_stream import ResultFollower, LATEST_FILE
+from trade_rules import (INIT_CASH, SINGLE_POS_CASH, TAKE_PROFIT, STOP_LOSS, MAX_HOLD_DAYS, AI_COEFF,
+                         BUY_THRESHOLD, DEFAULT_SCORE, TRIGGER_PCT, SKIP_HIGH_OPEN, PAPER_DATA_DIR)
 
 # ==========================================
 # 📍 路径防走丢补丁
@@ -21,27 +33,24 @@ os.environ["http_proxy"] = f"http://127.0.0.1:{PROXY_PORT}"
 os.environ["https_proxy"] = f"http://127.0.0.1:{PROXY_PORT}"
 
 # ==========================================
-# ⚙️ 策略配置
+# ⚙️ 策略配置 (资金/买卖规则在 trade_rules.py，回测共用)
 # ==========================================
-INIT_CASH = 100000
-SINGLE_POS_CASH = 5000
-
-TAKE_PROFIT = 0.08
-STOP_LOSS = -0.05
-MAX_HOLD_DAYS = 5
-
-AI_COEFF = 1.1
-BUY_THRESHOLD = 0.55
-
-# 监控阈值
-TRIGGER_PCT = 0.1
-SKIP_HIGH_OPEN = 1.5
+RECORD_TICKS = True  # 每次轮询的行情快照落盘到 tick_data/，供盘后回放
+USE_QUOTE_BUS = True  # 从行情总线读 (quote_bus.py，没在跑会自动拉起)；总线不可用时直接拉新浪
+
+# 轮询节奏 (秒)
+POLL_INTERVAL = TICK_INTERVAL  # 主循环节拍；每只票多久真正刷新一次由档位决定 (poll_scheduler.py)
+HOT_BAND = 0.01  # 离止盈/止损线不到 1 个点的持仓 -> hot
+WARM_BAND = 0.5  # 涨幅离买入窗口不到 0.5 个点的观察票 -> warm
+WARMUP_SECONDS = 60  # 开盘/开午盘前提前多久醒来预热 (重读名单、预连行情)
+MAX_IDLE_SLEEP = 3600  # 休市时单次最长睡眠，防止系统休眠/改时间后睡过头
+RECHECK_SECONDS = 1800  # 同一只票两次 AI 评估的最小间隔
+METRICS_PORT = 9301  # 耗时指标 http://127.0.0.1:9301/metrics (0 = 不开)
 
 # 路径
-DATA_DIR = "paper_trading_data"
+DATA_DIR = PAPER_DATA_DIR
 if not os.path.exists(DATA_DIR): os.makedirs(DATA_DIR)
-PORTFOLIO_FILE = os.path.join(DATA_DIR, "portfolio.csv")
-HISTORY_FILE = os.path.join(DATA_DIR, "trade_history.csv")
+LEDGER_FILE = os.path.join(DATA_DIR, LEDGER_NAME)  # 老的 trade_history.csv 首次启动时自动导入
 
 try:
     from ai_filter_xgboost import AIFilter
@@ -57,29 +66,17 @@ except ImportError:
 # ==========================================
 # 🏦 账户管理系统
 # ==========================================
-def load_portfolio():
-    if os.path.exists(PORTFOLIO_FILE):
-        return pd.read_csv(PORTFOLIO_FILE)
-    return pd.DataFrame(columns=["code", "name", "buy_date", "buy_price", "amount", "cost"])
-
-
-def save_portfolio(df):
-    df.to_csv(PORTFOLIO_FILE, index=False, encoding='utf_8_sig')
-
-
-def log_trade(action, code, name, price, amount, info=""):
-    record = {
-        "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "action": action,
-        "code": code,
-        "name": name,
-        "price": price,
-        "amount": amount,
-        "info": info
-    }
-    df = pd.DataFrame([record])
-    header = not os.path.exists(HISTORY_FILE)
-    df.to_csv(HISTORY_FILE, mode='a', header=header, index=False, encoding='utf_8_sig')
+def log_trade(ledger, action, code, name, price, amount, now=None, score=None, reason=None, pnl=None,
+              hold_days=None, buy_price=None):
+    """成交写入账本 (SQLite)，info 备注保持老格式方便肉眼查看"""
+    ts = (now or datetime.now()).strftime("%Y-%m-%d %H:%M:%S")
+    if action == "BUY":
+        info = f"AI评分:{score:.1f}"
+        ledger.record_buy(ts, code, name, price, amount, score=score, info=info)
+    else:
+        info = f"{reason} 盈亏:{pnl:.2f}"
+        ledger.record_sell(ts, code, name, price, amount, reason, pnl, hold_days=hold_days, buy_price=buy_price,
+                           info=info)
     print(f"📝 [记账] {action} {name} {amount}股 @ {price} | {info}")
 
 
@@ -87,47 +84,86 @@ def is_trading_time(now):
     """
     判断当前时间是否在 A 股交易时间 (排除周末、节假日和午休)
     """
-    # 1. 排除周末
-    if now.weekday() >= 5:  # 5是周六, 6是周日
-        return False
+    return get_calendar().is_trading_time(now)
 
-    current_time_min = now.hour * 60 + now.minute
 
-    # 上午交易时段 (9:30 - 11:30)
-    morning_start = 9 * 60 + 30
-    morning_end = 11 * 60 + 30
+def quote_lag(market_data, now):
+    """最新一笔行情的交易所时间 -> 本轮决策完成，隔了多少秒 (行情里没有时间戳时返回 None)"""
+    stamps = [f"{q['date']} {q['time']}" for q in market_data.values() if q.get('date') and q.get('time')]
+    if not stamps:
+        return None
+    lag = (now - datetime.strptime(max(stamps), "%Y-%m-%d %H:%M:%S")).total_seconds()
+    return lag if lag >= 0 else None
 
-    # 下午交易时段 (13:00 - 15:00)
-    afternoon_start = 13 * 60
-    afternoon_end = 15 * 60
 
-    is_morning = morning_start <= current_time_min < morning_end
-    is_afternoon = afternoon_start <= current_time_min <= afternoon_end
-
-    return is_morning or is_afternoon
+def default_scorer(code):
+    """AI 评分 (0~100)；没有模型时给默认分"""
+    if HAS_AI:
+        score, _, _ = ai_engine.predict(code)
+        return score
+    return DEFAULT_SCORE
 
 
 # ==========================================
 # 🕵️‍♂️ 交易员逻辑
 # ==========================================
 class PaperTrader:
-    def __init__(self):
-        self.watch_list = {}
-        self.load_watchlist()
+    """
+    quote_source: 行情源 (默认行情总线 + 新浪兜底；回放时换成 ReplayQuoteSource)
+    clock       : 时钟 (默认真实时间；回放时换成 VirtualClock)
+    data_dir    : 持仓/流水目录 (回放写到独立目录，不污染实盘账户)
+    scorer      : code -> 评分 (默认 AI 模型)
+    score_workers: 后台评分线程数，0 = 在主循环里同步评分 (回放用)
+    metrics     : LoopMetrics，默认写 metrics/paper_bot.json 并开 METRICS_PORT
+    watch_file  : 指定选股名单 CSV；默认跟随选股结果流 (result_stream.py)，没有结果流时取最新的 N_Rebound_Result_*.csv
+    record_decisions: 记下每次评分决策到 self.decisions (回放报告用；实盘常驻进程不记，免得越攒越多)
+    """
 
-    def load_watchlist(self):
+    def __init__(self, quote_source=None, clock=None, data_dir=DATA_DIR, scorer=None, watch_file=None,
+                 score_workers=SCORE_WORKERS, metrics=None, calendar=None, record_decisions=False):
+        self.watch_list = {}
+        self.results = None  # 跟随选股结果流时的 ResultFollower
+        self._retired = {}  # 换了一轮选股后，旧名单的状态 (评分间隔) 留着给重新入选的票用
+        self.clock = clock or RealClock()
+        self.calendar = calendar or get_calendar()
+        self.watch_file = watch_file
+        self._warmed_for = None
+        self.metrics = metrics or LoopMetrics("paper_bot", POLL_INTERVAL, port=METRICS_PORT)
+        if quote_source is None:
+            quote_source = TieredQuoteSource(
+                SinaQuoteSource(TickRecorder("paper_bot") if RECORD_TICKS else None, self.metrics), clock=self.clock)
+            if USE_QUOTE_BUS:
+                quote_source = BusQuoteSource("paper_bot", fallback=quote_source)
+        self.quote_source = quote_source
+        self.changes = ChangeDetector()  # 每轮只评估行情有变化的票
+        self.scoring = ScoringPool(scorer or default_scorer, workers=score_workers)
+        os.makedirs(data_dir, exist_ok=True)
+        self.portfolio = PortfolioStore(data_dir)  # 内存持仓 + 日志，不再每轮读写 CSV
+        self.ledger = TradeLedger(os.path.join(data_dir, LEDGER_NAME))
+        self.decisions = [] if record_decisions else None  # (时间, 代码, 涨幅, 评分, 是否买入)，回放报告用
+        self.load_watchlist(watch_file)
+
+    def load_watchlist(self, target_file=None):
+        if target_file is None and (self.results is not None or os.path.exists(LATEST_FILE)):
+            if self.results is None:
+                self.results = ResultFollower()
+            self.refresh_watchlist()
+            return
         try:
-            files = [f for f in os.listdir('.') if f.startswith('N_Rebound_Result') and f.endswith('.csv')]
-            if not files:
-                print("❌ 没找到选股结果！")
-                return
-
-            files.sort(key=lambda x: os.path.getmtime(x), reverse=True)
-            target_file = files[0]
+            if target_file is None:
+                files = [f for f in os.listdir('.') if f.startswith('N_Rebound_Result') and f.endswith('.csv')]
+                if not files:
+                    print("❌ 没找到选股结果！")
+                    return
+
+                files.sort(key=lambda x: os.path.getmtime(x), reverse=True)
+                target_file = files[0]
             print(f"📂 读取选股名单: {target_file}")
 
             df = pd.read_csv(target_file)
             df['代码'] = df['代码'].astype(str).str.zfill(6)
+            if '名称' not in df.columns:
+                df['名称'] = df['代码']
 
             self.watch_list = {
                 row['代码']: {'name': row['名称'], 'last_check': 0}
@@ -138,11 +174,26 @@ class PaperTrader:
         except Exception as e:
             print(f"加载失败: {e}")
 
+    def refresh_watchlist(self):
+        """续读结果流的新命中 (每轮只 stat 两个文件)，选股晚跑完也不用重启；选股重跑了就换成新名单"""
+        if self.results is None: return
+        reset, hits = self.results.poll()
+        if reset:
+            self._retired.update(self.watch_list)
+            self.watch_list = {}
+            print(f"\n📂 跟随选股结果流: {self.results.log}")
+        for hit in hits:
+            code = str(hit['代码']).zfill(6)
+            if code not in self.watch_list:
+                self.watch_list[code] = self._retired.pop(code, None) or {'name': hit.get('名称', code),
+                                                                          'last_check': 0}
+        if hits:
+            print(f"\n📊 新增选股命中 {len(hits)} 只，监控列表: {len(self.watch_list)} 只")
+
     def execute_buy(self, code, name, current_price, score):
-        df_pos = load_portfolio()
-        if not df_pos.empty and code in df_pos['code'].astype(str).values: return
+        if code in self.portfolio: return
 
-        current_used_cash = df_pos['cost'].sum() if not df_pos.empty else 0
+        current_used_cash = self.portfolio.used_cash()
         if current_used_cash + SINGLE_POS_CASH > INIT_CASH:
             print(f"   ⚠️ 资金不足，放弃买入")
             return
@@ -152,183 +203,225 @@ class PaperTrader:
 
         cost = shares * current_price
 
-        new_pos = {
-            "code": code,
-            "name": name,
-            "buy_date": datetime.now().strftime("%Y-%m-%d"),
-            "buy_price": current_price,
-            "amount": shares,
-            "cost": cost
-        }
-        df_pos = pd.concat([df_pos, pd.DataFrame([new_pos])], ignore_index=True)
-        save_portfolio(df_pos)
-        log_trade("BUY", code, name, current_price, shares, f"AI评分:{score:.1f}")
-
-    def execute_sell(self, row, current_price, reason):
-        df_pos = load_portfolio()
-        df_pos = df_pos[df_pos['code'].astype(str) != str(row['code'])]
-        save_portfolio(df_pos)
+        self.portfolio.open_position(code, name, self.clock.now().strftime("%Y-%m-%d"), current_price, shares, cost)
+        log_trade(self.ledger, "BUY", code, name, current_price, shares, now=self.clock.now(), score=score)
+
+    def execute_sell(self, row, current_price, reason, hold_days=None):
+        self.portfolio.close_position(row['code'])
         profit = (current_price - row['buy_price']) * row['amount']
-        log_trade("SELL", row['code'], row['name'], current_price, row['amount'], f"{reason} 盈亏:{profit:.2f}")
+        log_trade(self.ledger, "SELL", row['code'], row['name'], current_price, row['amount'], now=self.clock.now(),
+                  reason=reason, pnl=profit, hold_days=hold_days, buy_price=row['buy_price'])
 
-    # =======================================================
-    # 📡 核心修复：完全照搬 WebUI 的网络请求逻辑
-    # =======================================================
     def get_realtime_data(self, codes):
-        data = {}
-        chunk_size = 80
-
-        # 强制使用代理 (和 WebUI 保持一致)
-        proxies = {
-            "http": f"http://127.0.0.1:{PROXY_PORT}",
-            "https": f"http://127.0.0.1:{PROXY_PORT}"
-        }
-
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-            "Referer": "https://finance.sina.com.cn",
-            "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8"
-        }
-
-        sina_codes = []
-        code_map = {}
-        for c in codes:
-            prefix = 'sh' if c.startswith('6') else 'sz'
-            sc = f"{prefix}{c}"
-            sina_codes.append(sc)
-            code_map[sc] = c
-
-        for i in range(0, len(sina_codes), chunk_size):
-            chunk = sina_codes[i:i + chunk_size]
-            url = f"http://hq.sinajs.cn/list={','.join(chunk)}"
-            try:
-                # 必须带上 proxies，否则你的环境连不上
-                resp = requests.get(url, headers=headers, proxies=proxies, timeout=5)
-
-                # 尝试自动处理编码 (防止乱码)
-                resp.encoding = 'gbk'
-
-                lines = resp.text.strip().split('\n')
-                for line in lines:
-                    if '="' not in line: continue
-                    s_code = line.split('=')[0].split('_')[-1]
-                    parts = line.split('="')[1].strip('";').split(',')
-                    if len(parts) < 4: continue
-
-                    pure_code = code_map.get(s_code)
-                    pre_close = float(parts[2])
-                    price = float(parts[3])
-                    if pre_close == 0: continue
-                    pct = (price - pre_close) / pre_close * 100
-
-                    data[pure_code] = {'price': price, 'pct': pct, 'name': parts[0]}
-            except Exception as e:
-                # print(f"网络波动: {e}")
-                pass
-        return data
-
-    def run(self):
-        print("🤖 N-Rebound 全自动交易员已上岗...")
-        print(f"🎯 黄金窗口: 涨幅 {TRIGGER_PCT}% ~ {SKIP_HIGH_OPEN}%")
-
-        while True:
-            try:
-                now = datetime.now()
-                if not is_trading_time(now):
-                    sleep_duration = 300
-                    current_time_min = now.hour * 60 + now.minute
-                    if 9 * 60 + 25 <= current_time_min < 9 * 60 + 30:
-                        sleep_duration = 1  # 临近开盘，切到 1 秒刷新的高精度模式
-                    elif 12 * 60 + 55 <= current_time_min < 13 * 60:
-                        sleep_duration = 1  # 临近午盘，切到 1 秒刷新的高精度模式
-                    sys.stdout.write(f"\r[{now.strftime('%H:%M:%S')}] 😴 休市中，等待开盘...")
-                    sys.stdout.flush()
-                    time.sleep(sleep_duration)
+        return self.quote_source.fetch(codes)
+
+    def poll_tiers(self, positions, market_data, today):
+        """按最新行情给每只票分档: 快碰到止盈/止损的持仓最热，离买入窗口近的观察票次之，其余放冷"""
+        tiers = {}
+        for row in positions:
+            info = market_data.get(row['code'])
+            if info is None:
+                tiers[row['code']] = WARM
+                continue
+            if row['buy_date'] == today:  # T+1 锁仓，今天卖不了
+                tiers[row['code']] = COLD
+                continue
+            profit_pct = (info['price'] - row['buy_price']) / row['buy_price']
+            near = TAKE_PROFIT - profit_pct <= HOT_BAND or profit_pct - STOP_LOSS <= HOT_BAND
+            tiers[row['code']] = HOT if near else COLD
+        for code in self.watch_list:
+            if code in tiers:
+                continue
+            info = market_data.get(code)
+            if info is None or code in self.scoring:
+                tiers[code] = WARM
+            elif TRIGGER_PCT - WARM_BAND <= info['pct'] <= SKIP_HIGH_OPEN + WARM_BAND:
+                tiers[code] = WARM
+            else:
+                tiers[code] = COLD
+        return tiers
+
+    def run_once(self):
+        """跑一轮 "拉行情 -> 卖 -> 买"，返回下一轮之前应该睡多久 (秒)"""
+        now = self.clock.now()
+        if not self.calendar.is_trading_time(now):
+            return self.idle(now)
+
+        self.metrics.loop_start()
+        try:
+            return self._trade_once(now)
+        finally:
+            self.metrics.loop_end()
+
+    def idle(self, now):
+        """休市: 直接睡到下一个开盘时刻前 WARMUP_SECONDS 秒，预热后再精确睡到开盘"""
+        nxt = self.calendar.next_session_start(now)
+        remaining = (nxt - now).total_seconds()
+        if remaining > WARMUP_SECONDS:
+            sys.stdout.write(f"\r[{now.strftime('%H:%M:%S')}] 😴 休市中，下次开盘 {nxt.strftime('%m-%d %H:%M')}...")
+            sys.stdout.flush()
+            return min(remaining - WARMUP_SECONDS, MAX_IDLE_SLEEP)
+        if self._warmed_for != nxt:
+            self._warmed_for = nxt
+            self.warmup()
+        return max((nxt - self.clock.now()).total_seconds(), 0)
+
+    def warmup(self):
+        """开盘前预热: 晚上可能出了新名单，重新读一遍；顺便拉一次行情把连接建好"""
+        if self.watch_file is None:
+            self.load_watchlist()
+        self.changes.reset()  # 开盘第一轮所有票都评估一遍 (时间到期等不看价格的条件)
+        codes = list(set(self.portfolio.codes() + list(self.watch_list.keys())))
+        if codes:
+            self.get_realtime_data(codes)
+
+    def _trade_once(self, now):
+        m = self.metrics
+        with m.stage("disk"):
+            self.portfolio.maybe_snapshot()
+            self.refresh_watchlist()
+        positions = self.portfolio.rows()
+        holding_codes = [p['code'] for p in positions]
+        watch_codes = list(self.watch_list.keys())
+
+        all_codes = list(set(holding_codes + watch_codes))
+        if not all_codes:
+            print("😴 暂无目标，休息...")
+            return 20
+
+        # 拉行情
+        with m.stage("fetch"):
+            market_data = self.get_realtime_data(all_codes)
+
+        # 如果没拉到数据，跳过本次循环
+        if not market_data:
+            sys.stdout.write(f"\r[{now.strftime('%H:%M:%S')}] 网络连接中... ")
+            sys.stdout.flush()
+            return 3
+
+        # 只有 (日期, 时间, 价格) 变了的票才往下走
+        with m.stage("diff"):
+            changed = self.changes.diff(market_data)
+        m.count("quotes_seen", len(market_data))
+        m.count("quotes_changed", len(changed))
+
+        # 3. 检查卖出
+        with m.stage("sell"):
+            for row in positions:
+                code = row['code']
+                #  T+1 检查
+                # 如果买入日期等于今天，强制锁仓，跳过后续判断
+                if row['buy_date'] == now.strftime("%Y-%m-%d"):
                     continue
-
-                df_pos = load_portfolio()
-                holding_codes = df_pos['code'].astype(str).tolist() if not df_pos.empty else []
-                watch_codes = list(self.watch_list.keys())
-
-                all_codes = list(set(holding_codes + watch_codes))
-                if not all_codes:
-                    print("😴 暂无目标，休息...")
-                    time.sleep(20)
+                buy_date = datetime.strptime(row['buy_date'], "%Y-%m-%d")
+                hold_days = self.calendar.trading_days_between(buy_date, now)
+                # 止盈/止损只看行情变了的票；到期和价格无关，停牌/一动不动的持仓也要每轮判断
+                info = changed.get(code)
+                if info is None and hold_days < MAX_HOLD_DAYS:
                     continue
-
-                # 拉行情
-                market_data = self.get_realtime_data(all_codes)
-
-                # 如果没拉到数据，跳过本次循环
-                if not market_data:
-                    sys.stdout.write(f"\r[{now.strftime('%H:%M:%S')}] 网络连接中... ")
-                    sys.stdout.flush()
-                    time.sleep(3)
+                info = info or market_data.get(code)
+                if info is None:
                     continue
+                curr_price = info['price'] or info.get('prev_close', 0)  # 停牌时现价为 0，按昨收算
+                if not curr_price:
+                    continue
+                buy_price = row['buy_price']
+                profit_pct = (curr_price - buy_price) / buy_price
+
+                sell_reason = None
+                if code in changed and profit_pct >= TAKE_PROFIT:
+                    sell_reason = f"止盈({profit_pct * 100:.1f}%)"
+                elif code in changed and profit_pct <= STOP_LOSS:
+                    sell_reason = f"止损({profit_pct * 100:.1f}%)"
+                elif hold_days >= MAX_HOLD_DAYS:
+                    sell_reason = "时间到期"
+
+                if sell_reason:
+                    with m.stage("trade_io"):
+                        self.execute_sell(row, curr_price, sell_reason, hold_days)
+
+        # 4. 发现猎物 -> 丢给后台评分，不在这里等
+        with m.stage("buy_scan"):
+            for code, info in changed.items():
+                if code in holding_codes: continue
+                if code not in self.watch_list: continue
+                if code in self.scoring: continue
+
+                current_pct = info['pct']
+
+                if TRIGGER_PCT <= current_pct <= SKIP_HIGH_OPEN:
+                    last_check = self.watch_list[code]['last_check']
+                    if self.clock.time() - last_check > RECHECK_SECONDS:
+                        print(f"\n🔍 发现猎物: {info['name']} (+{current_pct:.2f}%)")
+                        self.scoring.submit(code, current_pct)
+                        self.watch_list[code]['last_check'] = self.clock.time()
+
+        # 5. 收评分结果，按 "现在" 的行情决定买不买
+        for code, score, trigger_pct, latency in self.scoring.drain():
+            m.observe("ai_score", latency)
+            info = market_data.get(code)
+            if score is None or info is None:
+                continue
+            if HAS_AI:
+                print(f"\n   🤖 AI 评分: {info['name']} {score} (耗时 {latency:.1f}s)")
+
+            final_score = (score / 100.0) * AI_COEFF
+            bought = False
+            if final_score < BUY_THRESHOLD:
+                print(f"   ✋ 放弃")
+            elif not TRIGGER_PCT <= info['pct'] <= SKIP_HIGH_OPEN:
+                print(f"   ✋ 评分期间已离开买入窗口 (+{info['pct']:.2f}%)，放弃")
+            else:
+                print("   ⚡ 执行买入！")
+                with m.stage("trade_io"):
+                    self.execute_buy(code, info['name'], info['price'], score)
+                bought = True
+            if self.decisions is not None:
+                self.decisions.append((now, code, trigger_pct, score, bought))
+
+        if changed and hasattr(self.quote_source, "set_tiers"):
+            self.quote_source.set_tiers(self.poll_tiers(positions, market_data, now.strftime("%Y-%m-%d")))
+
+        lag = quote_lag(market_data, self.clock.now())
+        if lag is not None:
+            m.observe("quote_lag", lag)
+
+        sys.stdout.write(
+            f"\r[{now.strftime('%H:%M:%S')}] 监控中... 持仓:{len(holding_codes)} 监控:{len(watch_codes)} "
+            f"变化:{len(changed)}/{len(market_data)} 评分队列:{self.scoring.depth()} (数据正常)   ")
+        sys.stdout.flush()
+        return POLL_INTERVAL
+
+    def run(self, stop_event=None):
+        """stop_event: threading.Event，常驻服务 (nrebound_service.py) 用它叫停；单独运行时 Ctrl+C"""
+        print("🤖 N-Rebound 全自动交易员已上岗...")
+        print(f"🎯 黄金窗口: 涨幅 {TRIGGER_PCT}% ~ {SKIP_HIGH_OPEN}%")
 
-                # 3. 检查卖出
-                for _, row in df_pos.iterrows():
-                    code = str(row['code']).zfill(6)
-                    #  T+1 检查
-                    # 如果买入日期等于今天，强制锁仓，跳过后续判断
-                    if row['buy_date'] == now.strftime("%Y-%m-%d"):
-                        continue
-                    if code not in market_data: continue
-                    info = market_data[code]
-                    curr_price = info['price']
-                    buy_price = row['buy_price']
-                    profit_pct = (curr_price - buy_price) / buy_price
-                    buy_date = datetime.strptime(row['buy_date'], "%Y-%m-%d")
-                    hold_days = (now - buy_date).days
-
-                    sell_reason = None
-                    if profit_pct >= TAKE_PROFIT:
-                        sell_reason = f"止盈({profit_pct * 100:.1f}%)"
-                    elif profit_pct <= STOP_LOSS:
-                        sell_reason = f"止损({profit_pct * 100:.1f}%)"
-                    elif hold_days >= MAX_HOLD_DAYS:
-                        sell_reason = "时间到期"
-
-                    if sell_reason:
-                        self.execute_sell(row, curr_price, sell_reason)
-
-                # 4. 检查买入
-                for code, info in market_data.items():
-                    if code in holding_codes: continue
-                    if code not in self.watch_list: continue
-
-                    current_pct = info['pct']
-
-                    if TRIGGER_PCT <= current_pct <= SKIP_HIGH_OPEN:
-                        last_check = self.watch_list[code]['last_check']
-                        if time.time() - last_check > 1800:
-                            print(f"\n🔍 发现猎物: {info['name']} (+{current_pct:.2f}%)")
-                            score = 0
-                            if HAS_AI:
-                                score, _, _ = ai_engine.predict(code)
-                                print(f"   🤖 AI 评分: {score}")
-                            else:
-                                score = 65
-
-                            final_score = (score / 100.0) * AI_COEFF
-                            if final_score >= BUY_THRESHOLD:
-                                print("   ⚡ 执行买入！")
-                                self.execute_buy(code, info['name'], info['price'], score)
-                            else:
-                                print(f"   ✋ 放弃")
-                            self.watch_list[code]['last_check'] = time.time()
-
-                sys.stdout.write(
-                    f"\r[{now.strftime('%H:%M:%S')}] 监控中... 持仓:{len(holding_codes)} 监控:{len(watch_codes)} (数据正常)   ")
-                sys.stdout.flush()
-                time.sleep(3)
-
+        while stop_event is None or not stop_event.is_set():
+            try:
+                pause = self.run_once()
             except KeyboardInterrupt:
-                print("\n🛑 停止运行。")
                 break
             except Exception as e:
                 print(f"\n❌ 错误: {e}")
-                time.sleep(5)
+                pause = 5
+            try:
+                if stop_event is None:
+                    self.clock.sleep(pause)
+                elif stop_event.wait(pause):
+                    break
+            except KeyboardInterrupt:
+                break
+
+        print("\n🛑 停止运行。")
+        self.close()
+
+    def close(self):
+        self.quote_source.close()
+        self.scoring.shutdown()
+        self.portfolio.close()
+        self.ledger.close()
+        self.metrics.close()
 
 
 if __name__ == "__main__":
@@ -1,7 +1,13 @@
 # -*- coding: utf-8 -*-
 import pandas as pd
+import numpy as np
 import os
 import sys
+from datetime import datetime
+from portfolio_store import load_positions
+from trade_ledger import TradeLedger, LEDGER_NAME
+from trade_rules import INIT_CASH, PAPER_DATA_DIR
+from trade_calendar import get_calendar
 
 # ==========================================
 # 📍 路径防走丢
@@ -9,12 +15,86 @@ import sys
 os.chdir(os.path.dirname(os.path.abspath(__file__)))
 
 # 配置
-DATA_DIR = "paper_trading_data"
-HISTORY_FILE = os.path.join(DATA_DIR, "trade_history.csv")
-PORTFOLIO_FILE = os.path.join(DATA_DIR, "portfolio.csv")
+DATA_DIR = PAPER_DATA_DIR
+LEDGER_FILE = os.path.join(DATA_DIR, LEDGER_NAME)
+RAW_DATA_DIR = "training_data"  # 离线估值用的本地日线
+PANEL_CACHE = "price_panel.npz"  # 有面板缓存就直接用，不用逐个读 CSV
+NAV_FILE = os.path.join(DATA_DIR, "nav_curve.csv")
+OFFLINE = "--offline" in sys.argv  # 不拉实时行情，持仓按本地日线收盘价估值
 
 # 💰 初始本金 (用于计算总收益率)
-INIT_CAPITAL = 100000
+INIT_CAPITAL = INIT_CASH
+
+
+def daily_closes(codes, start):
+    """日期 × 代码 的收盘价表 (停牌日向前填充)"""
+    codes = sorted(set(codes))
+    if not codes:
+        return pd.DataFrame()
+    if os.path.exists(PANEL_CACHE):
+        from price_panel import PricePanel
+        panel = PricePanel.load(PANEL_CACHE)
+        cols = [c for c in codes if c in panel.code_pos]
+        idx = [panel.code_pos[c] for c in cols]
+        closes = pd.DataFrame(panel.close_ff[:, idx], index=pd.to_datetime(panel.dates), columns=cols)
+    else:
+        from event_index import normalize_bars
+        series = {}
+        for code in codes:
+            path = os.path.join(RAW_DATA_DIR, f"{code}.csv")
+            if os.path.exists(path):
+                df = normalize_bars(pd.read_csv(path))
+                series[code] = df.set_index(pd.to_datetime(df['日期']))['收盘']
+        closes = pd.DataFrame(series).ffill()
+    return closes[closes.index >= pd.Timestamp(start)]
+
+
+def live_prices(codes):
+    """一次批量请求拿所有持仓的现价；失败返回空"""
+    if OFFLINE or not codes:
+        return {}
+    try:
+        from sina_quote import fetch_quotes
+        return {c: q['price'] for c, q in fetch_quotes(codes).items() if q['price'] > 0}
+    except Exception:
+        return {}
+
+
+def nav_curve(trips, closes, marks):
+    """
+    每日净值 = 本金 + 累计已实现盈亏 + 当日持仓浮盈。
+    trips 每行是一笔买卖配对 (持有区间 [买入日, 卖出日) )，浮盈用 日期×区间 的矩阵一次算完。
+    """
+    if trips.empty:
+        return pd.DataFrame(columns=["date", "realized", "unrealized", "nav", "drawdown"])
+    start = trips["buy_date"].min()
+    end = max(pd.Timestamp(datetime.now().date()), trips["sell_date"].max())
+    days = pd.DatetimeIndex(get_calendar().trading_days(start, end))  # 节假日不出现在净值曲线里
+    if not closes.empty:
+        days = days.union(closes.index[closes.index >= start])
+
+    realized = trips.dropna(subset=["sell_date"]).groupby("sell_date")["pnl"].sum()
+    realized = realized.reindex(days, fill_value=0.0).cumsum()
+
+    px = closes.reindex(days).ffill() if not closes.empty else pd.DataFrame(index=days)
+    for code, price in marks.items():  # 最后一天用实时价
+        if code not in px.columns:
+            px[code] = np.nan
+        px.iloc[-1, px.columns.get_loc(code)] = price
+
+    unreal = np.zeros(len(days))
+    t = trips[trips["code"].isin(px.columns)]
+    if len(t):
+        d = days.values[:, None]
+        open_mask = (d >= t["buy_date"].values[None, :]) & (
+                t["sell_date"].isna().values[None, :] | (d < t["sell_date"].values[None, :]))
+        price = px[t["code"]].values
+        unreal = np.nansum((price - t["buy_price"].values[None, :]) * t["amount"].values[None, :] * open_mask, axis=1)
+
+    nav = INIT_CAPITAL + realized.values + unreal
+    peak = np.maximum.accumulate(nav)
+    return pd.DataFrame({"date": days, "realized": realized.values, "unrealized": unreal, "nav": nav,
+                         "drawdown": (nav - peak) / peak * 100})
 
 
 def analyze():
@@ -24,83 +104,101 @@ def analyze():
     print("=========================================")
     print(f"💰 初始本金: {INIT_CAPITAL:,.2f} 元")
 
-    if not os.path.exists(HISTORY_FILE):
+    if not os.path.exists(LEDGER_FILE) and not os.path.exists(os.path.join(DATA_DIR, "trade_history.csv")):
+        print("\n❌ 暂无交易记录，等待开张...")
+        return
+
+    ledger = TradeLedger(LEDGER_FILE)
+    trips = ledger.round_trips()
+    ledger.close()
+    df_pos = load_positions(DATA_DIR)  # 快照 + 日志，和交易员内存里的持仓一致
+    if trips.empty and df_pos.empty:
         print("\n❌ 暂无交易记录，等待开张...")
         return
 
-    # 读取数据
-    df_hist = pd.read_csv(HISTORY_FILE)
-    df_pos = pd.read_csv(PORTFOLIO_FILE) if os.path.exists(PORTFOLIO_FILE) else pd.DataFrame()
+    # 账本里没有买单的持仓 (老数据/手工导入) 也要算进去
+    orphan = df_pos[~df_pos["code"].isin(trips.loc[trips["sell_date"].isna(), "code"])]
+    if len(orphan):
+        trips = pd.concat([trips, pd.DataFrame({"code": orphan["code"], "name": orphan["name"],
+                                                "buy_date": orphan["buy_date"], "buy_price": orphan["buy_price"],
+                                                "amount": orphan["amount"]})], ignore_index=True)
+    trips["buy_date"] = pd.to_datetime(trips["buy_date"])
+    trips["sell_date"] = pd.to_datetime(trips["sell_date"])
 
     # ------------------------------------------------
     # 1. 历史战绩统计
     # ------------------------------------------------
-    sell_records = df_hist[df_hist['action'] == 'SELL']
-    total_trades = len(sell_records)
-
-    realized_profit = 0.0
-    wins = 0
-    losses = 0
-
-    if total_trades > 0:
-        for info in sell_records['info']:
-            try:
-                # 解析 "止盈... 盈亏:1200.5"
-                p = float(info.split(':')[-1])
-                realized_profit += p
-                if p > 0:
-                    wins += 1
-                else:
-                    losses += 1
-            except:
-                pass
-
-        win_rate = (wins / total_trades) * 100
-    else:
-        win_rate = 0.0
+    closed = trips.dropna(subset=["sell_date"])
+    total_trades = len(closed)
+    wins = int((closed["pnl"] > 0).sum())
+    losses = total_trades - wins
+    realized_profit = float(closed["pnl"].sum())
+    win_rate = wins / total_trades * 100 if total_trades else 0.0
 
     # ------------------------------------------------
-    # 2. 当前持仓分析
+    # 2. 当前持仓估值 (一次批量行情；拿不到就用本地日线收盘价)
     # ------------------------------------------------
-    holding_cost = 0.0
-    holding_count = 0
-    if not df_pos.empty:
-        holding_cost = df_pos['cost'].sum()
-        holding_count = len(df_pos)
+    holding = trips[trips["sell_date"].isna()].copy()
+    closes = daily_closes(trips["code"], trips["buy_date"].min())
+    marks = live_prices(holding["code"].tolist())
+    last_close = closes.iloc[-1] if not closes.empty else pd.Series(dtype=float)
+    holding["price"] = holding["code"].map(marks).fillna(holding["code"].map(last_close)).fillna(holding["buy_price"])
+    holding["market_value"] = holding["price"] * holding["amount"]
+    holding["pnl"] = (holding["price"] - holding["buy_price"]) * holding["amount"]
+    holding["pnl_pct"] = (holding["price"] / holding["buy_price"] - 1) * 100
+    holding_cost = float((holding["buy_price"] * holding["amount"]).sum())
+    unrealized = float(holding["pnl"].sum())
 
     # ------------------------------------------------
     # 3. 核心指标输出
     # ------------------------------------------------
     print(f"\n🏆 历史胜率: {win_rate:.2f}%  ({wins}胜 / {losses}负)")
     print(f"💸 已落袋盈亏: {realized_profit:+.2f} 元")
+    print(f"🌊 持仓浮动盈亏: {unrealized:+.2f} 元 ({'实时行情' if marks else '日线收盘价'})")
 
-    # 总资产 (近似值，持仓按成本价算)
-    total_asset = INIT_CAPITAL + realized_profit
+    total_asset = INIT_CAPITAL + realized_profit + unrealized
     roi = (total_asset - INIT_CAPITAL) / INIT_CAPITAL * 100
 
-    print(f"📈 账户总收益率: {roi:+.2f}%")
+    nav = nav_curve(trips, closes, marks)
+    if len(nav):
+        nav.to_csv(NAV_FILE, index=False, encoding='utf_8_sig')
+    max_dd = float(nav["drawdown"].min()) if len(nav) else 0.0
+
+    print(f"📈 账户总收益率: {roi:+.2f}% | 最大回撤: {max_dd:.2f}%")
     print("-" * 40)
 
+    if total_trades:
+        g = closed.groupby("reason")
+        by_reason = pd.DataFrame({"笔数": g.size(), "胜率%": g["pnl"].apply(lambda x: (x > 0).mean() * 100),
+                                  "平均%": g["pnl_pct"].mean(), "合计盈亏": g["pnl"].sum(),
+                                  "平均持有天数": g["hold_days"].mean()})
+        print("[按卖出原因]")
+        print(by_reason.round(2).to_string())
+        print("-" * 40)
+
     # ------------------------------------------------
     # 4. 仓位监控
     # ------------------------------------------------
-    cash_left = total_asset - holding_cost
-    position_pct = (holding_cost / total_asset) * 100
+    cash_left = INIT_CAPITAL + realized_profit - holding_cost
+    position_pct = (holding["market_value"].sum() / total_asset) * 100
 
-    print(f"📦 当前持仓: {holding_count} 只股票")
+    print(f"📦 当前持仓: {len(holding)} 只股票")
     print(f"❄️ 占用资金: {holding_cost:,.2f} 元 (仓位 {position_pct:.1f}%)")
     print(f"💵 可用现金: {cash_left:,.2f} 元")
 
-    if not df_pos.empty:
+    if not holding.empty:
         print("\n[持仓明细]")
-        # 简单打印
-        print(df_pos[['code', 'name', 'buy_date', 'buy_price', 'amount']].to_string(index=False))
+        holding["buy_date"] = holding["buy_date"].dt.strftime("%Y-%m-%d")
+        print(holding[['code', 'name', 'buy_date', 'buy_price', 'amount', 'price', 'pnl_pct']].round(2).to_string(
+            index=False))
     else:
         print("\n[持仓状态] 空仓观望中...")
 
+    if len(nav):
+        print(f"\n📉 每日净值已保存: {os.path.abspath(NAV_FILE)}")
     print("=========================================")
 
 
 if __name__ == "__main__":
     analyze()
-    input("\n按回车键退出...")
\ No newline at end of file
+    input("\n按回车键退出...")
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import itertools
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from price_panel import PricePanel, load_panel
+from shared_arrays import to_shared, attach
+from screener_replay import pack_panel, screen_packed
+import backtest
+
+# ==========================================
+# 📍 路径防走丢
+# ==========================================
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+# ==========================================
+# ⚙️ 扫参配置
+# ==========================================
+SWEEP_GRID = {
+    # 打标 / 卖出规则 (同时作用于标签胜率和 paper_bot 规则回测)
+    "TARGET_PROFIT": [3.0, 5.0, 8.0],  # %
+    "STOP_LOSS": [-3.0, -5.0],  # %
+    "FORWARD_WINDOW": [3, 5, 8],  # 交易日
+    # 选股 (night_screener)
+    "VOL_SHRINK_RATIO": [0.8, 1.0, 1.2],
+    "UPPER_SHADOW_LIMIT": [0.03, 0.06],
+    "MAX_POSITION_PCT": [0.4, 0.6, 0.8],
+    # 交易 (paper_bot)
+    "BUY_THRESHOLD": [0.5, 0.55, 0.6],
+}
+SCREEN_KEYS = ("VOL_SHRINK_RATIO", "UPPER_SHADOW_LIMIT", "MAX_POSITION_PCT")
+
+SWEEP_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+SWEEP_START = None  # 例如 "2021-01-01"，None = 面板全部日期
+SCORE_FILE = None  # 可选: [date, code, score] 的 AI 评分表；没有则用 paper_bot 的默认分
+RESULT_FILE = "param_sweep_results.csv"
+
+
+# ==========================================
+# 🏷️ 打标
+# ==========================================
+def label_signals(pk, rows, cols, target_profit, stop_loss, forward_window):
+    """dataset_maker 的打标规则: 信号当天收盘买入，前瞻窗口内先止损判 0，先止盈判 1"""
+    c, h, l = pk["close"], pk["high"], pk["low"]
+    buy = c[rows, cols]
+    label = np.zeros(len(rows), dtype=np.int8)
+    done = np.zeros(len(rows), dtype=bool)
+    P = c.shape[0]
+    for i in range(1, forward_window + 1):
+        rr = rows + i
+        ok = (rr < P) & ~done
+        rr = np.minimum(rr, P - 1)
+        low_pct = (l[rr, cols] - buy) / buy * 100
+        high_pct = (h[rr, cols] - buy) / buy * 100
+        lose = ok & (low_pct <= stop_loss)
+        win = ok & ~lose & (high_pct >= target_profit)
+        label[win] = 1
+        done |= lose | win
+    return label
+
+
+_WORKER = {}
+
+
+def _init_worker(specs, dates, codes, scores):
+    handles, arrays = attach(specs)
+    panel = PricePanel(dates, codes, {f: arrays["p_" + f] for f in ("open", "high", "low", "close", "volume")})
+    panel._close_ff = arrays["p_close_ff"]
+    panel._prev_close = arrays["p_prev_close"]
+    packed = {k[3:]: v for k, v in arrays.items() if k.startswith("pk_")}
+    _WORKER.update(handles=handles, panel=panel, packed=packed, scores=scores)
+
+
+def _run_group(screen_params, combos):
+    """同一组选股参数只选一次股，然后评估该组下的所有打标/交易参数"""
+    panel, pk = _WORKER["panel"], _WORKER["packed"]
+    vol, shadow, max_pos = (screen_params[k] for k in SCREEN_KEYS)
+
+    hit_k = screen_packed(pk, vol, shadow, max_pos)
+    rows, cols = np.nonzero(hit_k)
+    t_idx = pk["date_idx"][rows, cols]
+
+    signals = pd.DataFrame({"date": pd.to_datetime(panel.dates[t_idx]), "code": panel.codes[cols]})
+    scores = _WORKER["scores"]
+    if scores is not None:
+        signals = signals.merge(scores, on=["date", "code"], how="left")
+        signals["score"] = signals["score"].fillna(backtest.DEFAULT_SCORE)
+    else:
+        signals["score"] = backtest.DEFAULT_SCORE
+
+    out = []
+    for params in combos:
+        start = time.time()
+        label = label_signals(pk, rows, cols, params["TARGET_PROFIT"], params["STOP_LOSS"],
+                              params["FORWARD_WINDOW"])
+        _, _, stats = backtest.run_backtest(
+            panel, signals, start=SWEEP_START,
+            take_profit=params["TARGET_PROFIT"] / 100, stop_loss=params["STOP_LOSS"] / 100,
+            max_hold_days=params["FORWARD_WINDOW"], buy_threshold=params["BUY_THRESHOLD"], verbose=False)
+
+        row = dict(params)
+        row.update({
+            "signals": len(rows),
+            "label_win_rate_pct": float(label.mean() * 100) if len(label) else 0.0,
+            "bt_trades": stats.get("trades", 0),
+            "bt_win_rate_pct": stats.get("win_rate_pct", 0.0),
+            "bt_total_return_pct": stats.get("total_return_pct", 0.0),
+            "bt_max_drawdown_pct": stats.get("max_drawdown_pct", 0.0),
+            "bt_sharpe": stats.get("sharpe", 0.0),
+            "seconds": round(time.time() - start, 3),
+        })
+        out.append(row)
+    return out
+
+
+def build_groups():
+    keys = list(SWEEP_GRID.keys())
+    groups = {}
+    for values in itertools.product(*SWEEP_GRID.values()):
+        params = dict(zip(keys, values))
+        key = tuple(params[k] for k in SCREEN_KEYS)
+        groups.setdefault(key, []).append(params)
+    return groups
+
+
+def main():
+    panel = load_panel()
+    print(f"🧱 面板: {panel.shape[0]} 天 × {panel.shape[1]} 只")
+
+    print("🗜️ 正在压实K线 (一次性)...")
+    packed = pack_panel(panel)
+
+    scores = None
+    if SCORE_FILE and os.path.exists(SCORE_FILE):
+        scores = backtest.load_signals(SCORE_FILE)
+
+    arrays = {"p_" + f: getattr(panel, f) for f in ("open", "high", "low", "close", "volume")}
+    arrays["p_close_ff"] = panel.close_ff.astype(np.float32)
+    arrays["p_prev_close"] = panel.prev_close.astype(np.float32)
+    arrays.update({"pk_" + k: v for k, v in packed.items()})
+    del packed
+
+    groups = build_groups()
+    total = sum(len(v) for v in groups.values())
+    workers = max(1, min(SWEEP_WORKERS, len(groups)))
+    print(f"🔍 参数组合: {total} 个 ({len(groups)} 组选股参数) | 进程数: {workers}")
+
+    handles, specs = to_shared(arrays)
+    mb = sum(h.size for h in handles) / 1024 ** 2
+    print(f"🔗 共享内存: {mb:.0f} MB (与进程数无关)")
+
+    rows = []
+    start = time.time()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(specs, panel.dates, panel.codes, scores)) as executor:
+            futures = [executor.submit(_run_group, dict(zip(SCREEN_KEYS, key)), combos)
+                       for key, combos in groups.items()]
+            for future in as_completed(futures):
+                try:
+                    rows.extend(future.result())
+                except Exception as e:
+                    print(f"\n   [!] 组合失败: {e}")
+                print(f"\r   进度: {len(rows)}/{total} | 已用 {time.time() - start:.0f} 秒", end="")
+    finally:
+        for h in handles:
+            h.close()
+            h.unlink()
+
+    if not rows:
+        print("\n❌ 没有结果")
+        return
+
+    df = pd.DataFrame(rows).sort_values(by=["bt_total_return_pct", "bt_sharpe"], ascending=False)
+    df.to_csv(RESULT_FILE, index=False, encoding='utf_8_sig')
+    print(f"\n\n🏁 扫参完成！耗时 {(time.time() - start) / 60:.1f} 分钟")
+    print(f"💾 结果表: {os.path.abspath(RESULT_FILE)}")
+    print(df.head(10).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import json
+import time
+import hashlib
+import subprocess
+from datetime import datetime, timedelta, time as dtime
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from artifact_cache import dir_version
+
+# ==========================================
+# 📍 路径防走丢
+# ==========================================
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+# ==========================================
+# 🔗 夜间流水线 (make 风格)
+# 每个阶段声明 脚本 + 参数 + 输入 + 输出 + 依赖。
+# 指纹 = 脚本内容 + 参数 + 各输入的指纹；和上次成功时一样、且输出没被动过就跳过。
+# 互不依赖的阶段并行跑；上次失败的阶段下次自动从它续跑 (上游成功的都会命中指纹)。
+#
+# 输入/输出指纹:
+#   文件: 内容 md5 (按 大小+修改时间 缓存，没变不重算)
+#   目录: 各文件 名字+大小+修改时间 (K线库几千个文件，逐个读内容太慢)
+# ==========================================
+STATE_FILE = "pipeline_state.json"
+LOG_DIR = "pipeline_logs"
+MAX_PARALLEL = 2
+RESULT_PREFIX = "N_Rebound_Result"  # 必须与 night_screener.RESULT_PREFIX 保持一致
+CLOSE_TIME = dtime(15, 0)
+
+
+def last_close_day(now=None):
+    """已经收盘的最近一个交易日 (YYYYMMDD)；采集和选股每个交易日只需要跑一次"""
+    from trade_calendar import get_calendar
+    cal = get_calendar()
+    now = now or datetime.now()
+    d = now.date()
+    if not (cal.is_trading_day(d) and now.time() >= CLOSE_TIME):
+        d -= timedelta(days=1)
+        while not cal.is_trading_day(d):
+            d -= timedelta(days=1)
+    return d.strftime("%Y%m%d")
+
+
+def close_day_result():
+    """选股结果按所筛的收盘日命名 (必须与 night_screener.result_file 保持一致)，第二天早上查也是同一个文件"""
+    return f"{RESULT_PREFIX}_{last_close_day()}.csv"
+
+
+# --- 阶段定义 ---
+# outputs 里的元素可以是函数 (运行时才知道文件名)；optional_outputs 允许不存在 (比如选股无命中)
+STAGES = {
+    "collect": {"script": "data_collector_raw.py", "inputs": [], "outputs": ["training_data"],
+                "deps": [], "key": last_close_day},
+    "event_index": {"script": "event_index.py", "inputs": ["training_data"],
+                    "outputs": ["limit_up_events.parquet"], "deps": ["collect"]},
+    "price_panel": {"script": "price_panel.py", "inputs": ["training_data"], "outputs": ["price_panel.npz"],
+                    "deps": ["collect"]},
+    "dataset": {"script": "dataset_maker.py", "inputs": ["training_data", "limit_up_events.parquet"],
+                "outputs": ["n_rebound_dataset.csv"], "deps": ["event_index"]},
+    "train": {"script": "train_xgboost.py", "inputs": ["n_rebound_dataset.csv", "training_data"],
+              "outputs": ["n_rebound_xgb.model"], "deps": ["dataset"]},
+    "screen": {"script": "night_screener.py", "inputs": ["limit_up_events.parquet"], "outputs": [],
+               "optional_outputs": [close_day_result], "deps": ["event_index"], "key": last_close_day,
+               "service": "screen"},
+}
+NIGHTLY = ["train", "screen", "price_panel"]
+
+
+# ==========================================
+# 🧬 指纹
+# ==========================================
+class Fingerprinter:
+    def __init__(self, memo=None):
+        self.memo = memo or {}  # 文件路径 -> [大小, 修改时间, md5]
+
+    def file(self, path):
+        st = os.stat(path)
+        cached = self.memo.get(path)
+        if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+            return cached[2]
+        h = hashlib.md5()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        self.memo[path] = [st.st_size, st.st_mtime_ns, h.hexdigest()]
+        return h.hexdigest()
+
+    @staticmethod
+    def directory(path):
+        return dir_version(path)
+
+    def path(self, path):
+        if os.path.isdir(path):
+            return "dir:" + self.directory(path)
+        if os.path.exists(path):
+            return "file:" + self.file(path)
+        return "missing"
+
+
+def _resolve(items):
+    return [item() if callable(item) else item for item in items]
+
+
+def stage_fingerprint(name, stage, fp, extra_args):
+    h = hashlib.md5()
+    h.update(fp.file(stage["script"]).encode())
+    h.update(json.dumps(extra_args.get(name, []) + stage.get("args", [])).encode())
+    if "key" in stage:
+        h.update(stage["key"]().encode())
+    for path in stage["inputs"]:
+        h.update(f"{path}={fp.path(path)};".encode())
+    return h.hexdigest()
+
+
+def output_fingerprints(stage, fp):
+    return {p: fp.path(p) for p in _resolve(stage["outputs"]) + _resolve(stage.get("optional_outputs", []))}
+
+
+# ==========================================
+# 🏃 执行
+# ==========================================
+def load_state():
+    if os.path.exists(STATE_FILE):
+        try:
+            with open(STATE_FILE, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+    return {"stages": {}, "memo": {}}
+
+
+def save_state(state):
+    with open(STATE_FILE + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=1)
+    os.replace(STATE_FILE + ".tmp", STATE_FILE)
+
+
+def closure(targets):
+    """targets 及其所有上游"""
+    need, todo = set(), list(targets)
+    while todo:
+        name = todo.pop()
+        if name not in need:
+            need.add(name)
+            todo.extend(STAGES[name]["deps"])
+    return need
+
+
+def _execute(name, stage, extra_args):
+    """跑一个阶段，返回 (成功?, 说明)。选股阶段优先交给常驻服务"""
+    if stage.get("service"):
+        import nrebound_service
+        if nrebound_service.is_running():
+            resp = nrebound_service.call(stage["service"], wait=True, timeout=6 * 3600)
+            if resp is not None:
+                return bool(resp.get("ok")), "常驻服务"
+    os.makedirs(LOG_DIR, exist_ok=True)
+    log_path = os.path.join(LOG_DIR, f"{name}.log")
+    cmd = [sys.executable, stage["script"]] + stage.get("args", []) + extra_args.get(name, [])
+    with open(log_path, "wb") as log:
+        proc = subprocess.run(cmd, stdout=log, stderr=subprocess.STDOUT,
+                              env={**os.environ, "PYTHONIOENCODING": "utf-8"})
+    return proc.returncode == 0, log_path
+
+
+def run(targets=None, force=(), extra_args=None, max_parallel=MAX_PARALLEL, dry_run=False, upstream=True):
+    """
+    targets   : 要保证最新的阶段 (连同上游)，默认 NIGHTLY
+    force     : 不管指纹强制重跑的阶段 (下游会因为输入变化跟着重跑)
+    extra_args: {阶段: [额外命令行参数]}，也计入指纹
+    upstream  : False 只看 targets 本身 (上游按现有产物算指纹，不去跑采集等)，早上启动时用
+    返回 {阶段: "skipped" / "done" / "failed" / "blocked"}
+    """
+    extra_args = extra_args or {}
+    need = closure(targets or NIGHTLY) if upstream else set(targets or NIGHTLY)
+    state = load_state()
+    fp = Fingerprinter(state.get("memo"))
+    results = {}
+    t_all = time.time()
+
+    def ready(name):
+        return name not in results and all(d in results for d in STAGES[name]["deps"] if d in need)
+
+    def check(name):
+        """指纹命中返回 True (可以跳过)"""
+        stage = STAGES[name]
+        prev = state["stages"].get(name)
+        if name in force or prev is None or prev.get("status") != "done":
+            return False
+        if prev.get("fingerprint") != stage_fingerprint(name, stage, fp, extra_args):
+            return False
+        return prev.get("outputs") == output_fingerprints(stage, fp)
+
+    running = {}
+    with ThreadPoolExecutor(max_workers=max_parallel) as pool:
+        while len(results) < len(need):
+            for name in sorted(n for n in need if ready(n) and n not in running):
+                deps = [d for d in STAGES[name]["deps"] if d in need]
+                if any(results[d] in ("failed", "blocked") for d in deps):
+                    results[name] = "blocked"
+                    print(f"⛔ {name}: 上游失败，跳过")
+                    continue
+                if check(name):
+                    results[name] = "skipped"
+                    print(f"✅ {name}: 已是最新")
+                    continue
+                if dry_run and any(results[d] == "stale" for d in deps):
+                    results[name] = "stale"
+                    print(f"🔸 {name}: 上游需要重跑")
+                    continue
+                if dry_run:
+                    results[name] = "stale"
+                    print(f"🔸 {name}: 需要重跑")
+                    continue
+                print(f"▶ {name}: 开始 ({STAGES[name]['script']})")
+                running[name] = (pool.submit(_execute, name, STAGES[name], extra_args), time.time(),
+                                 stage_fingerprint(name, STAGES[name], fp, extra_args))
+            if not running:
+                continue
+            done, _ = wait([f for f, _, _ in running.values()], return_when=FIRST_COMPLETED)
+            for name in [n for n, (f, _, _) in running.items() if f in done]:
+                future, t0, fingerprint = running.pop(name)
+                try:
+                    ok, where = future.result()
+                except Exception as e:
+                    ok, where = False, f"{type(e).__name__}: {e}"
+                stage = STAGES[name]
+                outputs = output_fingerprints(stage, fp)
+                missing = [p for p in _resolve(stage["outputs"]) if outputs[p] == "missing"]
+                if ok and missing:
+                    ok, where = False, f"缺少输出 {missing} ({where})"
+                results[name] = "done" if ok else "failed"
+                state["stages"][name] = {
+                    "status": results[name], "fingerprint": fingerprint, "outputs": outputs,
+                    "finished": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    "seconds": round(time.time() - t0, 1),
+                }
+                state["memo"] = fp.memo
+                save_state(state)
+                print(f"{'✅' if ok else '❌'} {name}: {'完成' if ok else '失败'} "
+                      f"({time.time() - t0:.1f}s) | {where}")
+
+    state["memo"] = fp.memo
+    if not dry_run:
+        save_state(state)
+    print(f"🔗 流水线结束 ({time.time() - t_all:.1f}s): " + ", ".join(f"{k}={v}" for k, v in sorted(results.items())))
+    return results
+
+
+if __name__ == "__main__":
+    # 用法: python pipeline.py [阶段 ...] [--force=阶段,阶段] [--dry-run]
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    force = next((a.split("=", 1)[1].split(",") for a in sys.argv[1:] if a.startswith("--force=")), [])
+    unknown = [a for a in args + force if a not in STAGES]
+    if unknown:
+        print(f"❌ 未知阶段: {unknown}，可选: {list(STAGES)}")
+        sys.exit(1)
+    res = run(args or None, force=force, dry_run="--dry-run" in sys.argv)
+    sys.exit(1 if "failed" in res.values() else 0)
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+import math
+import time
+from sina_quote import CHUNK_SIZE
+
+# ==========================================
+# 🎚️ 分级轮询
+# 不是所有票都值得每 3 秒拉一次:
+#   hot : 持仓里离止盈/止损线很近的票 —— 决定马上要做，刷得最快
+#   warm: 观察池里离触发窗口不远的票
+#   cold: 其余 (离得远的持仓、T+1 锁仓、冷却中的、离窗口很远的观察票)
+# 每只票按所在档位的间隔到期；每轮只拉到期的票，并受全局请求预算 (令牌桶) 约束。
+# 档位由调用方 (paper_bot / day_radar) 根据最新行情每轮重算，升档立即生效。
+# ==========================================
+HOT, WARM, COLD = "hot", "warm", "cold"
+TIER_INTERVALS = {HOT: 1.5, WARM: 3, COLD: 12}  # 秒
+TICK_INTERVAL = min(TIER_INTERVALS.values())  # 主循环节拍
+DEFAULT_TIER = WARM  # 还没分过档的票 (刚加进来、还没有行情)
+REQUEST_BUDGET = 40  # 每分钟最多请求新浪几次
+BURST_SECONDS = 5  # 令牌桶最多攒几秒的额度
+FILL_RATIO = 0.5  # 凑满一次请求时，只捎带已经过了半个间隔的票
+
+
+def merge_tiers(*tier_maps):
+    """多个订阅者对同一只票给出不同档位时取最热的"""
+    rank = {HOT: 0, WARM: 1, COLD: 2}
+    merged = {}
+    for tiers in tier_maps:
+        for code, tier in tiers.items():
+            if code not in merged or rank.get(tier, 1) < rank.get(merged[code], 1):
+                merged[code] = tier
+    return merged
+
+
+class PollScheduler:
+    def __init__(self, intervals=None, budget=REQUEST_BUDGET, chunk_size=CHUNK_SIZE):
+        self.intervals = intervals or TIER_INTERVALS
+        self.budget = budget
+        self.chunk_size = chunk_size
+        self.tiers = {}  # 代码 -> 档位
+        self.last = {}  # 代码 -> 上次拉取时刻
+        self.tokens = budget / 60 * BURST_SECONDS
+        self._refill_ts = None
+        self.requests = 0
+        self.polled = 0
+        self.deferred = 0  # 到期了但预算不够，推迟到下一轮的次数
+
+    def set_tiers(self, tiers):
+        self.tiers.update(tiers)
+
+    def interval(self, code):
+        return self.intervals.get(self.tiers.get(code, DEFAULT_TIER), self.intervals[DEFAULT_TIER])
+
+    def _refill(self, now):
+        rate = self.budget / 60
+        if self._refill_ts is not None:
+            self.tokens = min(self.tokens + (now - self._refill_ts) * rate, max(rate * BURST_SECONDS, 1))
+        self._refill_ts = now
+
+    def take(self, codes, now=None):
+        """从 codes 里挑出这一轮该拉的票 (调用方随后必须去拉)，按 "过期程度" 从高到低"""
+        now = time.time() if now is None else now
+        self._refill(now)
+        ratio = {c: (now - self.last[c]) / self.interval(c) if c in self.last else math.inf for c in codes}
+        due = sorted((c for c in codes if ratio[c] >= 1), key=ratio.get, reverse=True)
+        if not due:
+            return []
+
+        n_req = min(math.ceil(len(due) / self.chunk_size), int(self.tokens))
+        if n_req == 0:
+            self.deferred += len(due)
+            return []
+        picked = due[:n_req * self.chunk_size]
+        self.deferred += len(due) - len(picked)
+
+        # 最后一个请求没装满的话，顺带捎上快到期的票，不额外花请求
+        room = n_req * self.chunk_size - len(picked)
+        if room > 0:
+            soon = sorted((c for c in codes if FILL_RATIO <= ratio[c] < 1), key=ratio.get, reverse=True)
+            picked += soon[:room]
+
+        self.tokens -= n_req
+        self.requests += n_req
+        self.polled += len(picked)
+        for c in picked:
+            self.last[c] = now
+        return picked
+
+    def forget(self, keep):
+        """清掉不再关注的票"""
+        for d in (self.tiers, self.last):
+            for c in [c for c in d if c not in keep]:
+                del d[c]
+
+    def stats(self):
+        counts = {HOT: 0, WARM: 0, COLD: 0}
+        for tier in self.tiers.values():
+            counts[tier] = counts.get(tier, 0) + 1
+        return {"requests": self.requests, "polled": self.polled, "deferred": self.deferred, "tiers": counts}
+
+
+class TieredQuoteSource:
+    """
+    行情源包装 (接口同 quote_source.SinaQuoteSource): 每轮只让 inner 拉到期的票，
+    其余返回上一次拉到的快照。
+    """
+
+    def __init__(self, inner, scheduler=None, clock=None):
+        self.inner = inner
+        self.scheduler = scheduler or PollScheduler()
+        self.clock = clock
+        self.cache = {}
+
+    def set_tiers(self, tiers):
+        self.scheduler.set_tiers(tiers)
+
+    def fetch(self, codes):
+        now = self.clock.time() if self.clock is not None else time.time()
+        picked = self.scheduler.take(codes, now)
+        if picked:
+            self.cache.update(self.inner.fetch(picked))
+        return {c: self.cache[c] for c in codes if c in self.cache}
+
+    def close(self):
+        self.inner.close()
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import time
+import pandas as pd
+
+# ==========================================
+# 🏦 持仓存储: 内存字典 + 预写日志 (journal) + 定期快照
+#   - 每次开/平仓先追加一行 JSON 到 portfolio_journal.jsonl 并 fsync，再改内存
+#   - 每隔 SNAPSHOT_EVERY 次变更 / SNAPSHOT_INTERVAL 秒，把内存持仓原子写成 portfolio.csv
+#     (先写临时文件再 os.replace)，同时记下快照对应的日志序号，然后清空日志
+#   - 断电重启: 读快照 + 重放序号更大的日志，恢复到最后一次变更，然后立刻做一次快照
+#     (日志清空，写了一半的尾行不会被后面的新条目粘上)
+#   开/平仓都是幂等的 (按代码覆盖/删除)，快照写了一半也能安全重放
+# ==========================================
+SNAPSHOT_FILE = "portfolio.csv"  # 文件名与格式不变，老工具/手工查看照常可读
+META_FILE = "portfolio_snapshot.json"  # {"seq": 快照对应的日志序号, "time": ...}
+JOURNAL_FILE = "portfolio_journal.jsonl"
+SNAPSHOT_EVERY = 20
+SNAPSHOT_INTERVAL = 60
+
+COLUMNS = ["code", "name", "buy_date", "buy_price", "amount", "cost"]
+
+
+def _read_snapshot(data_dir):
+    """快照 -> ({代码: 持仓}, 快照序号)"""
+    positions, seq = {}, 0
+    path = os.path.join(data_dir, SNAPSHOT_FILE)
+    if os.path.exists(path):
+        df = pd.read_csv(path, dtype={"code": str})
+        for row in df.to_dict("records"):
+            pos = _normalize(row)
+            positions[pos["code"]] = pos
+    meta = os.path.join(data_dir, META_FILE)
+    if os.path.exists(meta):
+        with open(meta, "r", encoding="utf-8") as f:
+            seq = json.load(f).get("seq", 0)
+    return positions, seq
+
+
+def _normalize(pos):
+    return {
+        "code": str(pos["code"]).zfill(6),
+        "name": pos["name"],
+        "buy_date": str(pos["buy_date"]),
+        "buy_price": float(pos["buy_price"]),
+        "amount": int(pos["amount"]),
+        "cost": float(pos["cost"]),
+    }
+
+
+def _apply(positions, entry):
+    if entry["op"] == "open":
+        positions[entry["pos"]["code"]] = _normalize(entry["pos"])
+    elif entry["op"] == "close":
+        positions.pop(entry["code"], None)
+
+
+def _replay_journal(data_dir, positions, after_seq):
+    """重放日志里序号 > after_seq 的条目，返回最后的序号。写了一半的行直接跳过 (条目幂等，后面的照常重放)"""
+    seq = after_seq
+    path = os.path.join(data_dir, JOURNAL_FILE)
+    if not os.path.exists(path):
+        return seq
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # 掉电时写了一半 (老版本续写时还会把下一条粘在后面)
+            if entry["seq"] <= after_seq:
+                continue
+            _apply(positions, entry)
+            seq = entry["seq"]
+    return seq
+
+
+def load_positions(data_dir):
+    """只读恢复当前持仓 (快照 + 日志)，给复盘/监控用，返回 DataFrame"""
+    positions, seq = _read_snapshot(data_dir)
+    _replay_journal(data_dir, positions, seq)
+    return pd.DataFrame(list(positions.values()), columns=COLUMNS)
+
+
+class PortfolioTail:
+    """
+    只读跟随交易员的持仓 (给盘中监控面板用): 记住日志读到的字节偏移，每次只读新追加的行。
+    交易员做快照时会改写 META_FILE 并清空日志 -> 重读一次快照、偏移归零。
+    刷新代价只和新增条数 + 当前持仓数有关，与历史长短无关。
+    """
+
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.journal = os.path.join(data_dir, JOURNAL_FILE)
+        self.meta = os.path.join(data_dir, META_FILE)
+        self._snap_key = None
+        self._reload(self._meta_key())
+
+    def _meta_key(self):
+        return os.stat(self.meta).st_mtime_ns if os.path.exists(self.meta) else None
+
+    def _reload(self, snap_key):
+        self.positions, self.seq = _read_snapshot(self.data_dir)
+        self.offset = 0
+        self._snap_key = snap_key
+
+    def poll(self):
+        """应用新追加的日志条目，返回条数。尾部写了一半的行留到下次再读"""
+        snap_key = self._meta_key()
+        size = os.path.getsize(self.journal) if os.path.exists(self.journal) else 0
+        if snap_key != self._snap_key or size < self.offset:
+            self._reload(snap_key)
+        if size <= self.offset:
+            return 0
+        with open(self.journal, "rb") as f:
+            f.seek(self.offset)
+            chunk = f.read(size - self.offset)
+        end = chunk.rfind(b"\n") + 1
+        n = 0
+        for line in chunk[:end].splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry["seq"] <= self.seq:
+                continue
+            _apply(self.positions, entry)
+            self.seq = entry["seq"]
+            n += 1
+        self.offset += end
+        return n
+
+    def rows(self):
+        return [dict(p) for p in self.positions.values()]
+
+
+class PortfolioStore:
+    def __init__(self, data_dir, snapshot_every=SNAPSHOT_EVERY, snapshot_interval=SNAPSHOT_INTERVAL, fsync=True):
+        self.data_dir = data_dir
+        self.snapshot_every = snapshot_every
+        self.snapshot_interval = snapshot_interval
+        self.fsync = fsync
+        os.makedirs(data_dir, exist_ok=True)
+
+        self.positions, self.snapshot_seq = _read_snapshot(data_dir)
+        self.seq = _replay_journal(data_dir, self.positions, self.snapshot_seq)
+        self._journal = open(os.path.join(data_dir, JOURNAL_FILE), "a", encoding="utf-8")
+        self._last_snapshot = time.time()
+        if self.seq > self.snapshot_seq:
+            print(f"♻️ 持仓已从日志恢复: {len(self.positions)} 只 (重放 {self.seq - self.snapshot_seq} 条)")
+        if self._journal.tell() > 0:
+            self.snapshot()  # 重放完马上落快照并清空日志 (顺带清掉写了一半的尾行)
+
+    # --- 查询 ---
+    def __contains__(self, code):
+        return code in self.positions
+
+    def __len__(self):
+        return len(self.positions)
+
+    def codes(self):
+        return list(self.positions.keys())
+
+    def rows(self):
+        """持仓列表的拷贝 (遍历时可以放心平仓)"""
+        return [dict(p) for p in self.positions.values()]
+
+    def used_cash(self):
+        return sum(p["cost"] for p in self.positions.values())
+
+    def to_frame(self):
+        return pd.DataFrame(self.rows(), columns=COLUMNS)
+
+    # --- 变更 (先写日志再改内存) ---
+    def open_position(self, code, name, buy_date, buy_price, amount, cost):
+        pos = {"code": code, "name": name, "buy_date": buy_date, "buy_price": buy_price, "amount": amount,
+               "cost": cost}
+        self._commit({"op": "open", "pos": pos})
+
+    def close_position(self, code):
+        self._commit({"op": "close", "code": code})
+
+    def _commit(self, entry):
+        entry["seq"] = self.seq + 1
+        entry["ts"] = time.time()
+        self._journal.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+        self.seq = entry["seq"]
+        _apply(self.positions, entry)
+        self.maybe_snapshot()
+
+    # --- 快照 ---
+    def maybe_snapshot(self):
+        pending = self.seq - self.snapshot_seq
+        if pending and (pending >= self.snapshot_every or time.time() - self._last_snapshot >= self.snapshot_interval):
+            self.snapshot()
+
+    def _sync(self, f):
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+
+    def snapshot(self):
+        # 快照和序号都 fsync 之后才能清空日志，否则掉电可能两头都没了
+        path = os.path.join(self.data_dir, SNAPSHOT_FILE)
+        with open(path + ".tmp", "w", encoding='utf_8_sig', newline="") as f:
+            self.to_frame().to_csv(f, index=False)
+            self._sync(f)
+        os.replace(path + ".tmp", path)
+
+        meta = os.path.join(self.data_dir, META_FILE)
+        with open(meta + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"seq": self.seq, "time": time.strftime("%Y-%m-%d %H:%M:%S")}, f)
+            self._sync(f)
+        os.replace(meta + ".tmp", meta)
+
+        # 快照已经覆盖了日志里的所有条目，日志从头再记
+        self._journal.seek(0)
+        self._journal.truncate()
+        self.snapshot_seq = self.seq
+        self._last_snapshot = time.time()
+
+    def close(self):
+        if self.seq > self.snapshot_seq:
+            self.snapshot()
+        self._journal.close()
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+import os
+import hashlib
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from event_index import normalize_bars
+
+# ==========================================
+# 📍 路径防走丢
+# ==========================================
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+# --- ⚙️ 配置 ---
+RAW_DATA_DIR = "training_data"
+PANEL_CACHE = "price_panel.npz"  # 面板缓存 (本地K线没变就直接秒读)
+FIELDS = ("open", "high", "low", "close", "volume")
+MAX_WORKERS = 8
+
+_COL_MAP = {"open": "开盘", "high": "最高", "low": "最低", "close": "收盘", "volume": "成交量"}
+
+
+# ==========================================
+# 🧱 价格面板: 日期 × 股票 的二维数组 (停牌/未上市为 NaN)
+# ==========================================
+class PricePanel:
+    def __init__(self, dates, codes, arrays):
+        self.dates = np.asarray(dates, dtype="datetime64[D]")
+        self.codes = np.asarray(codes).astype(str)
+        self.code_pos = {c: i for i, c in enumerate(self.codes)}
+        self.fingerprint = ""
+        for f in FIELDS:
+            setattr(self, f, arrays[f])
+        self._close_ff = None
+        self._prev_close = None
+
+    @property
+    def shape(self):
+        return self.close.shape
+
+    @property
+    def close_ff(self):
+        """停牌日沿用上一个收盘价 (用于市值估算)"""
+        if self._close_ff is None:
+            self._close_ff = pd.DataFrame(self.close).ffill().values
+        return self._close_ff
+
+    @property
+    def prev_close(self):
+        """昨收: 上一个有成交日的收盘价 (与新浪行情口径一致)"""
+        if self._prev_close is None:
+            pc = np.full_like(self.close, np.nan)
+            pc[1:] = self.close_ff[:-1]
+            self._prev_close = pc
+        return self._prev_close
+
+    def date_index(self, date, side="left"):
+        return int(np.searchsorted(self.dates, np.datetime64(pd.Timestamp(date), "D"), side=side))
+
+    def save(self, path=PANEL_CACHE, fingerprint=""):
+        np.savez(path, dates=self.dates, codes=self.codes, fingerprint=np.array(fingerprint),
+                 **{f: getattr(self, f) for f in FIELDS})
+
+    @classmethod
+    def load(cls, path=PANEL_CACHE):
+        with np.load(path, allow_pickle=False) as z:
+            panel = cls(z["dates"], z["codes"], {f: z[f] for f in FIELDS})
+            panel.fingerprint = str(z["fingerprint"])
+        return panel
+
+
+def store_fingerprint(data_dir=RAW_DATA_DIR):
+    """本地K线库的版本号 (文件名 + 大小 + 修改时间)"""
+    h = hashlib.md5()
+    for f in sorted(os.listdir(data_dir)):
+        if f.endswith(".csv"):
+            st = os.stat(os.path.join(data_dir, f))
+            h.update(f"{f}:{st.st_size}:{st.st_mtime_ns};".encode())
+    return h.hexdigest()
+
+
+def _read_one(file_path):
+    try:
+        df = normalize_bars(pd.read_csv(file_path))
+        df = df.drop_duplicates(subset="日期", keep="last")
+        return os.path.basename(file_path).replace(".csv", ""), df
+    except Exception:
+        return None, None
+
+
+def build_panel(data_dir=RAW_DATA_DIR):
+    """把本地所有 CSV 对齐成一个面板"""
+    files = [os.path.join(data_dir, f) for f in os.listdir(data_dir) if f.endswith(".csv")]
+    print(f"🧱 正在构建价格面板 (共 {len(files)} 个文件)...")
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        loaded = [(c, df) for c, df in executor.map(_read_one, files) if df is not None and not df.empty]
+
+    loaded.sort(key=lambda x: x[0])
+    codes = [c for c, _ in loaded]
+    dates = np.unique(np.concatenate([df['日期'].values.astype("datetime64[D]") for _, df in loaded]))
+
+    arrays = {f: np.full((len(dates), len(codes)), np.nan, dtype=np.float32) for f in FIELDS}
+    for j, (_, df) in enumerate(loaded):
+        rows = np.searchsorted(dates, df['日期'].values.astype("datetime64[D]"))
+        for f in FIELDS:
+            col = _COL_MAP[f]
+            if col in df.columns:
+                arrays[f][rows, j] = df[col].values
+
+    print(f"✅ 面板构建完成: {len(dates)} 个交易日 × {len(codes)} 只股票")
+    return PricePanel(dates, codes, arrays)
+
+
+def load_panel(data_dir=RAW_DATA_DIR, cache_path=PANEL_CACHE):
+    """优先读缓存；本地K线有变化则重建并刷新缓存"""
+    fp = store_fingerprint(data_dir)
+    if os.path.exists(cache_path):
+        try:
+            panel = PricePanel.load(cache_path)
+            if panel.fingerprint == fp:
+                return panel
+        except Exception:
+            pass
+    panel = build_panel(data_dir)
+    panel.save(cache_path, fingerprint=fp)
+    return panel
+
+
+if __name__ == "__main__":
+    p = load_panel()
+    print(f"面板尺寸: {p.shape} | {p.dates[0]} ~ {p.dates[-1]}")
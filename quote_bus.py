@@ -0,0 +1,400 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import json
+import time
+import math
+import subprocess
+import numpy as np
+from datetime import datetime
+from multiprocessing import shared_memory
+from sina_quote import fetch_quotes, CHUNK_SIZE
+from tick_recorder import TickRecorder, TICK_DTYPE, _quote_seconds
+from loop_metrics import LoopMetrics
+from trade_calendar import get_calendar
+from change_detector import ChangeDetector
+from poll_scheduler import PollScheduler, TICK_INTERVAL, merge_tiers
+
+# ==========================================
+# 📍 路径防走丢
+# ==========================================
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+# ==========================================
+# 🚌 行情总线
+# 一个发布进程轮询所有订阅者代码的并集，把最新快照写进共享内存；
+# paper_bot / day_radar / web_monitor 各自订阅自己的代码，直接从共享内存读，不再各拉各的。
+#
+# 共享内存布局: [64 字节头][MAX_CODES 个定长槽位]
+#   头里的 seq 是顺序锁: 写之前 +1 (奇数 = 正在写)，写完再 +1；
+#   读者前后两次读到同一个偶数 seq 才算读到完整快照，读的时候只拷贝自己订阅的那几行。
+# 订阅: SUB_DIR/<订阅者>.json = {"codes": [...], "tiers": {代码: 档位}, "heartbeat": 时间戳, "ttl": 秒}，
+#   心跳超过 ttl 的订阅视为失效。发布进程按各订阅者给的档位 (取最热) 分级轮询，见 poll_scheduler.py。
+# ==========================================
+SHM_NAME = "nrebound_quote_bus"
+SUB_DIR = "quote_bus_subs"
+STOP_SIGNAL_FILE = "STOP_QUOTE_BUS_SIGNAL"
+MAX_CODES = 4096
+POLL_INTERVAL = TICK_INTERVAL  # 发布节拍；每只票多久刷新一次由档位决定
+PREOPEN_SECONDS = 15 * 60  # 9:15 集合竞价起就开始发布
+IDLE_TICK = 5  # 没有订阅/休市时多久检查一次 (同时刷新心跳)
+IDLE_EXIT = 1800  # 连续这么久没有任何订阅就退出
+BUS_TTL = 10  # 发布进程心跳超过这么久视为挂了，订阅者自己拉行情
+SUB_TTL = 30  # 订阅心跳的默认有效期
+SUB_HEARTBEAT = 10
+SUB_GRACE = 2 * POLL_INTERVAL  # 新订阅的代码在这段时间内总线里还没有，先自己拉
+RECORD_TICKS = True  # 发布进程统一录行情 (tick_data/日期/quote_bus.ticks)
+METRICS_PORT = 9303
+
+MAGIC = 0x4E524253  # "NRBS"
+HEADER_DTYPE = np.dtype([("magic", "<u4"), ("count", "<u4"), ("seq", "<u8"), ("publish_ts", "<f8"),
+                         ("heartbeat", "<f8"), ("pid", "<u4")])
+HEADER_SIZE = 64
+SLOT_DTYPE = np.dtype(TICK_DTYPE.descr + [("quote_date", "<i4"), ("name", "<U8")])
+SHM_SIZE = HEADER_SIZE + MAX_CODES * SLOT_DTYPE.itemsize
+
+
+def _views(buf):
+    header = np.ndarray((1,), dtype=HEADER_DTYPE, buffer=buf)
+    slots = np.ndarray((MAX_CODES,), dtype=SLOT_DTYPE, buffer=buf, offset=HEADER_SIZE)
+    return header, slots
+
+
+def _attach_shm(name=SHM_NAME):
+    """挂载已有的共享内存段 (不登记到 resource_tracker，避免读者退出时把段删掉)"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        if os.name == "posix":
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+def _quote_date(d):
+    try:
+        return int(d.replace("-", ""))
+    except (AttributeError, ValueError):
+        return 0
+
+
+def rows_to_quotes(rows):
+    """槽位 -> 与 sina_quote.fetch_quotes 相同格式的字典"""
+    quotes = {}
+    for r in rows:
+        code = str(int(r["code"])).zfill(6)
+        prev_close, price = float(r["prev_close"]), float(r["price"])
+        qt, qd = int(r["quote_time"]), int(r["quote_date"])
+        quotes[code] = {
+            'name': str(r["name"]), 'price': price,
+            'pct': (price - prev_close) / prev_close * 100 if prev_close else 0.0,
+            'open': float(r["open"]), 'prev_close': prev_close, 'high': float(r["high"]), 'low': float(r["low"]),
+            'volume': float(r["volume"]), 'amount': float(r["amount"]),
+            'date': f"{qd // 10000:04d}-{qd // 100 % 100:02d}-{qd % 100:02d}" if qd else "",
+            'time': f"{qt // 3600:02d}:{qt // 60 % 60:02d}:{qt % 60:02d}" if qt >= 0 else "",
+        }
+    return quotes
+
+
+# ==========================================
+# 📤 发布端
+# ==========================================
+class QuotePublisher:
+    def __init__(self, name=SHM_NAME):
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=SHM_SIZE)
+        except FileExistsError:
+            old = _attach_shm(name)
+            header, _ = _views(old.buf)
+            beat = float(header["heartbeat"][0])
+            del header, _
+            old.close()
+            if time.time() - beat < BUS_TTL:
+                raise RuntimeError("已有行情总线在运行")
+            # 上一个发布进程异常退出留下的段: 接管
+            try:
+                shared_memory.SharedMemory(name=name).unlink()
+            except FileNotFoundError:
+                pass
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=SHM_SIZE)
+        self.header, self.slots = _views(self.shm.buf)
+        self.header[0] = (MAGIC, 0, 0, 0.0, time.time(), os.getpid())
+        self.slot_of = {}  # 代码 -> 槽位
+        self._sub_cache = {}  # 文件名 -> (mtime_ns, 订阅内容)
+
+    def beat(self):
+        self.header["heartbeat"] = time.time()
+
+    def subscriptions(self):
+        """所有未过期订阅的 (代码并集, 合并后的档位)"""
+        now = time.time()
+        codes, tier_maps = set(), []
+        if not os.path.exists(SUB_DIR):
+            return codes, {}
+        for f in os.listdir(SUB_DIR):
+            if not f.endswith(".json"):
+                continue
+            path = os.path.join(SUB_DIR, f)
+            try:
+                mtime = os.stat(path).st_mtime_ns
+                cached = self._sub_cache.get(f)
+                if cached is None or cached[0] != mtime:
+                    with open(path, "r", encoding="utf-8") as fh:
+                        cached = (mtime, json.load(fh))
+                    self._sub_cache[f] = cached
+            except (OSError, ValueError):
+                continue
+            sub = cached[1]
+            if now - sub.get("heartbeat", 0) <= sub.get("ttl", SUB_TTL):
+                codes.update(sub.get("codes", []))
+                tier_maps.append(sub.get("tiers", {}))
+        return codes, merge_tiers(*tier_maps)
+
+    def publish(self, quotes):
+        rows, idx = [], []
+        for code, q in quotes.items():
+            slot = self.slot_of.get(code)
+            if slot is None:
+                if len(self.slot_of) >= MAX_CODES:
+                    continue
+                slot = self.slot_of[code] = len(self.slot_of)
+            idx.append(slot)
+            rows.append((int(code), _quote_seconds(q.get('time', '')), q['price'], q.get('prev_close', 0),
+                         q.get('open', 0), q.get('high', 0), q.get('low', 0), q.get('volume', 0), q.get('amount', 0),
+                         _quote_date(q.get('date', '')), q.get('name', '')[:8]))
+        if not rows:
+            return
+        data = np.array(rows, dtype=SLOT_DTYPE)
+        h = self.header
+        h["seq"] += 1  # 奇数: 写入中
+        self.slots[idx] = data
+        h["count"] = len(self.slot_of)
+        h["publish_ts"] = time.time()
+        h["seq"] += 1  # 偶数: 写完
+
+    def close(self):
+        self.header["heartbeat"] = 0.0
+        del self.header, self.slots
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def run_publisher():
+    try:
+        pub = QuotePublisher()
+    except RuntimeError as e:
+        print(f"🚌 {e}，本进程退出")
+        return
+    print(f"🚌 行情总线已启动 (pid {os.getpid()})，节拍 {POLL_INTERVAL} 秒，按档位分级刷新")
+    recorder = TickRecorder("quote_bus") if RECORD_TICKS else None
+    metrics = LoopMetrics("quote_bus", POLL_INTERVAL, port=METRICS_PORT)
+    cal = get_calendar()
+    scheduler = PollScheduler()
+    changes = ChangeDetector()  # 没变的票不用再写共享内存
+    last_sub = time.time()
+    if os.path.exists(STOP_SIGNAL_FILE):
+        os.remove(STOP_SIGNAL_FILE)
+    try:
+        while not os.path.exists(STOP_SIGNAL_FILE):
+            pub.beat()
+            now = datetime.now()
+            codes, tiers = pub.subscriptions()
+            if codes:
+                last_sub = time.time()
+            elif time.time() - last_sub > IDLE_EXIT:
+                print("🚌 长时间没有订阅者，总线退出")
+                break
+            active = cal.is_trading_time(now) or (cal.next_session_start(now) - now).total_seconds() <= PREOPEN_SECONDS
+            if not codes or not active:
+                time.sleep(IDLE_TICK)
+                continue
+
+            t0 = time.perf_counter()
+            scheduler.forget(codes)
+            scheduler.set_tiers(tiers)
+            picked = scheduler.take(sorted(codes))
+            if picked:
+                metrics.loop_start()
+                quotes = fetch_quotes(picked, recorder=recorder, metrics=metrics)
+                with metrics.stage("publish"):
+                    changed = changes.diff(quotes)
+                    pub.publish(changed)
+                metrics.loop_end()
+                metrics.count("requests", math.ceil(len(picked) / CHUNK_SIZE))
+                metrics.count("codes_polled", len(picked))
+                metrics.count("quotes_changed", len(changed))
+            time.sleep(max(POLL_INTERVAL - (time.perf_counter() - t0), 0))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if os.path.exists(STOP_SIGNAL_FILE):
+            try:
+                os.remove(STOP_SIGNAL_FILE)
+            except OSError:
+                pass
+        pub.close()
+        if recorder is not None:
+            recorder.close()
+        metrics.close()
+        print("🚌 行情总线已停止")
+
+
+def start_publisher():
+    """后台拉起发布进程 (已经有在跑的话新进程会自己退出)"""
+    python_dir = os.path.dirname(sys.executable)
+    pythonw = os.path.join(python_dir, "pythonw.exe")
+    if not os.path.exists(pythonw): pythonw = sys.executable
+    script = os.path.abspath(__file__)
+    if os.name == "nt":
+        subprocess.Popen([pythonw, script], creationflags=0x08000000)
+    else:
+        subprocess.Popen([sys.executable, script], start_new_session=True,
+                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+# ==========================================
+# 📥 订阅端
+# ==========================================
+def subscribe(name, codes, ttl=SUB_TTL, tiers=None):
+    os.makedirs(SUB_DIR, exist_ok=True)
+    path = os.path.join(SUB_DIR, f"{name}.json")
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"codes": sorted(codes), "tiers": tiers or {}, "heartbeat": time.time(), "ttl": ttl,
+                   "pid": os.getpid()}, f)
+    os.replace(path + ".tmp", path)
+
+
+def unsubscribe(name):
+    try:
+        os.remove(os.path.join(SUB_DIR, f"{name}.json"))
+    except OSError:
+        pass
+
+
+class QuoteBusReader:
+    def __init__(self, name=SHM_NAME):
+        self.shm = _attach_shm(name)
+        self.header, self.slots = _views(self.shm.buf)
+        self._count = -1
+        self._slot_of = {}
+
+    def alive(self):
+        return self.header["magic"][0] == MAGIC and time.time() - float(self.header["heartbeat"][0]) < BUS_TTL
+
+    def read(self, codes, retries=100):
+        """顺序锁读: 只拷贝 codes 对应的槽位"""
+        h = self.header
+        for _ in range(retries):
+            s1 = int(h["seq"][0])
+            if s1 & 1:
+                time.sleep(0)
+                continue
+            n = int(h["count"][0])
+            if n != self._count:
+                self._slot_of = {str(int(c)).zfill(6): i for i, c in enumerate(self.slots["code"][:n])}
+                self._count = n
+            idx = [self._slot_of[c] for c in codes if c in self._slot_of]
+            rows = self.slots[idx]
+            if int(h["seq"][0]) == s1:
+                return rows_to_quotes(rows)
+        return {}
+
+    def close(self):
+        del self.header, self.slots
+        self.shm.close()
+
+
+class BusQuoteSource:
+    """
+    行情源接口 (同 quote_source.SinaQuoteSource)。总线活着就从总线读，
+    总线没起来/挂了，或者刚订阅的代码总线还没来得及拉，就交给 fallback 直接拉。
+    """
+
+    def __init__(self, name, fallback=None, autostart=True, ttl=SUB_TTL):
+        self.name = name
+        self.fallback = fallback
+        self.autostart = autostart
+        self.ttl = ttl
+        self.reader = None
+        self.tiers = {}
+        self._tiers_changed = False
+        self._codes = frozenset()
+        self._sub_ts = 0.0
+        self._changed_ts = 0.0
+        self._last_start = 0.0
+
+    def _ensure_reader(self):
+        if self.reader is not None and self.reader.alive():
+            return True
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+        try:
+            self.reader = QuoteBusReader()
+            if self.reader.alive():
+                return True
+        except (FileNotFoundError, OSError, ValueError):
+            self.reader = None
+        if self.autostart and time.time() - self._last_start > 60:
+            self._last_start = time.time()
+            start_publisher()
+        return False
+
+    def set_tiers(self, tiers):
+        """档位写进订阅文件交给发布进程；兜底行情源如果也分级，一并转给它"""
+        tiers = dict(tiers)
+        if tiers != self.tiers:
+            self.tiers = tiers
+            self._tiers_changed = True
+        if hasattr(self.fallback, "set_tiers"):
+            self.fallback.set_tiers(tiers)
+
+    def fetch(self, codes):
+        codes = frozenset(codes)
+        now = time.time()
+        changed = codes != self._codes
+        if changed:
+            self._codes = codes
+            self._changed_ts = now
+        if codes and (changed or self._tiers_changed or now - self._sub_ts >= SUB_HEARTBEAT):
+            subscribe(self.name, codes, self.ttl, {c: t for c, t in self.tiers.items() if c in codes})
+            self._sub_ts = now
+            self._tiers_changed = False
+
+        quotes = self.reader.read(codes) if self._ensure_reader() else {}
+        if self.fallback is not None:
+            if not quotes:
+                return self.fallback.fetch(list(codes))
+            missing = [c for c in codes if c not in quotes]
+            if missing and now - self._changed_ts < SUB_GRACE:
+                quotes.update(self.fallback.fetch(missing))
+        return quotes
+
+    def close(self):
+        unsubscribe(self.name)
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+        if self.fallback is not None:
+            self.fallback.close()
+
+
+def peek(name, codes, ttl=600):
+    """一次性读取 (web_monitor 用): 订阅 ttl 秒，总线活着就返回最新快照，否则返回空"""
+    subscribe(name, codes, ttl)
+    try:
+        reader = QuoteBusReader()
+    except (FileNotFoundError, OSError, ValueError):
+        return {}
+    try:
+        return reader.read(codes) if reader.alive() else {}
+    finally:
+        reader.close()
+
+
+if __name__ == "__main__":
+    run_publisher()
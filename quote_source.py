@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+import time
+import bisect
+from datetime import datetime, timedelta
+from sina_quote import fetch_quotes
+
+
+# ==========================================
+# ⏰ 时钟 (实盘用真实时间，回放用虚拟时间)
+# ==========================================
+class RealClock:
+    def now(self):
+        return datetime.now()
+
+    def time(self):
+        return time.time()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+
+class VirtualClock:
+    """
+    回放时钟: sleep 只推进虚拟时间，不真的等待。
+    speed 不为空时按 (虚拟秒 / speed) 真实等待，比如 speed=100 就是 100 倍速。
+    """
+
+    def __init__(self, start, speed=None):
+        self._ts = start.timestamp() if isinstance(start, datetime) else float(start)
+        self.speed = speed
+
+    def now(self):
+        return datetime.fromtimestamp(self._ts)
+
+    def time(self):
+        return self._ts
+
+    def sleep(self, seconds):
+        if seconds <= 0:
+            return
+        if self.speed:
+            time.sleep(seconds / self.speed)
+        self._ts += seconds
+
+    def advance_to(self, dt):
+        ts = dt.timestamp() if isinstance(dt, datetime) else float(dt)
+        self._ts = max(self._ts, ts)
+
+
+# ==========================================
+# 📡 行情源 (统一接口: fetch(codes) -> {代码: 行情})
+# ==========================================
+class SinaQuoteSource:
+    """实盘: 新浪实时行情"""
+
+    def __init__(self, recorder=None, metrics=None):
+        self.recorder = recorder
+        self.metrics = metrics
+
+    def fetch(self, codes):
+        return fetch_quotes(codes, recorder=self.recorder, metrics=self.metrics)
+
+    def close(self):
+        if self.recorder is not None:
+            self.recorder.close()
+
+
+class ReplayQuoteSource:
+    """
+    回放: 按虚拟时钟返回 "当时" 最新的一帧快照。
+    frames: [(poll_ts, {代码: 行情}), ...]，按时间升序
+    """
+
+    def __init__(self, frames, clock):
+        self.frames = frames
+        self.stamps = [ts for ts, _ in frames]
+        self.clock = clock
+
+    def fetch(self, codes):
+        pos = bisect.bisect_right(self.stamps, self.clock.time()) - 1
+        if pos < 0:
+            return {}
+        quotes = self.frames[pos][1]
+        return {c: dict(quotes[c]) for c in codes if c in quotes}
+
+    def first_ts(self):
+        return self.stamps[0] if self.stamps else None
+
+    def last_ts(self):
+        return self.stamps[-1] if self.stamps else None
+
+    def close(self):
+        pass
+
+    @classmethod
+    def from_recording(cls, day, source, clock, root=None):
+        """读 tick_recorder 录下的某天行情"""
+        import tick_recorder
+        root = root or tick_recorder.TICK_DIR
+        names = tick_recorder.load_names(day, source, root)
+        # 分级轮询下每帧只有当轮拉到的票，按时间累积成完整快照
+        frames, state = [], {}
+        for ts, arr in tick_recorder.iter_frames(day, source, root=root):
+            state.update(tick_recorder.frame_to_quotes(arr, names))
+            frames.append((ts, dict(state)))
+        return cls(frames, clock)
+
+
+# ==========================================
+# 🧪 合成行情 (没有录像时，用日线 OHLC 捏一条盘中路径)
+# ==========================================
+SESSIONS = (("09:30", "11:30"), ("13:00", "15:00"))
+
+
+def session_minutes(day):
+    """某天所有交易分钟的 datetime 列表"""
+    d = datetime.strptime(day, "%Y%m%d")
+    out = []
+    for a, b in SESSIONS:
+        t = datetime.combine(d, datetime.strptime(a, "%H:%M").time())
+        end = datetime.combine(d, datetime.strptime(b, "%H:%M").time())
+        while t <= end:
+            out.append(t)
+            t += timedelta(minutes=1)
+    return out
+
+
+def _intraday_path(o, h, l, c, n):
+    """开 -> 低 -> 高 -> 收 (阳线) 或 开 -> 高 -> 低 -> 收 (阴线)，分段线性插值"""
+    legs = [o, l, h, c] if c >= o else [o, h, l, c]
+    path = []
+    per_leg = max(n // 3, 1)
+    for a, b in zip(legs[:-1], legs[1:]):
+        path.extend(a + (b - a) * k / per_leg for k in range(per_leg))
+    path.append(c)
+    path = (path + [c] * n)[:n]
+    return path
+
+
+def synthetic_frames(day, bars, names=None):
+    """
+    bars: {代码: (昨收, 开, 高, 低, 收)}
+    每个交易分钟生成一帧，返回 ReplayQuoteSource 可用的 frames
+    """
+    names = names or {}
+    minutes = session_minutes(day)
+    paths = {code: _intraday_path(o, h, l, c, len(minutes)) for code, (pc, o, h, l, c) in bars.items()}
+    hi = {code: o for code, (pc, o, h, l, c) in bars.items()}
+    lo = dict(hi)
+    frames = []
+    for i, t in enumerate(minutes):
+        quotes = {}
+        for code, (pc, o, h, l, c) in bars.items():
+            price = paths[code][i]
+            hi[code], lo[code] = max(hi[code], price), min(lo[code], price)
+            quotes[code] = {
+                'name': names.get(code, code), 'price': price, 'pct': (price - pc) / pc * 100,
+                'open': o, 'prev_close': pc, 'high': hi[code], 'low': lo[code],
+                'time': t.strftime("%H:%M:%S"),
+            }
+        frames.append((t.timestamp(), quotes))
+    return frames
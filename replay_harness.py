@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import time
+import shutil
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from quote_source import VirtualClock, ReplayQuoteSource, synthetic_frames, session_minutes
+import tick_recorder
+from loop_metrics import LoopMetrics
+from trade_ledger import TradeLedger, LEDGER_NAME
+
+# ==========================================
+# 📍 路径防走丢
+# ==========================================
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+# ==========================================
+# ⚙️ 回放配置
+# 用法: python replay_harness.py YYYYMMDD [--radar] [--synthetic] [--ai] [--speed=100]
+#                                         [--watch=名单.csv] [--portfolio=持仓.csv]
+#   默认优先回放 tick_data/ 里录下的当天行情，没有录像 (或指定 --synthetic) 时用日线捏一条盘中路径
+#   --ai    用真实 AI 模型打分 (注意: 模型读的是最新数据，有未来函数)；默认固定给 DEFAULT_SCORE
+#   --speed 限速倍数，不填就是能跑多快跑多快
+# ==========================================
+REPLAY_DIR = "replay_data"  # 回放账户目录，和实盘 paper_trading_data 隔离
+SIGNAL_FILE = "screener_asof.parquet"  # 历史名单 (screener_replay 输出)
+SESSION_START = "09:20"
+SESSION_END = "15:01"
+
+
+def _arg(name, default=None):
+    for a in sys.argv[1:]:
+        if a == name:
+            return True
+        if a.startswith(name + "="):
+            return a.split("=", 1)[1]
+    return default
+
+
+def prepare_watchlist(day, out_dir, watch_file=None):
+    """
+    准备当天盘中要盯的名单 (前一交易日收盘后的选股结果):
+      1. 指定 --watch
+      2. screener_asof.parquet 里前一交易日的名单
+      3. 最新的 N_Rebound_Result_*.csv
+    """
+    if watch_file:
+        return watch_file
+    if os.path.exists(SIGNAL_FILE):
+        from screener_replay import watchlist_for
+        table = pd.read_parquet(SIGNAL_FILE)
+        prev = table.loc[table["date"] < pd.Timestamp(day), "date"]
+        if len(prev):
+            wl = watchlist_for(table, prev.max())
+            path = os.path.join(out_dir, "watchlist.csv")
+            wl.to_csv(path, index=False, encoding='utf_8_sig')
+            print(f"📋 名单来自 {SIGNAL_FILE} ({prev.max().date()}): {len(wl)} 只")
+            return path
+    files = [f for f in os.listdir('.') if f.startswith('N_Rebound_Result') and f.endswith('.csv')]
+    if files:
+        return max(files, key=os.path.getmtime)
+    return None
+
+
+def synthetic_source(day, codes, clock):
+    """用本地日线的 OHLC 合成当天的盘中行情"""
+    from price_panel import load_panel
+    panel = load_panel()
+    t = panel.date_index(day)
+    if t >= len(panel.dates) or panel.dates[t] != np.datetime64(datetime.strptime(day, "%Y%m%d").date()):
+        print(f"❌ 本地日线里没有 {day}")
+        return None
+    bars = {}
+    for code in codes:
+        j = panel.code_pos.get(code)
+        if j is None or np.isnan(panel.open[t, j]) or np.isnan(panel.prev_close[t, j]):
+            continue
+        bars[code] = (float(panel.prev_close[t, j]), float(panel.open[t, j]), float(panel.high[t, j]),
+                      float(panel.low[t, j]), float(panel.close[t, j]))
+    print(f"🧪 合成行情: {len(bars)} 只 × {len(session_minutes(day))} 分钟" if bars else "❌ 名单里的票当天都没有K线")
+    return ReplayQuoteSource(synthetic_frames(day, bars), clock) if bars else None
+
+
+def latency_report(lat):
+    lat = np.asarray(lat) * 1000
+    return {
+        "iterations": int(len(lat)),
+        "p50_ms": float(np.percentile(lat, 50)) if len(lat) else 0.0,
+        "p99_ms": float(np.percentile(lat, 99)) if len(lat) else 0.0,
+        "max_ms": float(lat.max()) if len(lat) else 0.0,
+    }
+
+
+def replay_day(day, radar=False, synthetic=False, use_ai=False, speed=None, watch_file=None, portfolio=None):
+    d = datetime.strptime(day, "%Y%m%d")
+    start = datetime.combine(d, datetime.strptime(SESSION_START, "%H:%M").time())
+    end = datetime.combine(d, datetime.strptime(SESSION_END, "%H:%M").time())
+    clock = VirtualClock(start, speed=speed)
+
+    out_dir = os.path.join(REPLAY_DIR, f"{day}_{'radar' if radar else 'bot'}")
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.makedirs(out_dir)
+    if portfolio:
+        shutil.copy(portfolio, os.path.join(out_dir, "portfolio.csv"))
+
+    watch_file = prepare_watchlist(day, out_dir, watch_file)
+    if watch_file is None:
+        print("❌ 没有可用的选股名单")
+        return None
+
+    # --- 行情源 ---
+    who = "day_radar" if radar else "paper_bot"
+    recorded = os.path.join(tick_recorder.day_dir(day), who + ".ticks")
+    bus = os.path.join(tick_recorder.day_dir(day), "quote_bus.ticks")
+    # 走行情总线时录像在 quote_bus.ticks 里，自己的录像只有总线挂掉时兜底拉的那几帧
+    if os.path.exists(bus) and (not os.path.exists(recorded) or os.path.getsize(bus) > os.path.getsize(recorded)):
+        who, recorded = "quote_bus", bus
+    if not synthetic and os.path.exists(recorded):
+        source = ReplayQuoteSource.from_recording(day, who, clock)
+        print(f"📼 回放录像: {recorded} ({len(source.frames)} 帧)")
+    else:
+        codes = pd.read_csv(watch_file, dtype={"代码": str})["代码"].str.zfill(6).tolist()
+        if portfolio:
+            codes += pd.read_csv(portfolio, dtype={"code": str})["code"].str.zfill(6).tolist()
+        source = synthetic_source(day, sorted(set(codes)), clock)
+        if source is None:
+            return None
+
+    # --- 被测对象 ---
+    alerts = []
+    if radar:
+        from day_radar import StockRadarLite, REFRESH_INTERVAL
+        agent = StockRadarLite(quote_source=source, clock=clock, on_alert=alerts.extend, watch_file=watch_file,
+                               metrics=LoopMetrics("replay_radar", REFRESH_INTERVAL))
+    else:
+        import paper_bot
+        scorer = None if use_ai else (lambda code: paper_bot.DEFAULT_SCORE)
+        agent = paper_bot.PaperTrader(quote_source=source, clock=clock, data_dir=out_dir, scorer=scorer,
+                                      watch_file=watch_file, score_workers=0,  # 同步评分，结果可复现
+                                      record_decisions=True,
+                                      metrics=LoopMetrics("replay_bot", paper_bot.POLL_INTERVAL))
+
+    # --- 主循环: 虚拟时钟驱动 ---
+    lat = []
+    wall = time.perf_counter()
+    try:
+        while clock.time() < end.timestamp():
+            t0 = time.perf_counter()
+            if radar:
+                agent.scan_once()
+                pause = REFRESH_INTERVAL
+            else:
+                pause = agent.run_once()
+            lat.append(time.perf_counter() - t0)
+            clock.sleep(pause)
+        wall = time.perf_counter() - wall
+    finally:
+        agent.close()  # 账本/持仓日志关掉、报警分发队列放完、指标落盘，之后再出报告
+
+    report = latency_report(lat)
+    report["wall_seconds"] = round(wall, 2)
+    report["speedup"] = round((end - start).total_seconds() / max(wall, 1e-9), 1)
+    report["unchanged_pct"] = round(agent.changes.dropped_ratio() * 100, 1)  # 行情没变、被跳过的比例
+    if radar:
+        report["alerts"] = len(alerts)
+        pd.DataFrame(alerts).to_csv(os.path.join(out_dir, "alerts.csv"), index=False, encoding='utf_8_sig')
+    else:
+        decisions = pd.DataFrame(agent.decisions, columns=["time", "code", "pct", "score", "bought"])
+        decisions.to_csv(os.path.join(out_dir, "decisions.csv"), index=False, encoding='utf_8_sig')
+        report["decisions"] = len(decisions)
+        ledger = TradeLedger(os.path.join(out_dir, LEDGER_NAME))
+        trades = ledger.load()
+        ledger.close()
+        trades.to_csv(os.path.join(out_dir, "trades.csv"), index=False, encoding='utf_8_sig')
+        report["trades"] = len(trades)
+        report["score_p50_ms"] = agent.scoring.stats()["p50_ms"]
+
+    print("\n" + "=" * 40)
+    print(f"       🎬 回放报告 {day} ({'雷达' if radar else '交易员'})")
+    print("=" * 40)
+    for k, v in report.items():
+        print(f"{k:>14}: {v:.2f}" if isinstance(v, float) else f"{k:>14}: {v}")
+    print(f"📁 明细: {os.path.abspath(out_dir)} | 分阶段耗时: {os.path.abspath(agent.metrics.path)}")
+    return report
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1].startswith("--"):
+        days = tick_recorder.list_days()
+        target = days[-1] if days else (datetime.now() - timedelta(days=1)).strftime("%Y%m%d")
+    else:
+        target = sys.argv[1]
+    speed = _arg("--speed")
+    replay_day(target, radar=bool(_arg("--radar", False)), synthetic=bool(_arg("--synthetic", False)),
+               use_ai=bool(_arg("--ai", False)), speed=float(speed) if speed else None,
+               watch_file=_arg("--watch"), portfolio=_arg("--portfolio"))
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+from datetime import datetime
+
+# ==========================================
+# 📡 选股结果流
+# 选股每命中一只就追加一行 JSON 到本次运行的 N_Rebound_Result_<运行号>.jsonl (flush + fsync)，
+# 开跑和收尾各原子地改写一次 N_Rebound_Result_LATEST.json 指针:
+#   {"run": 运行号, "log": 结果流文件, "status": running/done/failed, "count": 命中数, "csv": 收尾 CSV}
+# 交易员/雷达每轮只 stat 一下指针和结果流，从上次读到的偏移续读新命中，
+# 晚上跑慢了、早上才跑完的选股也不用重启消费方，更不用扫目录找最新文件。
+# 写了一半的尾行 (崩溃/正在写) 留到下次再读。
+# ==========================================
+RESULT_PREFIX = "N_Rebound_Result"
+LATEST_FILE = f"{RESULT_PREFIX}_LATEST.json"
+
+
+def read_latest():
+    """读指针，没有/写坏了返回 None"""
+    try:
+        with open(LATEST_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class ResultWriter:
+    def __init__(self, fsync=True):
+        self.run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.path = f"{RESULT_PREFIX}_{self.run_id}.jsonl"
+        self.fsync = fsync
+        self.count = 0
+        self._f = open(self.path, "a", encoding="utf-8")
+        self._publish("running")
+
+    def append(self, hit):
+        self._f.write(json.dumps(hit, ensure_ascii=False) + "\n")
+        self._f.flush()
+        if self.fsync:
+            os.fsync(self._f.fileno())
+        self.count += 1
+
+    def finish(self, csv_path=None, status="done"):
+        self._f.close()
+        self._publish(status, csv_path)
+
+    def _publish(self, status, csv_path=None):
+        info = {"run": self.run_id, "log": self.path, "status": status, "count": self.count, "csv": csv_path,
+                "updated": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+        with open(LATEST_FILE + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(info, f, ensure_ascii=False)
+        os.replace(LATEST_FILE + ".tmp", LATEST_FILE)
+
+
+class _Tail:
+    """一轮选股的结果流: 从上次读到的偏移续读完整的行"""
+
+    def __init__(self, info):
+        self.run = info["run"]
+        self.log = info["log"]
+        self.status = info["status"]
+        self.offset = 0
+
+    def read(self):
+        try:
+            size = os.path.getsize(self.log)
+        except OSError:
+            return []
+        if size <= self.offset:
+            return []
+        with open(self.log, "rb") as f:
+            f.seek(self.offset)
+            chunk = f.read(size - self.offset)
+        end = chunk.rfind(b"\n") + 1
+        hits = []
+        for line in chunk[:end].splitlines():
+            try:
+                hits.append(json.loads(line))
+            except ValueError:
+                continue
+        self.offset += end
+        return hits
+
+
+class ResultFollower:
+    """
+    消费方: poll() 返回 (是否换了一轮选股, 新命中列表)；换轮时调用方应作废旧名单。
+    新一轮刚开跑时先不换: 盘中有人点了选股，交易员/雷达照旧盯着上一轮的名单，
+    等新一轮至少出了一个命中 (或者跑完) 才切过去；标成 failed 的一轮永远不切。
+    """
+
+    def __init__(self):
+        self.current = None  # 正在跟随的一轮
+        self.pending = None  # 已经开跑、还没切过去的新一轮 (命中先攒着)
+        self._buffer = []
+        self._mtime = None
+
+    @property
+    def run(self):
+        return self.current.run if self.current else None
+
+    @property
+    def log(self):
+        return self.current.log if self.current else None
+
+    def _on_pointer(self, info):
+        if self.current is not None and info["run"] == self.current.run:
+            self.current.status = info["status"]
+        elif self.pending is not None and info["run"] == self.pending.run:
+            self.pending.status = info["status"]
+        else:
+            self.pending, self._buffer = _Tail(info), []
+        if self.pending is not None and self.pending.status == "failed":
+            print(f"[结果流] 选股 {self.pending.run} 失败，继续使用上一轮名单")
+            self.pending, self._buffer = None, []
+
+    def poll(self):
+        try:
+            mtime = os.stat(LATEST_FILE).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime is not None and mtime != self._mtime:
+            info = read_latest()
+            if info is not None:
+                self._mtime = mtime
+                self._on_pointer(info)
+
+        hits = self.current.read() if self.current is not None else []
+        if self.pending is None:
+            return False, hits
+        self._buffer.extend(self.pending.read())
+        if not self._buffer and self.pending.status != "done":
+            return False, hits
+        self.current, self.pending = self.pending, None
+        hits, self._buffer = self._buffer, []
+        return True, hits
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+
+# ==========================================
+# 🤖 后台 AI 评分池
+# 盘中评分要现场下载日线 (网络 IO)，放在行情主循环里会卡住整轮；
+# 这里把候选票丢给线程池，主循环每轮只收已经完成的结果。
+# workers=0 时在提交线程里同步算完 (回放要求结果可复现)。
+# ==========================================
+SCORE_WORKERS = 4
+LATENCY_WINDOW = 500  # 只保留最近 N 次评分耗时
+
+
+class ScoringPool:
+    def __init__(self, scorer, workers=SCORE_WORKERS):
+        self.scorer = scorer
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ai-score") if workers > 0 else None
+        self.pending = {}  # 代码 -> (future, 提交时刻, 完成时刻 [由评分线程填], 调用方附带的上下文)
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.completed = 0
+        self.failed = 0
+
+    def __contains__(self, code):
+        return code in self.pending
+
+    def depth(self):
+        return len(self.pending)
+
+    def _score(self, code, finished):
+        """在评分线程里跑；完成时刻在结果交给 future 之前记下，耗时不含主循环来取之前的空等"""
+        try:
+            return self.scorer(code)
+        finally:
+            finished.append(time.perf_counter())
+
+    def submit(self, code, context=None):
+        """提交一只票；已经在排队的不重复提交。返回是否提交成功"""
+        if code in self.pending:
+            return False
+        t0 = time.perf_counter()
+        finished = []
+        if self._executor is None:
+            future = Future()
+            try:
+                future.set_result(self._score(code, finished))
+            except Exception as e:
+                future.set_exception(e)
+        else:
+            future = self._executor.submit(self._score, code, finished)
+        self.pending[code] = (future, t0, finished, context)
+        return True
+
+    def drain(self):
+        """取出所有已完成的结果: [(代码, 评分 或 None, 上下文, 耗时秒)]"""
+        done = []
+        for code, (future, t0, finished, context) in list(self.pending.items()):
+            if not future.done():
+                continue
+            del self.pending[code]
+            latency = (finished[0] if finished else time.perf_counter()) - t0  # 被取消的没有完成时刻
+            self.latencies.append(latency)
+            try:
+                score = future.result()
+                self.completed += 1
+            except Exception as e:
+                print(f"\n[!] AI 评分失败 {code}: {e}")
+                score = None
+                self.failed += 1
+            done.append((code, score, context, latency))
+        return done
+
+    def stats(self):
+        lat = sorted(self.latencies)
+        pick = lambda q: lat[min(int(q * len(lat)), len(lat) - 1)] * 1000 if lat else 0.0
+        return {"queue_depth": self.depth(), "completed": self.completed, "failed": self.failed,
+                "p50_ms": pick(0.5), "p99_ms": pick(0.99), "max_ms": lat[-1] * 1000 if lat else 0.0}
+
+    def shutdown(self, wait=False):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
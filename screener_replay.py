@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+from price_panel import load_panel
+
+# ==========================================
+# 📍 路径防走丢
+# ==========================================
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+# ==========================================
+# ⚙️ 选股参数 (必须与 night_screener 保持一致！)
+# ==========================================
+N_DAYS = 7  # 只看最近7天
+VOL_SHRINK_RATIO = 1.2  # 缩量
+UPPER_SHADOW_LIMIT = 0.06  # 上影线
+MAX_POSITION_PCT = 0.6
+ZT_PCT = 9.5  # 涨停判定
+HISTORY_BARS = 60  # 上市不满60根K线的不看 (同时也是位置计算的窗口)
+
+OUTPUT_FILE = "screener_asof.parquet"
+
+
+# ==========================================
+# 🧱 "按K线压实" 的面板
+# 每只股票的有效K线挤到顶部，第 r 行 = 该股票的第 r 根K线；
+# 这样 tail(60)/shift(k) 等逐股票的操作可以整块二维计算，停牌也不会错位。
+# ==========================================
+def pack_panel(panel):
+    """返回 dict: 压实后的数组 + 每格对应的面板日期下标"""
+    T, N = panel.shape
+    valid = ~np.isnan(panel.close)
+    counts = valid.sum(axis=0)
+    P = int(counts.max()) if N else 0
+
+    date_idx = np.full((P, N), -1, dtype=np.int32)
+    packed = {f: np.full((P, N), np.nan, dtype=np.float32) for f in ("open", "high", "low", "close", "volume")}
+    for j in range(N):
+        rows = np.flatnonzero(valid[:, j])
+        n = len(rows)
+        date_idx[:n, j] = rows
+        for f in packed:
+            packed[f][:n, j] = getattr(panel, f)[rows, j]
+
+    c, h, l = packed["close"], packed["high"], packed["low"]
+    pct = np.zeros_like(c)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct[1:] = (c[1:] - c[:-1]) / c[:-1] * 100
+    pct = np.nan_to_num(pct, nan=0.0)
+
+    # 近 60 根K线的位置 (0 ~ 1)
+    high_60 = pd.DataFrame(h).rolling(HISTORY_BARS, min_periods=1).max().values
+    low_60 = pd.DataFrame(l).rolling(HISTORY_BARS, min_periods=1).min().values
+    with np.errstate(divide="ignore", invalid="ignore"):
+        position = np.where(high_60 == low_60, 0, (c - low_60) / (high_60 - low_60)).astype(np.float32)
+        shadow = ((h - c) / c).astype(np.float32)
+
+    # 当天之前(含)已有 60 根K线才参与选股
+    enough = np.zeros((P, N), dtype=np.bool_)
+    enough[HISTORY_BARS - 1:] = True
+    enough &= date_idx >= 0
+
+    packed.update(pct=pct.astype(np.float32), position=position, shadow=shadow, enough=enough, date_idx=date_idx)
+    return packed
+
+
+def screen_packed(pk, vol_shrink, shadow_limit, max_position, n_days=N_DAYS, zt_pct=ZT_PCT):
+    """
+    night_screener.check_stock_sina 的向量化版本 (对每一根K线都当作"最后一天"判断一次)。
+    返回 hit_k: 命中时 = 所用涨停距今的K线数 (1..n_days)，未命中为 0
+    """
+    c, o, v, pct = pk["close"], pk["open"], pk["volume"], pk["pct"]
+    base = pk["enough"] & (pk["position"] <= max_position) & (pk["shadow"] <= shadow_limit)
+
+    hit_k = np.zeros(c.shape, dtype=np.int8)
+    min_close = c.copy()  # 涨停之后(到当天)的最低收盘
+    for k in range(1, n_days + 1):
+        if k >= c.shape[0]:
+            break
+        # 第 r 行看第 r-k 根K线是不是涨停 (越近的涨停越优先，与原代码的倒序遍历一致)
+        cond = (base[k:] & (hit_k[k:] == 0)
+                & (pct[:-k] > zt_pct)
+                & (min_close[k:] >= o[:-k])
+                & (v[k:] <= v[:-k] * vol_shrink))
+        hit_k[k:][cond] = k
+        # min_close[r] 并入 close[r-k]，为下一轮 (k+1) 做准备
+        min_close[k:] = np.fmin(min_close[k:], c[:-k])
+    return hit_k
+
+
+# ==========================================
+# 🔁 历史名单回放
+# ==========================================
+def replay(panel, start=None, end=None, vol_shrink=VOL_SHRINK_RATIO, shadow_limit=UPPER_SHADOW_LIMIT,
+           max_position=MAX_POSITION_PCT, packed=None):
+    """
+    一次性算出 [start, end] 内每个交易日收盘后 night_screener 会选出的名单。
+    只用到当天及以前的K线，不存在未来函数。
+    返回 DataFrame: date, code, close, position, zt_date, zt_lag, pullback
+    """
+    pk = packed if packed is not None else pack_panel(panel)
+    hit_k = screen_packed(pk, vol_shrink, shadow_limit, max_position)
+    rows, cols = np.nonzero(hit_k)
+
+    t_idx = pk["date_idx"][rows, cols]
+    lag = hit_k[rows, cols].astype(np.int64)
+    close = pk["close"][rows, cols]
+    zt_close = pk["close"][rows - lag, cols]
+
+    df = pd.DataFrame({
+        "date": pd.to_datetime(panel.dates[t_idx]),
+        "code": panel.codes[cols],
+        "close": close,
+        "position": pk["position"][rows, cols],
+        "zt_date": pd.to_datetime(panel.dates[pk["date_idx"][rows - lag, cols]]),
+        "zt_lag": lag.astype(np.int8),
+        "pullback": np.round((close - zt_close) / zt_close * 100, 2).astype(np.float32),
+    })
+    if start is not None:
+        df = df[df["date"] >= pd.Timestamp(start)]
+    if end is not None:
+        df = df[df["date"] <= pd.Timestamp(end)]
+    df = df.sort_values(by=["date", "pullback"], ascending=[True, False]).reset_index(drop=True)
+    df["code"] = df["code"].astype("category")
+    return df
+
+
+def watchlist_for(table, date):
+    """取出某一天的名单，列名与 N_Rebound_Result_*.csv 一致"""
+    day = table[table["date"] == pd.Timestamp(date)]
+    return pd.DataFrame({
+        "代码": day["code"].astype(str).values,
+        "最新日期": day["date"].dt.strftime("%Y-%m-%d").values,
+        "现价": day["close"].values,
+        "区间位置": [f"{int(p * 100)}%" for p in day["position"].values],
+        "涨停日期": day["zt_date"].dt.strftime("%Y-%m-%d").values,
+        "回调幅度%": day["pullback"].values,
+    })
+
+
+def main():
+    # 用法: python screener_replay.py [开始日期] [结束日期]
+    start = sys.argv[1] if len(sys.argv) > 1 else None
+    end = sys.argv[2] if len(sys.argv) > 2 else None
+
+    t0 = time.time()
+    panel = load_panel()
+    print(f"🧱 面板: {panel.shape[0]} 天 × {panel.shape[1]} 只")
+
+    table = replay(panel, start, end)
+    table.to_parquet(OUTPUT_FILE, index=False)
+
+    days = table["date"].nunique()
+    print(f"✅ 历史名单回放完成: {days} 个交易日 | {len(table)} 条记录 | 平均每天 {len(table) / max(days, 1):.1f} 只")
+    print(f"💾 结果: {os.path.abspath(OUTPUT_FILE)}")
+    print(f"⏱️ 耗时: {time.time() - t0:.1f} 秒")
+
+
+if __name__ == "__main__":
+    main()
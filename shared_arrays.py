@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+import os
+import numpy as np
+from multiprocessing import shared_memory
+
+# ==========================================
+# 🔗 共享内存数组 (扫参 / 超参搜索的进程池共用)
+# 主进程把大数组拷进共享内存一次，子进程按规格挂载成 numpy 视图，数据与进程数无关、不经 pickle。
+# ==========================================
+
+
+def to_shared(arrays):
+    """把数组拷进共享内存，返回 (句柄列表, 规格字典)；用完由主进程 close + unlink"""
+    handles, specs = [], {}
+    for name, arr in arrays.items():
+        arr = np.ascontiguousarray(arr)
+        shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+        handles.append(shm)
+        specs[name] = (shm.name, arr.shape, arr.dtype.str)
+    return handles, specs
+
+
+def attach(specs):
+    """子进程按规格挂载共享内存，返回 (句柄列表, 数组视图字典)；不拷贝数据"""
+    handles, arrays = [], {}
+    for name, (shm_name, shape, dtype) in specs.items():
+        try:
+            shm = shared_memory.SharedMemory(name=shm_name, track=False)  # Python 3.13+
+        except TypeError:
+            shm = shared_memory.SharedMemory(name=shm_name)
+            if os.name == "posix":
+                # 旧版本挂载也会登记到 resource_tracker，退出时会误删主进程的段
+                from multiprocessing import resource_tracker
+                resource_tracker.unregister(shm._name, "shared_memory")
+        handles.append(shm)
+        arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+    return handles, arrays
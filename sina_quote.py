@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+import time
+import requests
+from stock_universe import to_symbol
+
+# ==========================================
+# 🛡️ 网络配置 (与 WebUI / paper_bot 一致)
+# ==========================================
+PROXY_PORT = "7890"
+PROXIES = {
+    "http": f"http://127.0.0.1:{PROXY_PORT}",
+    "https": f"http://127.0.0.1:{PROXY_PORT}"
+}
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Referer": "https://finance.sina.com.cn",
+    "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8"
+}
+CHUNK_SIZE = 80  # 新浪单次最多查询的代码数
+TIMEOUT = 5
+
+_session = requests.Session()  # 复用 TCP 连接
+
+
+def to_sina_symbol(code):
+    """600519 -> sh600519, 002131 -> sz002131 (规则见 stock_universe.to_symbol)"""
+    return to_symbol(code)
+
+
+def parse_sina_text(text):
+    """
+    解析 hq.sinajs.cn 返回的文本。
+    返回 {6位代码: {'name', 'price', 'pct', 'open', 'prev_close', 'high', 'low', 'volume', 'amount', 'date', 'time'}}
+    """
+    data = {}
+    for line in text.strip().split('\n'):
+        if '="' not in line: continue
+        sina_code = line.split('=')[0].split('_')[-1]
+        data_part = line.split('="')[1].strip('";')
+        if not data_part: continue  # 停牌/无效代码返回空串
+        parts = data_part.split(',')
+        if len(parts) < 4: continue
+
+        try:
+            prev_close = float(parts[2])
+            price = float(parts[3])
+            if prev_close == 0: continue
+
+            quote = {
+                'name': parts[0],
+                'price': price,
+                'pct': (price - prev_close) / prev_close * 100,
+                'open': float(parts[1] or 0),
+                'prev_close': prev_close,
+            }
+            if len(parts) > 31:
+                quote.update({
+                    'high': float(parts[4] or 0),
+                    'low': float(parts[5] or 0),
+                    'volume': float(parts[8] or 0),
+                    'amount': float(parts[9] or 0),
+                    'date': parts[30],
+                    'time': parts[31],
+                })
+        except ValueError:
+            continue
+        data[sina_code[2:]] = quote
+    return data
+
+
+def fetch_quotes(codes, recorder=None, metrics=None):
+    """
+    批量拉取实时行情 (每 80 只一个请求)。
+    recorder: 可选的 TickRecorder，每次轮询的快照会交给它异步落盘。
+    metrics : 可选的 LoopMetrics，分别记录网络请求 (http) 与解析 (parse) 耗时
+    """
+    data = {}
+    symbols = [to_sina_symbol(c) for c in codes]
+
+    for i in range(0, len(symbols), CHUNK_SIZE):
+        chunk = symbols[i:i + CHUNK_SIZE]
+        url = f"http://hq.sinajs.cn/list={','.join(chunk)}"
+        try:
+            t0 = time.perf_counter()
+            # 必须带上 proxies，否则你的环境连不上
+            resp = _session.get(url, headers=HEADERS, proxies=PROXIES, timeout=TIMEOUT)
+            resp.encoding = 'gbk'  # 防止乱码
+            text = resp.text
+            t1 = time.perf_counter()
+            data.update(parse_sina_text(text))
+            if metrics is not None:
+                metrics.observe("http", t1 - t0)
+                metrics.observe("parse", time.perf_counter() - t1)
+        except Exception:
+            # print(f"网络波动: {e}")
+            pass
+
+    if recorder is not None and data:
+        recorder.record(data, time.time())
+    return data
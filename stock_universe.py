@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import time
+import pandas as pd
+from datetime import datetime
+
+# ==========================================
+# 📍 路径防走丢
+# ==========================================
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+# ==========================================
+# 🗂️ 股票池元数据 (全市场名单，每天只拉一次)
+# 名单拉下来后一次性算好: 交易所前缀、新浪代码、板块、涨跌停幅度、是否 ST/退市、上市日期，
+# 存成 stock_universe.parquet；当天再用直接读本地，进程内再按代码建字典 O(1) 查。
+# 采集、选股、行情、看板都从这里取，不再各自拉名单、逐行拼前缀、字符串 contains 过滤。
+# 拉取失败时退回本地旧表 (总比没有强)。
+# ==========================================
+UNIVERSE_FILE = "stock_universe.parquet"
+FALLBACK_RETRY = 600  # 拉取失败用旧名单时，过多少秒再试着拉 (秒)
+
+# 板块涨跌停幅度 (%)；ST 股主板为 5%
+BOARD_LIMITS = {"main": 10.0, "chinext": 20.0, "star": 20.0, "bse": 30.0}
+ST_LIMIT = 5.0
+
+# 上市日期来源 (拉不到就留空，不影响其它列): (akshare 函数, 参数, 代码列, 上市日期列)
+LIST_DATE_SOURCES = [
+    ("stock_info_sh_name_code", {"symbol": "主板A股"}, "证券代码", "上市日期"),
+    ("stock_info_sh_name_code", {"symbol": "科创板"}, "证券代码", "上市日期"),
+    ("stock_info_sz_name_code", {"symbol": "A股列表"}, "A股代码", "A股上市日期"),
+    ("stock_info_bj_name_code", {}, "证券代码", "上市日期"),
+]
+
+COLUMNS = ["code", "name", "prefix", "symbol", "board", "limit_pct", "is_st", "is_delisting", "list_date"]
+
+
+# ==========================================
+# 🧰 代码规则 (不需要名单也能用)
+# ==========================================
+def classify_board(code):
+    """按代码前缀判断板块"""
+    if code.startswith(('688', '689')):
+        return "star"
+    if code.startswith(('300', '301')):
+        return "chinext"
+    if code.startswith(('8', '4', '92')):
+        return "bse"
+    return "main"
+
+
+def exchange_prefix(code):
+    """6 开头上交所，北交所 bj，其余深交所"""
+    if code.startswith('6'):
+        return "sh"
+    if classify_board(code) == "bse":
+        return "bj"
+    return "sz"
+
+
+def to_symbol(code):
+    """600519 -> sh600519, 002131 -> sz002131, 830799 -> bj830799 (新浪/akshare 日线用)"""
+    return exchange_prefix(code) + code
+
+
+# ==========================================
+# 📥 拉取与缓存
+# ==========================================
+def _list_dates():
+    import akshare as ak
+    parts = []
+    for func, kwargs, code_col, date_col in LIST_DATE_SOURCES:
+        try:
+            df = getattr(ak, func)(**kwargs)
+            parts.append(pd.DataFrame({"code": df[code_col].astype(str).str.zfill(6),
+                                       "list_date": pd.to_datetime(df[date_col], errors="coerce")}))
+        except Exception as e:
+            print(f"[名单] 上市日期获取失败 ({func} {kwargs}): {e}")
+    if not parts:
+        return pd.DataFrame(columns=["code", "list_date"])
+    return pd.concat(parts).drop_duplicates("code")
+
+
+def build_universe(names):
+    """names: 含 code/name 两列的名单 -> 带全部元数据列的表"""
+    df = pd.DataFrame({"code": names["code"].astype(str).str.zfill(6), "name": names["name"].astype(str)})
+    df["board"] = df["code"].map(classify_board)
+    df["prefix"] = df["code"].map(exchange_prefix)
+    df["symbol"] = df["prefix"] + df["code"]
+    df["is_st"] = df["name"].str.contains("ST", regex=False)
+    df["is_delisting"] = df["name"].str.contains("退", regex=False)
+    df["limit_pct"] = df["board"].map(BOARD_LIMITS).astype("float32")
+    df.loc[df["is_st"] & (df["board"] == "main"), "limit_pct"] = ST_LIMIT
+    df = df.merge(_list_dates(), on="code", how="left")
+    df["list_date"] = pd.to_datetime(df["list_date"])
+    for col in ("prefix", "board"):
+        df[col] = df[col].astype("category")
+    return df[COLUMNS].reset_index(drop=True)
+
+
+def refresh(path=UNIVERSE_FILE):
+    import akshare as ak
+    print("[名单] 正在拉取全市场股票名单...")
+    df = build_universe(ak.stock_info_a_code_name())
+    df.to_parquet(path + ".tmp", index=False)
+    os.replace(path + ".tmp", path)
+    print(f"[名单] 已更新: {len(df)} 只 (ST {int(df['is_st'].sum())} / 退市整理 {int(df['is_delisting'].sum())})")
+    return df
+
+
+def _fresh(path):
+    return os.path.exists(path) and \
+        datetime.fromtimestamp(os.path.getmtime(path)).date() == datetime.now().date()
+
+
+class StockUniverse:
+    def __init__(self, df):
+        self.df = df
+        self._by_code = {r["code"]: r for r in df.to_dict("records")}
+
+    def __len__(self):
+        return len(self.df)
+
+    def __contains__(self, code):
+        return code in self._by_code
+
+    def get(self, code):
+        """单只股票的元数据字典，不在名单里返回 None"""
+        return self._by_code.get(code)
+
+    def symbol(self, code):
+        row = self._by_code.get(code)
+        return row["symbol"] if row else to_symbol(code)
+
+    def limit_pct(self, code):
+        row = self._by_code.get(code)
+        return row["limit_pct"] if row else BOARD_LIMITS[classify_board(code)]
+
+    def tradable(self, exclude_st=True):
+        """去掉退市整理 (以及默认去掉 ST) 后的名单 (拷贝)"""
+        mask = ~self.df["is_delisting"]
+        if exclude_st:
+            mask &= ~self.df["is_st"]
+        return self.df[mask].reset_index(drop=True)
+
+
+_universe = None  # (日期, StockUniverse, 重试时间)，常驻进程跨天自动换新；重试时间非 None 表示用的是旧名单
+
+
+def get_universe(path=UNIVERSE_FILE):
+    """当天的名单: 进程内缓存 -> 当天的本地表 -> 联网拉取 -> 本地旧表；都没有返回 None"""
+    global _universe
+    today = datetime.now().date()
+    if _universe is not None and _universe[0] == today and (_universe[2] is None or time.time() < _universe[2]):
+        return _universe[1]
+    df, retry_at = None, None
+    if _fresh(path):
+        df = pd.read_parquet(path)
+    else:
+        try:
+            df = refresh(path)
+        except Exception as e:
+            print(f"[名单] 拉取失败: {e}")
+            if os.path.exists(path):
+                print("[名单] 使用本地旧名单")
+                df = pd.read_parquet(path)
+                retry_at = time.time() + FALLBACK_RETRY  # 旧名单只顶一阵子，过会儿再拉
+    if df is None:
+        return None
+    _universe = (today, StockUniverse(df), retry_at)
+    return _universe[1]
+
+
+if __name__ == "__main__":
+    # 用法: python stock_universe.py [--refresh]   (--refresh 不管今天拉没拉过都重新拉)
+    u = StockUniverse(refresh()) if "--refresh" in sys.argv else get_universe()
+    if u is not None:
+        print(u.df.groupby("board", observed=True).agg(只数=("code", "size"), ST=("is_st", "sum")))
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+import os
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# 📍 路径防走丢
+# ==========================================
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+
+# ==========================================
+# 🧮 通用策略评估引擎
+# 入场信号 = 面板上的布尔矩阵，出场规则 = 参数；
+# 所有信号的 T+N 结果一次性用数组算完，不再逐只股票/逐行循环。
+# ==========================================
+def next_valid_index(valid):
+    """nxt[t, j] = 第 j 只股票在 t 之后的下一根有效K线的行号 (没有则为 T)"""
+    T = valid.shape[0]
+    idx = np.where(valid, np.arange(T)[:, None], T)
+    nxt = np.full(valid.shape, T, dtype=np.int64)
+    # 从下往上做累计最小值: 第 t 行取 t+1.. 中最近的有效行
+    nxt[:-1] = np.minimum.accumulate(idx[::-1], axis=0)[::-1][1:]
+    return nxt
+
+
+def pct_change(a, base):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (a - base) / base * 100
+
+
+def gap_pct(panel):
+    """开盘涨幅 (%)，昨收取上一根有效K线"""
+    return pct_change(panel.open, panel.prev_close)
+
+
+def evaluate(panel, entry_mask, entry_price=None, hold=1, target=None, stop=None, exit_at="close",
+             touch_exit=False, min_bars=0):
+    """
+    评估一组入场信号。
+      entry_mask : (T, N) 布尔矩阵，True = 当天按 entry_price 入场
+      entry_price: (T, N) 入场价，默认开盘价
+      hold       : 持有几根K线后评估 (1 = T+1)
+      target     : 胜负线 (%)，出场日最高涨幅 >= target 记为胜
+      stop       : 止损线 (%)，配合 touch_exit 使用
+      exit_at    : 出场日按 "close" / "open" 计收益
+      touch_exit : True 时出场日先判止损再判止盈，触及即按该价成交
+      min_bars   : 股票K线总数少于这个值的不参与 (对应老代码的 len(df) < 20)
+    返回: (trades dict of arrays, stats dict)
+    """
+    o, h, l, c = panel.open, panel.high, panel.low, panel.close
+    if entry_price is None:
+        entry_price = o
+    valid = ~np.isnan(c)
+
+    mask = entry_mask & valid & ~np.isnan(entry_price)
+    if min_bars:
+        mask &= (valid.sum(axis=0) >= min_bars)[None, :]
+
+    # 出场K线: 往后数 hold 根有效K线
+    T = c.shape[0]
+    exit_t = np.broadcast_to(np.arange(T)[:, None], c.shape)
+    nxt = next_valid_index(valid)
+    for _ in range(hold):
+        exit_t = np.take_along_axis(nxt, np.minimum(exit_t, T - 1), axis=0)
+    mask &= exit_t < T
+
+    t_idx, j_idx = np.nonzero(mask)
+    e_t = exit_t[t_idx, j_idx]
+    buy = entry_price[t_idx, j_idx].astype(np.float64)
+
+    max_profit = pct_change(h[e_t, j_idx], buy)
+    min_profit = pct_change(l[e_t, j_idx], buy)
+    exit_price = (c if exit_at == "close" else o)[e_t, j_idx]
+    profit = pct_change(exit_price, buy)
+
+    if touch_exit:
+        if target is not None:
+            profit = np.where(max_profit >= target, target, profit)
+        if stop is not None:
+            profit = np.where(min_profit <= stop, stop, profit)  # 同一天既触止损又触止盈，按止损算
+
+    win = (max_profit >= target) if target is not None else (profit > 0)
+    if touch_exit and stop is not None:
+        win &= ~(min_profit <= stop)
+
+    trades = {
+        "date": panel.dates[t_idx],
+        "code": panel.codes[j_idx],
+        "exit_date": panel.dates[e_t],
+        "entry": buy,
+        "max_profit": max_profit,
+        "min_profit": min_profit,
+        "profit": profit,
+        "win": win.astype(np.int8),
+    }
+    return trades, summarize(trades)
+
+
+def summarize(trades):
+    profit = trades["profit"]
+    n = len(profit)
+    if n == 0:
+        return {"trades": 0}
+    gains = profit[profit > 0].sum()
+    losses = -profit[profit < 0].sum()
+    return {
+        "trades": n,
+        "win_rate": float(trades["win"].mean() * 100),
+        "avg_profit": float(profit.mean()),
+        "median_profit": float(np.median(profit)),
+        "std_profit": float(profit.std()),
+        "profit_factor": float(gains / losses) if losses > 0 else float("inf"),
+    }
+
+
+def trades_frame(trades):
+    """结果数组转 DataFrame (需要落盘或分组统计时再转)"""
+    df = pd.DataFrame(trades)
+    df["date"] = pd.to_datetime(df["date"])
+    df["exit_date"] = pd.to_datetime(df["exit_date"])
+    return df
+
+
+def yearly_stats(trades):
+    """按年份分组统计"""
+    df = trades_frame(trades)
+    g = df.groupby(df["date"].dt.year)
+    return pd.DataFrame({"trades": g.size(), "win_rate": g["win"].mean() * 100, "avg_profit": g["profit"].mean()})
@@ -0,0 +1,353 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import time
+import zlib
+import queue
+import bisect
+import struct
+import threading
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from change_detector import ChangeDetector
+
+# ==========================================
+# 📍 路径防走丢
+# ==========================================
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+# --- ⚙️ 配置 ---
+TICK_DIR = "tick_data"  # tick_data/YYYYMMDD/<来源>.ticks
+FLUSH_INTERVAL = 1.0  # 后台线程最多攒多久落一次盘 (秒)
+MAX_QUEUE = 20000  # 队列满了就丢帧，绝不阻塞轮询线程
+COMPRESS_LEVEL = 3
+
+# ==========================================
+# 📦 文件格式
+# .ticks: 连续的帧，每帧 = 帧头 + zlib(按列拼接的数组)；每帧只含相对上一帧有变化的票
+# .idx  : 每帧一条 (轮询时间戳, 帧在 .ticks 中的偏移)，用于按时间快速定位
+# .names: 代码与名称 (当天第一次出现时追加一行)
+# ==========================================
+MAGIC = b"NRTK"
+FRAME_HEADER = struct.Struct("<4sIdI")  # magic, 行数, 轮询时间戳, 压缩后字节数
+INDEX_ENTRY = struct.Struct("<dQ")  # 轮询时间戳, 偏移
+
+COLUMNS = [
+    ("code", "<i4"),
+    ("quote_time", "<i4"),  # 新浪行情时间，当天零点起的秒数 (-1 = 缺失)
+    ("price", "<f4"),
+    ("prev_close", "<f4"),
+    ("open", "<f4"),
+    ("high", "<f4"),
+    ("low", "<f4"),
+    ("volume", "<f8"),
+    ("amount", "<f8"),
+]
+TICK_DTYPE = np.dtype(COLUMNS)
+
+
+def _quote_seconds(t):
+    """'09:31:05' -> 34265"""
+    try:
+        h, m, s = t.split(':')
+        return int(h) * 3600 + int(m) * 60 + int(s)
+    except Exception:
+        return -1
+
+
+def encode_frame(quotes, poll_ts):
+    """把一次轮询的 {代码: 行情} 编码成一帧二进制"""
+    n = len(quotes)
+    arr = np.zeros(n, dtype=TICK_DTYPE)
+    for i, (code, q) in enumerate(quotes.items()):
+        arr[i] = (int(code), _quote_seconds(q.get('time', '')), q['price'], q.get('prev_close', 0),
+                  q.get('open', 0), q.get('high', 0), q.get('low', 0), q.get('volume', 0), q.get('amount', 0))
+    # 按列存储: 同一列的数值挨在一起，压缩率远高于按行
+    raw = b"".join(np.ascontiguousarray(arr[name]).tobytes() for name, _ in COLUMNS)
+    payload = zlib.compress(raw, COMPRESS_LEVEL)
+    return FRAME_HEADER.pack(MAGIC, n, poll_ts, len(payload)) + payload
+
+
+def decode_payload(n, payload):
+    """帧负载 -> 结构化数组"""
+    raw = zlib.decompress(payload)
+    arr = np.empty(n, dtype=TICK_DTYPE)
+    offset = 0
+    for name, dt in COLUMNS:
+        size = np.dtype(dt).itemsize * n
+        arr[name] = np.frombuffer(raw, dtype=dt, count=n, offset=offset)
+        offset += size
+    return arr
+
+
+def day_dir(day, root=TICK_DIR):
+    return os.path.join(root, day)
+
+
+def _truncate(path, size):
+    if os.path.exists(path) and os.path.getsize(path) > size:
+        with open(path, "r+b") as f:
+            f.truncate(size)
+
+
+def repair_tail(base):
+    """
+    崩溃/掉电后续写前先修尾巴: .ticks 截到最后一个完整帧，.idx 截掉指向被截部分的条目，
+    .names 截到最后一个换行。否则新帧直接接在残帧后面，读的时候从残帧起整天后面的帧都读不到。
+    """
+    end = 0
+    if os.path.exists(base + ".ticks"):
+        size = os.path.getsize(base + ".ticks")
+        with open(base + ".ticks", "rb") as f:
+            while True:
+                head = f.read(FRAME_HEADER.size)
+                if len(head) < FRAME_HEADER.size:
+                    break
+                magic, _, _, payload_size = FRAME_HEADER.unpack(head)
+                if magic != MAGIC or end + FRAME_HEADER.size + payload_size > size:
+                    break
+                end += FRAME_HEADER.size + payload_size
+                f.seek(end)
+        _truncate(base + ".ticks", end)
+
+    if os.path.exists(base + ".idx"):
+        with open(base + ".idx", "rb") as f:
+            raw = f.read()
+        keep = 0
+        for i in range(len(raw) // INDEX_ENTRY.size):
+            if INDEX_ENTRY.unpack_from(raw, i * INDEX_ENTRY.size)[1] >= end:
+                break
+            keep = (i + 1) * INDEX_ENTRY.size
+        _truncate(base + ".idx", keep)
+
+    if os.path.exists(base + ".names"):
+        with open(base + ".names", "rb") as f:
+            raw = f.read()
+        _truncate(base + ".names", raw.rfind(b"\n") + 1)
+
+
+# ==========================================
+# ✍️ 记录器 (轮询线程只负责入队，落盘在后台线程)
+# ==========================================
+class TickRecorder:
+    def __init__(self, source, root=TICK_DIR, flush_interval=FLUSH_INTERVAL, max_queue=MAX_QUEUE):
+        self.source = source
+        self.root = root
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.written = 0
+        self.changes = ChangeDetector()  # 只录有变化的票 (回放时按时间累积还原)
+        self._record_day = None
+        self._day = None
+        self._files = None
+        self._seen = set()
+        self._thread = threading.Thread(target=self._run, name=f"tick-recorder-{source}", daemon=True)
+        self._thread.start()
+
+    def record(self, quotes, poll_ts=None):
+        """只取相对上一帧有变化的票，非阻塞入队 (新字典，调用方后续修改不影响)"""
+        poll_ts = poll_ts or time.time()
+        day = datetime.fromtimestamp(poll_ts).date()
+        if day != self._record_day:  # 每天的文件从完整快照开始
+            self._record_day = day
+            self.changes.reset()
+        quotes = self.changes.diff(quotes)
+        if not quotes:
+            return
+        try:
+            self.queue.put_nowait((poll_ts, quotes))
+        except queue.Full:
+            self.dropped += 1
+            self.changes.reset()  # 这帧的变化没落盘，下一帧重新整帧录，回放累积出的状态才不缺
+
+    def close(self):
+        self.queue.put(None)
+        self._thread.join(timeout=10)
+
+    # --- 后台线程 ---
+    def _open_day(self, day):
+        self._close_files()
+        d = day_dir(day, self.root)
+        os.makedirs(d, exist_ok=True)
+        base = os.path.join(d, self.source)
+        repair_tail(base)
+        self._files = [open(base + ".ticks", "ab"), open(base + ".idx", "ab"),
+                       open(base + ".names", "a", encoding="utf-8")]
+        self._seen = set()
+        if os.path.exists(base + ".names"):
+            with open(base + ".names", "r", encoding="utf-8") as f:
+                self._seen = {line.split(",", 1)[0] for line in f if line.strip()}
+        self._day = day
+
+    def _close_files(self):
+        if self._files:
+            for f in self._files:
+                try:
+                    f.close()
+                except Exception:
+                    pass
+        self._files = None
+
+    def _write(self, poll_ts, quotes):
+        day = datetime.fromtimestamp(poll_ts).strftime("%Y%m%d")
+        if day != self._day:
+            self._open_day(day)
+        ticks, idx, names = self._files
+        idx.write(INDEX_ENTRY.pack(poll_ts, ticks.tell()))
+        ticks.write(encode_frame(quotes, poll_ts))
+        for code, q in quotes.items():
+            if code not in self._seen:
+                self._seen.add(code)
+                names.write(f"{code},{q.get('name', '')}\n")
+        self.written += 1
+
+    def _flush(self):
+        if self._files:
+            for f in self._files:
+                f.flush()
+
+    def _run(self):
+        while True:
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            stop = False
+            batch = [item]
+            # 一次把队列里积压的帧全取出来，合并成一次落盘
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                for entry in batch:
+                    if entry is None:
+                        stop = True
+                        continue
+                    self._write(*entry)
+                self._flush()
+            except Exception as e:
+                print(f"\n[!] 行情记录写盘失败: {e}")
+            if stop:
+                self._close_files()
+                return
+
+
+# ==========================================
+# 📖 读取器 (回放/研究)
+# ==========================================
+def list_days(root=TICK_DIR):
+    if not os.path.exists(root):
+        return []
+    return sorted(d for d in os.listdir(root) if d.isdigit())
+
+
+def list_sources(day, root=TICK_DIR):
+    d = day_dir(day, root)
+    return sorted(f[:-6] for f in os.listdir(d) if f.endswith(".ticks")) if os.path.exists(d) else []
+
+
+def load_names(day, source, root=TICK_DIR):
+    path = os.path.join(day_dir(day, root), source + ".names")
+    names = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if "," in line:
+                    code, name = line.rstrip("\n").split(",", 1)
+                    names[code] = name
+    return names
+
+
+def iter_frames(day, source, start_ts=None, end_ts=None, root=TICK_DIR):
+    """
+    按时间顺序逐帧读出: yield (poll_ts, 结构化数组)。
+    start_ts 借助 .idx 二分定位，不用从头解码。
+    注意帧是增量 (只有相对上一帧变化的票)，从 start_ts 读出的只是这之后的变化，不是完整快照；
+    要还原某时刻的全市场状态必须从当天开头累积 (参考 quote_source.ReplayQuoteSource.from_recording)。
+    """
+    base = os.path.join(day_dir(day, root), source)
+    offset = 0
+    if start_ts is not None and os.path.exists(base + ".idx"):
+        with open(base + ".idx", "rb") as f:
+            raw = f.read()
+        n = len(raw) // INDEX_ENTRY.size
+        entries = [INDEX_ENTRY.unpack_from(raw, i * INDEX_ENTRY.size) for i in range(n)]
+        pos = bisect.bisect_left([e[0] for e in entries], start_ts)
+        if pos >= n:
+            return
+        offset = entries[pos][1]
+
+    with open(base + ".ticks", "rb") as f:
+        f.seek(offset)
+        while True:
+            head = f.read(FRAME_HEADER.size)
+            if len(head) < FRAME_HEADER.size:
+                break
+            magic, n, poll_ts, size = FRAME_HEADER.unpack(head)
+            if magic != MAGIC:
+                break  # 尾部残帧 (掉电时写了一半)
+            payload = f.read(size)
+            if len(payload) < size:
+                break
+            if end_ts is not None and poll_ts > end_ts:
+                break
+            try:
+                arr = decode_payload(n, payload)
+            except (zlib.error, ValueError):
+                break  # 坏帧 (老版本崩溃后接着残帧写的文件)，到此为止
+            yield poll_ts, arr
+
+
+def frame_to_quotes(arr, names=None):
+    """结构化数组 -> 与 sina_quote.fetch_quotes 相同格式的字典"""
+    names = names or {}
+    quotes = {}
+    for row in arr:
+        code = str(int(row["code"])).zfill(6)
+        prev_close = float(row["prev_close"])
+        price = float(row["price"])
+        qt = int(row["quote_time"])
+        quotes[code] = {
+            'name': names.get(code, code), 'price': price,
+            'pct': (price - prev_close) / prev_close * 100 if prev_close else 0.0,
+            'open': float(row["open"]), 'prev_close': prev_close,
+            'high': float(row["high"]), 'low': float(row["low"]),
+            'volume': float(row["volume"]), 'amount': float(row["amount"]),
+            'time': f"{qt // 3600:02d}:{qt // 60 % 60:02d}:{qt % 60:02d}" if qt >= 0 else "",
+        }
+    return quotes
+
+
+def load_day(day, source, root=TICK_DIR):
+    """整天的快照读成一个 DataFrame (研究用)"""
+    parts, stamps = [], []
+    for poll_ts, arr in iter_frames(day, source, root=root):
+        parts.append(arr)
+        stamps.append(np.full(len(arr), poll_ts))
+    if not parts:
+        return pd.DataFrame(columns=["poll_ts"] + [c for c, _ in COLUMNS])
+    df = pd.DataFrame(np.concatenate(parts))
+    df.insert(0, "poll_ts", pd.to_datetime(np.concatenate(stamps), unit="s", utc=True)
+                 .tz_convert("Asia/Shanghai").tz_localize(None))  # 北京时间 (不带时区)
+    df["code"] = df["code"].astype(str).str.zfill(6)
+    return df
+
+
+if __name__ == "__main__":
+    # 用法: python tick_recorder.py [YYYYMMDD] —— 打印某天记录概况
+    days = list_days()
+    if not days:
+        print("❌ 暂无行情记录")
+        sys.exit(0)
+    day = sys.argv[1] if len(sys.argv) > 1 else days[-1]
+    for src in list_sources(day):
+        t0 = time.time()
+        frames = rows = 0
+        for _, arr in iter_frames(day, src):
+            frames += 1
+            rows += len(arr)
+        print(f"📼 {day}/{src}: {frames} 帧 | {rows} 条快照 | 读取耗时 {time.time() - t0:.2f} 秒")
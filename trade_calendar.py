@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import bisect
+from datetime import datetime, date, timedelta
+
+# ==========================================
+# 📍 路径防走丢
+# ==========================================
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+# ==========================================
+# 📅 A 股交易日历
+# 交易日表从新浪 (akshare.tool_trade_date_hist_sina) 拉一次后缓存在本地 CSV，
+# 一周刷新一次；拉不到又没有缓存时退化成 "周一到周五都开市"。
+# ==========================================
+CALENDAR_FILE = "trade_calendar.csv"
+REFRESH_DAYS = 7
+
+# 交易时段: 上午 [09:30, 11:30)，下午 [13:00, 15:00]
+SESSIONS = (((9, 30), (11, 30)), ((13, 0), (15, 0)))
+
+
+def _fetch_trade_dates():
+    import akshare as ak
+    df = ak.tool_trade_date_hist_sina()
+    return sorted({datetime.strptime(str(d)[:10], "%Y-%m-%d").date() for d in df["trade_date"]})
+
+
+def _read_cache(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [datetime.strptime(line.strip(), "%Y-%m-%d").date() for line in f
+                if line.strip() and line[0].isdigit()]
+
+
+def _write_cache(path, dates):
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.write("trade_date\n")
+        f.writelines(f"{d.isoformat()}\n" for d in dates)
+    os.replace(path + ".tmp", path)
+
+
+def load_trade_dates(path=CALENDAR_FILE, refresh_days=REFRESH_DAYS):
+    """优先读本地缓存；缓存过期就尝试刷新，失败继续用旧的。都没有返回 None"""
+    cached = _read_cache(path) if os.path.exists(path) else None
+    stale = cached is None or time.time() - os.path.getmtime(path) > refresh_days * 86400
+    if stale:
+        try:
+            dates = _fetch_trade_dates()
+            if dates:
+                _write_cache(path, dates)
+                return dates
+        except Exception as e:
+            print(f"⚠️ 交易日历刷新失败 ({e})，{'沿用本地缓存' if cached else '按工作日估算'}")
+    return cached
+
+
+class TradingCalendar:
+    def __init__(self, dates=None):
+        self.dates = sorted(dates) if dates else []
+        self._set = set(self.dates)
+        # 表只覆盖到某一天 (通常是年底)，超出范围的日子按工作日算
+        self.last = self.dates[-1] if self.dates else None
+        self.first = self.dates[0] if self.dates else None
+
+    def _covered(self, d):
+        return self.dates and self.first <= d <= self.last
+
+    def is_trading_day(self, d):
+        d = d.date() if isinstance(d, datetime) else d
+        if self._covered(d):
+            return d in self._set
+        return d.weekday() < 5
+
+    def next_trading_day(self, d, include=False):
+        """d 之后 (include=True 时含 d) 的第一个交易日"""
+        d = d.date() if isinstance(d, datetime) else d
+        if not include:
+            d += timedelta(days=1)
+        if self._covered(d):
+            i = bisect.bisect_left(self.dates, d)
+            if i < len(self.dates):
+                return self.dates[i]
+        while not self.is_trading_day(d):
+            d += timedelta(days=1)
+        return d
+
+    def trading_days(self, start, end):
+        """[start, end] 之间的交易日列表 (date)"""
+        start = start.date() if isinstance(start, datetime) else start
+        end = end.date() if isinstance(end, datetime) else end
+        out, d = [], self.next_trading_day(start, include=True)
+        while d <= end:
+            out.append(d)
+            d = self.next_trading_day(d)
+        return out
+
+    def trading_days_between(self, start, end):
+        """(start, end] 之间的交易日个数，即 start 买入到 end 的持有交易日数"""
+        start = start.date() if isinstance(start, datetime) else start
+        end = end.date() if isinstance(end, datetime) else end
+        if end <= start:
+            return 0
+        if self._covered(start) and self._covered(end):
+            return bisect.bisect_right(self.dates, end) - bisect.bisect_right(self.dates, start)
+        n, d = 0, start
+        while d < end:
+            d += timedelta(days=1)
+            n += self.is_trading_day(d)
+        return n
+
+    # --- 盘中时段 ---
+    def is_trading_time(self, now):
+        if not self.is_trading_day(now):
+            return False
+        m = now.hour * 60 + now.minute
+        (a1, b1), (a2, b2) = [(h1 * 60 + m1, h2 * 60 + m2) for (h1, m1), (h2, m2) in SESSIONS]
+        return a1 <= m < b1 or a2 <= m <= b2
+
+    def next_session_start(self, now):
+        """下一个开盘/开午盘的时刻 (已在盘中则返回 now)"""
+        if self.is_trading_time(now):
+            return now
+        d = now.date()
+        if self.is_trading_day(d):
+            for (h, m), _ in SESSIONS:
+                start = datetime.combine(d, datetime.min.time()).replace(hour=h, minute=m)
+                if start > now:
+                    return start
+        d = self.next_trading_day(d)
+        (h, m), _ = SESSIONS[0]
+        return datetime.combine(d, datetime.min.time()).replace(hour=h, minute=m)
+
+
+_calendar = None
+
+
+def get_calendar():
+    """进程内共享一个日历 (第一次调用时加载)"""
+    global _calendar
+    if _calendar is None:
+        _calendar = TradingCalendar(load_trade_dates())
+    return _calendar
+
+
+if __name__ == "__main__":
+    cal = get_calendar()
+    now = datetime.now()
+    print(f"📅 交易日表: {len(cal.dates)} 天 ({cal.first} ~ {cal.last})" if cal.dates else "📅 无交易日表，按工作日估算")
+    print(f"今天{'是' if cal.is_trading_day(now) else '不是'}交易日 | 下一次开盘: {cal.next_session_start(now)}")
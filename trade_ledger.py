@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+import os
+import sqlite3
+import pandas as pd
+
+# ==========================================
+# 📒 成交账本 (SQLite)
+# 每笔成交一行，字段全是结构化的: 盈亏、原因、AI评分、持有天数，卖单通过 buy_id 关联到对应的买单。
+# 老的 trade_history.csv 在第一次打开账本时自动导入。
+# ==========================================
+LEDGER_NAME = "trade_ledger.db"
+LEGACY_CSV_NAME = "trade_history.csv"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trades (
+    id        INTEGER PRIMARY KEY AUTOINCREMENT,
+    time      TEXT    NOT NULL,      -- 成交时间 YYYY-MM-DD HH:MM:SS
+    date      TEXT    NOT NULL,      -- 成交日期 YYYY-MM-DD
+    action    TEXT    NOT NULL,      -- BUY / SELL
+    code      TEXT    NOT NULL,
+    name      TEXT,
+    price     REAL    NOT NULL,
+    amount    INTEGER NOT NULL,
+    score     REAL,                  -- 买入时的 AI 评分
+    reason    TEXT,                  -- 卖出原因: 止盈 / 止损 / 时间到期
+    pnl       REAL,                  -- 卖出盈亏 (元)
+    pnl_pct   REAL,                  -- 卖出盈亏 (%)
+    hold_days INTEGER,
+    buy_id    INTEGER REFERENCES trades(id),  -- 卖单对应的买单
+    info      TEXT                   -- 人看的备注 (与老 CSV 的 info 列一致)
+);
+CREATE INDEX IF NOT EXISTS idx_trades_date ON trades(date);
+CREATE INDEX IF NOT EXISTS idx_trades_code_action ON trades(code, action);
+CREATE INDEX IF NOT EXISTS idx_trades_buy_id ON trades(buy_id);
+"""
+
+COLUMNS = ["id", "time", "date", "action", "code", "name", "price", "amount", "score", "reason", "pnl", "pnl_pct",
+           "hold_days", "buy_id", "info"]
+
+
+def _reason_kind(text):
+    """'止盈(8.2%)' -> '止盈'"""
+    for kind in ("止盈", "止损", "时间到期"):
+        if isinstance(text, str) and text.startswith(kind):
+            return kind
+    return text
+
+
+def read_since(path, last_id=0):
+    """只读地取 id > last_id 的新成交 (主键范围查询，代价只和新增条数有关)，给监控面板增量跟随用"""
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=COLUMNS)
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        return pd.read_sql_query("SELECT * FROM trades WHERE id > ? ORDER BY id", conn, params=[int(last_id)])
+    finally:
+        conn.close()
+
+
+class TradeLedger:
+    def __init__(self, path, legacy_csv=None):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        if legacy_csv is None:
+            legacy_csv = os.path.join(os.path.dirname(path), LEGACY_CSV_NAME)
+        if os.path.exists(legacy_csv) and self.count() == 0:
+            n = self.import_csv(legacy_csv)
+            print(f"📒 已从 {legacy_csv} 导入 {n} 条历史成交")
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM trades").fetchone()[0]
+
+    def open_buy_id(self, code):
+        """该股票最近一笔还没卖出的买单"""
+        row = self.conn.execute(
+            "SELECT b.id FROM trades b WHERE b.code = ? AND b.action = 'BUY' "
+            "AND NOT EXISTS (SELECT 1 FROM trades s WHERE s.buy_id = b.id) ORDER BY b.id DESC LIMIT 1",
+            (code,)).fetchone()
+        return row[0] if row else None
+
+    def record_buy(self, time, code, name, price, amount, score=None, info=""):
+        with self.conn:
+            cur = self.conn.execute(
+                "INSERT INTO trades (time, date, action, code, name, price, amount, score, info) "
+                "VALUES (?, ?, 'BUY', ?, ?, ?, ?, ?, ?)",
+                (time, time[:10], code, name, float(price), int(amount), score, info))
+        return cur.lastrowid
+
+    def record_sell(self, time, code, name, price, amount, reason, pnl, hold_days=None, buy_price=None, info=""):
+        buy_id = self.open_buy_id(code)
+        if buy_price is None and buy_id is not None:
+            buy_price = self.conn.execute("SELECT price FROM trades WHERE id = ?", (buy_id,)).fetchone()[0]
+        pnl_pct = (float(price) - buy_price) / buy_price * 100 if buy_price else None
+        with self.conn:
+            cur = self.conn.execute(
+                "INSERT INTO trades (time, date, action, code, name, price, amount, reason, pnl, pnl_pct, hold_days, "
+                "buy_id, info) VALUES (?, ?, 'SELL', ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (time, time[:10], code, name, float(price), int(amount), _reason_kind(reason), float(pnl), pnl_pct,
+                 hold_days, buy_id, info))
+        return cur.lastrowid
+
+    def import_csv(self, csv_path):
+        """导入老的 trade_history.csv: 从 info 里一次性解析出评分/原因/盈亏，按先买后卖配对"""
+        df = pd.read_csv(csv_path, dtype={"code": str})
+        if df.empty:
+            return 0
+        df["code"] = df["code"].str.zfill(6)
+        info = df["info"].fillna("").astype(str)
+        df["score"] = pd.to_numeric(info.str.extract(r"AI评分:([-\d.]+)")[0], errors="coerce")
+        df["pnl"] = pd.to_numeric(info.str.extract(r"盈亏:([-\d.]+)")[0], errors="coerce")
+        df["reason"] = info.str.extract(r"^(\S+?)(?:\(|\s|$)")[0].where(df["action"] == "SELL")
+
+        n = 0
+        for r in df.to_dict("records"):
+            if r["action"] == "BUY":
+                self.record_buy(r["time"], r["code"], r["name"], r["price"], r["amount"],
+                                None if pd.isna(r["score"]) else float(r["score"]), r["info"])
+            else:
+                buy_id = self.open_buy_id(r["code"])
+                hold_days = None
+                if buy_id is not None:
+                    buy_date = self.conn.execute("SELECT date FROM trades WHERE id = ?", (buy_id,)).fetchone()[0]
+                    hold_days = (pd.Timestamp(r["time"][:10]) - pd.Timestamp(buy_date)).days
+                self.record_sell(r["time"], r["code"], r["name"], r["price"], r["amount"], r["reason"],
+                                 0.0 if pd.isna(r["pnl"]) else r["pnl"], hold_days, info=r["info"])
+            n += 1
+        return n
+
+    def load(self, start=None, end=None, action=None):
+        """按日期/方向查成交 (走 date 索引)，返回 DataFrame"""
+        sql, args = "SELECT * FROM trades WHERE 1=1", []
+        if start is not None:
+            sql += " AND date >= ?"
+            args.append(str(start))
+        if end is not None:
+            sql += " AND date <= ?"
+            args.append(str(end))
+        if action is not None:
+            sql += " AND action = ?"
+            args.append(action)
+        return pd.read_sql_query(sql + " ORDER BY id", self.conn, params=args)
+
+    def round_trips(self):
+        """买卖配对后的完整交易 (未卖出的 sell_* 为空)"""
+        return pd.read_sql_query(
+            "SELECT b.id AS buy_id, b.code, b.name, b.date AS buy_date, b.price AS buy_price, b.amount, b.score, "
+            "s.date AS sell_date, s.price AS sell_price, s.reason, s.pnl, s.pnl_pct, s.hold_days "
+            "FROM trades b LEFT JOIN trades s ON s.buy_id = b.id WHERE b.action = 'BUY' ORDER BY b.id",
+            self.conn)
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+
+# ==========================================
+# ⚖️ 交易规则 (唯一出处)
+# 模拟盘 (paper_bot)、日线回测 (backtest)、复盘 (paper_review) 和看板 (web_monitor) 都从这里取，
+# 调参只改这一处，回测不会和实盘悄悄走偏。
+# ==========================================
+# 资金
+INIT_CASH = 100000  # 初始本金 (复盘/看板按它算总收益率)
+SINGLE_POS_CASH = 5000  # 单笔买入金额
+
+# 卖出
+TAKE_PROFIT = 0.08
+STOP_LOSS = -0.05
+MAX_HOLD_DAYS = 5  # 按交易日计 (节假日不算)
+
+# 买入
+AI_COEFF = 1.1
+BUY_THRESHOLD = 0.55  # 评分/100 × AI_COEFF 不低于它才买
+DEFAULT_SCORE = 65  # 没有 AI 模型/评分时的默认分
+TRIGGER_PCT = 0.1  # 盘中涨幅进入 [TRIGGER_PCT, SKIP_HIGH_OPEN] (%) 的黄金窗口才考虑买
+SKIP_HIGH_OPEN = 1.5
+
+# 模拟盘账户目录 (持仓日志/快照、成交账本)
+PAPER_DATA_DIR = "paper_trading_data"
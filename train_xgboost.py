@@ -1,11 +1,20 @@
 # -*- coding: utf-8 -*-
 import os
+import sys
+import time
+import random
+import itertools
 import pandas as pd
 import numpy as np
 import xgboost as xgb
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import precision_score, recall_score, accuracy_score
 import joblib
+import tempfile
+from artifact_cache import ArtifactCache, dir_version, file_md5, read_meta, restore
+from shared_arrays import to_shared, attach
 
 # ==========================================
 # 📍 路径
@@ -16,6 +25,36 @@ DATA_INDEX = "n_rebound_dataset.csv"
 RAW_DATA_DIR = "training_data"
 MODEL_SAVE_PATH = "n_rebound_xgb.model"
 
+# 特征与模型参数 (同时也是产物缓存的键)
+FEATURE_NAMES = ['5日涨幅', '10日涨幅', '30日涨幅', '波动率', '量比', '偏离MA5', '偏离MA20']
+FEATURE_VERSION = 1  # 改了 load_data_fast 里的特征构造就 +1，旧的特征矩阵缓存自动作废
+MODEL_PARAMS = {"n_estimators": 500, "max_depth": 5, "learning_rate": 0.05,
+                "subsample": 0.8, "colsample_bytree": 0.8}
+USE_CACHE = "--no-cache" not in sys.argv  # 加 --no-cache 强制重新构造特征并重训
+
+# ==========================================
+# 🔍 超参搜索配置 (python train_xgboost.py --search)
+# ==========================================
+SEARCH_MODE = "--search" in sys.argv
+SEARCH_STRATEGY = "grid"  # grid = 全网格 / random = 随机抽样
+SEARCH_RANDOM_TRIALS = 40  # random 模式下抽多少组
+SEARCH_WORKERS = max(1, (os.cpu_count() or 2) // 2)  # 进程数
+SEARCH_SEED = 42
+LEADERBOARD_FILE = "xgb_search_leaderboard.csv"
+MAX_BIN = 256  # 量化分箱数 (QuantileDMatrix 与训练参数必须一致)
+
+PARAM_GRID = {
+    "n_estimators": [500],
+    "max_depth": [3, 4, 5, 6],
+    "learning_rate": [0.03, 0.05, 0.1],
+    "subsample": [0.7, 0.8, 1.0],
+    "colsample_bytree": [0.7, 0.8, 1.0],
+    "min_child_weight": [1, 5],
+}
+
+# 搜索用的量化 DMatrix: 支持 fork 时主进程构建一次，子进程直接继承 (写时复制，不 pickle、不重复量化)
+_SEARCH_CTX = {}
+
 
 def load_data_fast(csv_path):
     """快速加载并构造特征"""
@@ -98,19 +137,40 @@ def load_data_fast(csv_path):
             continue
 
     print(f"\n✅ 数据准备完毕! 有效样本: {len(X_data)}")
-    feature_names = ['5日涨幅', '10日涨幅', '30日涨幅', '波动率', '量比', '偏离MA5', '偏离MA20']
-    return np.array(X_data), np.array(y_data), feature_names
+    return np.array(X_data), np.array(y_data), FEATURE_NAMES
 
 
-def main():
-    print("🚀 启动 XGBoost 训练 (修复版)")
+def feature_params():
+    return {"features": FEATURE_NAMES, "feature_version": FEATURE_VERSION}
 
-    X, y, feat_names = load_data_fast(DATA_INDEX)
-    if X is None or len(X) == 0:
-        print("❌ 数据加载失败或为空")
-        return
 
-    # 划分数据
+def load_features(csv_path, cache):
+    """
+    特征矩阵走产物缓存: 键 = 特征定义 + (样本表内容, K 线库版本)。
+    返回 (X, y, feat_names, 输入版本)；输入版本同时用作模型缓存的键。
+    """
+    if not os.path.exists(csv_path):
+        print("❌ 找不到数据集索引文件")
+        return None, None, None, None
+    version = f"{file_md5(csv_path)}:{dir_version(RAW_DATA_DIR)}"
+    hit = cache.get("features", feature_params(), version) if USE_CACHE else None
+    if hit is not None:
+        with np.load(os.path.join(hit, "features.npz")) as z:
+            X, y = z["X"], z["y"]
+        print(f"⚡ 特征矩阵缓存命中: {len(X)} 条")
+        return X, y, FEATURE_NAMES, version
+
+    X, y, feat_names = load_data_fast(csv_path)
+    if X is not None and len(X):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "features.npz")
+            np.savez(path, X=X, y=y)
+            cache.put("features", feature_params(), version, {"features.npz": path})
+    return X, y, feat_names, version
+
+
+def split_data(X, y):
+    """划分训练/验证集并计算正样本权重 (训练与搜索共用，保证口径一致)"""
     X_train, X_val, y_train, y_val = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
 
     # 自动计算权重
@@ -118,54 +178,216 @@ def main():
     neg_count = np.sum(y == 0)
     pos_ratio = neg_count / (pos_count + 1e-6)
     print(f"⚖️ 正负样本比例: 1:{neg_count / pos_count:.2f} | scale_pos_weight: {pos_ratio:.2f}")
+    return X_train, X_val, y_train, y_val, pos_ratio
 
-    # --- 🔥 核心修复 ---
-    model = xgb.XGBClassifier(
-        n_estimators=500,
-        max_depth=5,
-        learning_rate=0.05,
-        subsample=0.8,
-        colsample_bytree=0.8,
-        scale_pos_weight=pos_ratio,
-        eval_metric='logloss',
-        early_stopping_rounds=50,  # 👈 移到这里了
-        n_jobs=-1
-    )
 
-    print("\n🌲 开始种树 (Training)...")
-    model.fit(
-        X_train, y_train,
-        eval_set=[(X_val, y_val)],
-        verbose=False
-        # fit 函数里不需要 early_stopping_rounds 了
+# ==========================================
+# 🔍 超参搜索 (进程池 + 共享一次性加载的数据)
+# ==========================================
+def build_param_list():
+    """根据 SEARCH_STRATEGY 生成待评估的参数组合"""
+    keys = list(PARAM_GRID.keys())
+    combos = [dict(zip(keys, values)) for values in itertools.product(*PARAM_GRID.values())]
+    if SEARCH_STRATEGY == "random" and len(combos) > SEARCH_RANDOM_TRIALS:
+        combos = random.Random(SEARCH_SEED).sample(combos, SEARCH_RANDOM_TRIALS)
+    return combos
+
+
+def _build_search_matrices(X_train, y_train, X_val, y_val, nthread):
+    dtrain = xgb.QuantileDMatrix(X_train, label=y_train, max_bin=MAX_BIN, nthread=nthread)
+    dval = xgb.QuantileDMatrix(X_val, label=y_val, ref=dtrain, nthread=nthread)
+    return dtrain, dval
+
+
+def _init_search_worker(specs, pos_ratio, nthread):
+    """
+    子进程初始化。fork 出来的进程已经继承了主进程建好的 DMatrix，只需记下线程数；
+    不支持 fork 的平台 (Windows) 从共享内存挂载特征矩阵，在本进程量化一次 (数据本身仍只有一份)。
+    """
+    if "dtrain" not in _SEARCH_CTX:
+        handles, arrays = attach(specs)
+        dtrain, dval = _build_search_matrices(arrays["X_train"], arrays["y_train"], arrays["X_val"],
+                                              arrays["y_val"], nthread)
+        _SEARCH_CTX.update(handles=handles, dtrain=dtrain, dval=dval, y_val=arrays["y_val"])
+    _SEARCH_CTX.update(pos_ratio=pos_ratio, nthread=nthread)
+
+
+def _run_trial(params):
+    """在子进程中评估一组参数，返回排行榜的一行"""
+    ctx = _SEARCH_CTX
+    start = time.time()
+
+    train_params = {
+        "objective": "binary:logistic",
+        "eval_metric": "logloss",
+        "tree_method": "hist",
+        "max_bin": MAX_BIN,
+        "max_depth": params["max_depth"],
+        "learning_rate": params["learning_rate"],
+        "subsample": params["subsample"],
+        "colsample_bytree": params["colsample_bytree"],
+        "min_child_weight": params["min_child_weight"],
+        "scale_pos_weight": ctx["pos_ratio"],
+        "nthread": ctx["nthread"],  # 👈 限制单进程线程数，防止超卖 CPU
+        "seed": SEARCH_SEED,
+    }
+    evals_result = {}
+    booster = xgb.train(
+        train_params, ctx["dtrain"],
+        num_boost_round=params["n_estimators"],
+        evals=[(ctx["dval"], "val")],
+        early_stopping_rounds=50,
+        evals_result=evals_result,
+        verbose_eval=False
     )
 
-    # 验证
-    preds = model.predict(X_val)
-    precision = precision_score(y_val, preds, zero_division=0)
-    recall = recall_score(y_val, preds, zero_division=0)
-    acc = accuracy_score(y_val, preds)
+    best_iter = booster.best_iteration
+    probs = booster.predict(ctx["dval"], iteration_range=(0, best_iter + 1))
+    preds = (probs > 0.5).astype(int)
+    y_val = ctx["y_val"]
+
+    row = dict(params)
+    row.update({
+        "precision": precision_score(y_val, preds, zero_division=0),
+        "recall": recall_score(y_val, preds, zero_division=0),
+        "accuracy": accuracy_score(y_val, preds),
+        "logloss": evals_result["val"]["logloss"][best_iter],
+        "best_iteration": best_iter,
+        "seconds": round(time.time() - start, 2),
+    })
+    return row
+
+
+def run_search(X, y):
+    """超参搜索主流程: 数据只加载/划分一次，参数组合分发到进程池"""
+    X_train, X_val, y_train, y_val, pos_ratio = split_data(X, y)
+    param_list = build_param_list()
+
+    workers = max(1, min(SEARCH_WORKERS, len(param_list)))
+    # 总线程数 = 进程数 × 单进程线程数 <= CPU 核数
+    nthread = max(1, (os.cpu_count() or 1) // workers)
+    print(f"\n🔍 超参搜索: {len(param_list)} 组 ({SEARCH_STRATEGY}) | {workers} 进程 × {nthread} 线程")
+
+    rows = []
+    start = time.time()
+    handles, specs = [], None
+    if "fork" in mp.get_all_start_methods():
+        # 主进程单线程量化: 不在 fork 之前拉起 OpenMP 线程池，子进程里多线程训练才安全
+        dtrain, dval = _build_search_matrices(X_train, y_train, X_val, y_val, nthread=1)
+        _SEARCH_CTX.update(dtrain=dtrain, dval=dval, y_val=y_val)
+        ctx = mp.get_context("fork")
+        print("🔗 量化 DMatrix 已在主进程构建，子进程 fork 继承")
+    else:
+        handles, specs = to_shared({"X_train": X_train, "y_train": y_train, "X_val": X_val, "y_val": y_val})
+        ctx = None
+        print(f"🔗 共享内存: {sum(h.size for h in handles) / 1024 ** 2:.0f} MB (与进程数无关)")
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_search_worker,
+                                 initargs=(specs, pos_ratio, nthread)) as executor:
+            futures = [executor.submit(_run_trial, p) for p in param_list]
+            for future in as_completed(futures):
+                try:
+                    rows.append(future.result())
+                except Exception as e:
+                    print(f"\n   [!] 试验失败: {e}")
+                print(f"\r   进度: {len(rows)}/{len(param_list)}", end="")
+    finally:
+        _SEARCH_CTX.clear()
+        for h in handles:
+            h.close()
+            h.unlink()
+
+    if not rows:
+        print("\n❌ 所有试验均失败")
+        return
 
+    board = pd.DataFrame(rows).sort_values(by=["precision", "logloss"], ascending=[False, True])
+    board.to_csv(LEADERBOARD_FILE, index=False, encoding='utf_8_sig')
+
+    print(f"\n\n🏁 搜索完成！耗时 {(time.time() - start) / 60:.1f} 分钟")
+    print(f"💾 排行榜: {os.path.abspath(LEADERBOARD_FILE)}")
+    print("\n🏆 Top 5:")
+    print(board.head(5).to_string(index=False))
+
+
+def print_report(metrics, feat_names):
     print("\n" + "=" * 40)
     print("       🏆 最终战报 (XGBoost)")
     print("=" * 40)
-    print(f"✅ 查准率 (Precision): {precision * 100:.2f}%")
-    print(f"🎯 召回率 (Recall):    {recall * 100:.2f}%")
-    print(f"📊 准确率 (Accuracy):  {acc * 100:.2f}%")
+    print(f"✅ 查准率 (Precision): {metrics['precision'] * 100:.2f}%")
+    print(f"🎯 召回率 (Recall):    {metrics['recall'] * 100:.2f}%")
+    print(f"📊 准确率 (Accuracy):  {metrics['accuracy'] * 100:.2f}%")
 
     # 特征重要性
     print("\n🔍 AI 最看重什么指标?")
     print("-" * 40)
-    importance = model.feature_importances_
+    importance = metrics["importance"]
     indices = np.argsort(importance)[::-1]
 
-    for f in range(X.shape[1]):
+    for f in range(len(importance)):
         print(f"{f + 1}. {feat_names[indices[f]]:<10} : {importance[indices[f]]:.4f}")
     print("-" * 40)
 
+
+def main():
+    print("🚀 启动 XGBoost 训练 (修复版)")
+
+    cache = ArtifactCache()
+    X, y, feat_names, version = load_features(DATA_INDEX, cache)
+    if X is None or len(X) == 0:
+        print("❌ 数据加载失败或为空")
+        return
+
+    if SEARCH_MODE:
+        run_search(X, y)
+        return
+
+    # 同一份特征 + 同一组模型参数训过就直接还原 (划分方式固定 random_state=42，结果可复现)
+    model_params = {**feature_params(), "model": MODEL_PARAMS}
+    hit = cache.get("model", model_params, version) if USE_CACHE else None
+    if hit is not None:
+        metrics = read_meta(hit)
+        print("⚡ 模型缓存命中，跳过训练")
+    else:
+        # 划分数据
+        X_train, X_val, y_train, y_val, pos_ratio = split_data(X, y)
+
+        # --- 🔥 核心修复 ---
+        model = xgb.XGBClassifier(
+            **MODEL_PARAMS,
+            scale_pos_weight=pos_ratio,
+            eval_metric='logloss',
+            early_stopping_rounds=50,  # 👈 移到这里了
+            n_jobs=-1
+        )
+
+        print("\n🌲 开始种树 (Training)...")
+        model.fit(
+            X_train, y_train,
+            eval_set=[(X_val, y_val)],
+            verbose=False
+            # fit 函数里不需要 early_stopping_rounds 了
+        )
+
+        # 验证
+        preds = model.predict(X_val)
+        metrics = {
+            "precision": float(precision_score(y_val, preds, zero_division=0)),
+            "recall": float(recall_score(y_val, preds, zero_division=0)),
+            "accuracy": float(accuracy_score(y_val, preds)),
+            "importance": [float(v) for v in model.feature_importances_],
+        }
+        # 不管效果好坏都存档，下次同参数不用再训一遍才知道不行
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "model")
+            joblib.dump(model, path)
+            hit = cache.put("model", model_params, version, {"model": path}, meta=metrics)
+
+    print_report(metrics, feat_names)
+
     # 保存
-    if precision > 0.5:
-        joblib.dump(model, MODEL_SAVE_PATH)
+    if metrics["precision"] > 0.5:
+        restore(hit, "model", MODEL_SAVE_PATH)
         print(f"💾 模型已保存: {MODEL_SAVE_PATH}")
     else:
         print("⚠️ 查准率不足 50%，模型效果不佳。")
@@ -5,9 +5,18 @@ import os
 import subprocess
 import sys
 import time
+import threading
 import akshare as ak
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
+from loop_metrics import read_metrics
+from pipeline import last_close_day
+from portfolio_store import PortfolioTail, COLUMNS as POSITION_COLUMNS
+from trade_ledger import read_since, LEDGER_NAME
+import nrebound_service
+import quote_bus
+from stock_universe import to_symbol
+from trade_rules import PAPER_DATA_DIR, INIT_CASH as INIT_CAPITAL  # 与 paper_bot / paper_review 同一份
 
 # ==========================================
 # 📍 路径与网络
@@ -17,6 +26,15 @@ PROXY_PORT = "7890"
 os.environ["http_proxy"] = f"http://127.0.0.1:{PROXY_PORT}"
 os.environ["https_proxy"] = f"http://127.0.0.1:{PROXY_PORT}"
 
+# 页面每次点击都会从头跑一遍脚本: 模型/行情连接放 cache_resource，K 线/结果表放 cache_data，
+# 图表和行情两块用 fragment 局部刷新，切换股票只重跑图表那块
+BARS_TTL = 3600  # 日线缓存兜底过期 (秒)；键里带了交易日，收盘后自动换新
+CHART_DAYS = 60
+QUOTE_REFRESH = 5  # 观察池现价刷新间隔 (秒)
+QUOTE_SUB_TTL = 600  # 行情总线订阅有效期 (秒)，页面开着就定期续订
+PORTFOLIO_REFRESH = 3  # 持仓面板刷新间隔 (秒)
+RECENT_TRADES = 20
+
 st.set_page_config(page_title="N-Rebound 指挥中心", layout="wide", page_icon="🦅")
 
 st.markdown("""
@@ -26,14 +44,94 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# 尝试导入 AI
-try:
-    from ai_filter_xgboost import AIFilter
 
-    ai_engine = AIFilter()
-    has_ai = True
-except ImportError:
-    has_ai = False
+# ==========================================
+# 🧠 常驻资源 (整个 streamlit 进程只建一次)
+# ==========================================
+@st.cache_resource(show_spinner="正在加载 AI 模型...")
+def get_ai_engine():
+    try:
+        from ai_filter_xgboost import AIFilter
+        return AIFilter()
+    except ImportError:
+        return None
+
+
+@st.cache_resource
+def get_quote_reader():
+    """行情总线的共享内存只 attach 一次"""
+    try:
+        return quote_bus.QuoteBusReader()
+    except (FileNotFoundError, OSError, ValueError):
+        return None
+
+
+def live_quotes(codes, name="web_monitor"):
+    """从行情总线读最新快照；总线没在跑返回空。订阅只在名单变化或快过期时续一次"""
+    now = time.time()
+    last = st.session_state.get(f"sub_{name}")
+    if last is None or last[0] != codes or now - last[1] > QUOTE_SUB_TTL / 2:
+        quote_bus.subscribe(name, codes, QUOTE_SUB_TTL)
+        st.session_state[f"sub_{name}"] = (codes, now)
+    reader = get_quote_reader()
+    if reader is None or not reader.alive():
+        get_quote_reader.clear()  # 总线没起来或重启过，下次重新 attach
+        return {}
+    return reader.read(codes)
+
+
+class LivePortfolio:
+    """持仓日志 + 成交账本的增量跟随 (整个进程共享一份)；每次刷新只读新增的日志行和成交"""
+
+    def __init__(self, data_dir):
+        self.tail = PortfolioTail(data_dir)
+        self.ledger_path = os.path.join(data_dir, LEDGER_NAME)
+        self.last_id = 0
+        self.realized = 0.0
+        self.daily_realized = {}  # 日期 -> 当日已实现盈亏
+        self.recent = None
+        self.lock = threading.Lock()
+
+    def poll(self):
+        with self.lock:
+            self.tail.poll()
+            new = read_since(self.ledger_path, self.last_id)
+            if len(new):
+                self.last_id = int(new["id"].iloc[-1])
+                sells = new[new["action"] == "SELL"]
+                self.realized += float(sells["pnl"].sum())
+                for day, pnl in sells.groupby("date")["pnl"].sum().items():
+                    self.daily_realized[day] = self.daily_realized.get(day, 0.0) + float(pnl)
+                self.recent = new if self.recent is None else pd.concat([self.recent, new])
+                self.recent = self.recent.tail(RECENT_TRADES)
+            return self.tail.rows(), self.recent
+
+
+@st.cache_resource
+def get_live_portfolio():
+    return LivePortfolio(PAPER_DATA_DIR)
+
+
+@st.cache_data(ttl=BARS_TTL, max_entries=200, show_spinner=False)
+def load_bars(code, trading_day):
+    """近 CHART_DAYS 天前复权日线；trading_day 只用作缓存键 (同一交易日内切换股票不再联网)"""
+    k_df = ak.stock_zh_a_daily(symbol=to_symbol(code), adjust="qfq")
+    if k_df.empty:
+        return k_df
+    k_df['date'] = pd.to_datetime(k_df['date'])
+    return k_df[k_df['date'] > (datetime.now() - timedelta(days=CHART_DAYS))]
+
+
+@st.cache_data(show_spinner=False)
+def read_result(path, mtime):
+    """mtime 只用作缓存键: 文件没被重写就直接用缓存"""
+    df = pd.read_csv(path)
+    df['代码'] = df['代码'].astype(str).str.zfill(6)
+    return df
+
+
+ai_engine = get_ai_engine()
+has_ai = ai_engine is not None
 
 
 # ==========================================
@@ -43,7 +141,9 @@ def run_screener():
     cmd = [sys.executable, "night_screener.py"]
     with st.spinner("正在执行选股..."):
         try:
-            subprocess.run(cmd, capture_output=True, text=True, encoding='gbk', errors='replace')
+            # 常驻服务在跑就交给它 (不用重新 import akshare、拉名单)
+            if nrebound_service.call("screen", wait=True, timeout=3 * 3600) is None:
+                subprocess.run(cmd, capture_output=True, text=True, encoding='gbk', errors='replace')
             st.success("选股完成")
             time.sleep(1)
             st.rerun()
@@ -52,6 +152,9 @@ def run_screener():
 
 
 def run_radar():
+    if nrebound_service.call("radar_start") is not None:
+        st.toast("雷达已启动 (常驻服务)", icon="🚀")
+        return
     python_dir = os.path.dirname(sys.executable)
     pythonw = os.path.join(python_dir, "pythonw.exe")
     if not os.path.exists(pythonw): pythonw = sys.executable
@@ -59,11 +162,28 @@ def run_radar():
     st.toast("雷达已启动", icon="🚀")
 
 
+def stop_radar():
+    if nrebound_service.call("radar_stop", timeout=30) is not None:
+        st.toast("雷达已停止", icon="🛑")
+        return
+    stop_all()
+
+
 def stop_all():
+    nrebound_service.call("shutdown", timeout=30)
     subprocess.run("taskkill /F /IM pythonw.exe /T", shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
     st.toast("已停止后台进程", icon="🛑")
 
 
+def ai_predict(code):
+    """常驻服务里模型是热的，优先问它；服务没在跑再用本进程加载的模型"""
+    resp = nrebound_service.call("score", code=code, timeout=120)
+    if resp is not None and resp.get("ok"):
+        return resp["score"], resp["advice"]
+    score, advice, _ = ai_engine.predict(code)
+    return score, advice
+
+
 def load_result():
     files = [f for f in os.listdir('.') if f.startswith('N_Rebound_Result') and f.endswith('.csv')]
     if not files: return None
@@ -95,7 +215,7 @@ with st.sidebar:
     with col1:
         if st.button("🛡️ 开启雷达"): run_radar()
     with col2:
-        if st.button("🛑 停止雷达"): stop_all()
+        if st.button("🛑 停止雷达"): stop_radar()
 
     # --- 🤖 AI 验股机 (新增) ---
     st.markdown("---")
@@ -105,7 +225,7 @@ with st.sidebar:
         if st.button("🔮 AI 打分"):
             if ai_code and len(ai_code) == 6:
                 with st.spinner("AI 正在读取K线形态..."):
-                    score, advice, _ = ai_engine.predict(ai_code)
+                    score, advice = ai_predict(ai_code)
 
                 if score > 60:
                     st.balloons()
@@ -120,19 +240,55 @@ with st.sidebar:
 # --- 主界面 ---
 st.title("🦅 N-Rebound 指挥中心")
 
-csv_file = load_result()
 
-if csv_file:
-    df = pd.read_csv(csv_file)
-    df['代码'] = df['代码'].astype(str).str.zfill(6)
-
-    st.subheader(f"📊 观察池: {csv_file}")
+@st.fragment(run_every=PORTFOLIO_REFRESH)
+def portfolio_panel():
+    """模拟盘持仓按行情总线现价盯市 (没有现价的按成本价计)"""
+    live = get_live_portfolio()
+    positions, recent = live.poll()
+    if not positions and recent is None:
+        st.caption("暂无模拟盘持仓或成交")
+        return
+
+    pos = pd.DataFrame(positions, columns=POSITION_COLUMNS)
+    quotes = live_quotes(pos['code'].tolist(), "web_monitor_portfolio") if len(pos) else {}
+    pos['现价'] = pos['code'].map(lambda c: quotes[c]['price'] if c in quotes and quotes[c]['price'] > 0 else None)
+    pos['市值'] = pos['现价'].fillna(pos['buy_price']) * pos['amount']
+    pos['浮盈'] = (pos['市值'] - pos['cost']).round(2)
+    pos['浮盈%'] = (pos['浮盈'] / pos['cost'] * 100).round(2)
+
+    unrealized = float(pos['浮盈'].sum())
+    total_asset = INIT_CAPITAL + live.realized + unrealized
+    today = datetime.now().strftime("%Y-%m-%d")
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("总资产", f"{total_asset:,.0f}", f"{(total_asset - INIT_CAPITAL) / INIT_CAPITAL * 100:.2f}%")
+    c2.metric("浮动盈亏", f"{unrealized:,.0f}", f"{len(pos)} 只持仓", delta_color="off")
+    c3.metric("已实现盈亏", f"{live.realized:,.0f}")
+    c4.metric("今日已实现", f"{live.daily_realized.get(today, 0.0):,.0f}")
+
+    if len(pos):
+        st.dataframe(pos, hide_index=True, use_container_width=True)
+    if recent is not None:
+        with st.expander(f"最近 {len(recent)} 笔成交"):
+            st.dataframe(recent[["time", "action", "code", "name", "price", "amount", "reason", "pnl", "pnl_pct"]]
+                         .iloc[::-1], hide_index=True, use_container_width=True)
+
+
+@st.fragment(run_every=QUOTE_REFRESH)
+def quote_panel(df):
+    # 盘中现价直接读行情总线的共享内存 (总线没在跑就不显示)
+    live = live_quotes(df['代码'].tolist())
+    if live:
+        df = df.copy()
+        df['现价'] = df['代码'].map(lambda c: live[c]['price'] if c in live else None)
+        df['涨幅%'] = df['代码'].map(lambda c: round(live[c]['pct'], 2) if c in live else None)
 
     # 交互式表格
     st.dataframe(df, height=300, hide_index=True, use_container_width=True)
 
-    st.divider()
 
+@st.fragment
+def chart_panel(df):
     # 详情分析
     col_list, col_chart = st.columns([1, 3])
 
@@ -146,12 +302,8 @@ if csv_file:
     with col_chart:
         # 画图逻辑
         try:
-            sina_sym = f"sh{sel_code}" if sel_code.startswith('6') else f"sz{sel_code}"
-            k_df = ak.stock_zh_a_daily(symbol=sina_sym, adjust="qfq")
+            k_df = load_bars(sel_code, last_close_day())
             if not k_df.empty:
-                k_df['date'] = pd.to_datetime(k_df['date'])
-                k_df = k_df[k_df['date'] > (datetime.now() - timedelta(days=60))]
-
                 fig = go.Figure(data=[go.Candlestick(x=k_df['date'],
                                                      open=k_df['open'], high=k_df['high'],
                                                      low=k_df['low'], close=k_df['close'])])
@@ -162,11 +314,42 @@ if csv_file:
                 if has_ai:
                     if st.button(f"🔮 让 AI 评价一下 {sel_code}", key="btn_main"):
                         with st.spinner("分析中..."):
-                            score, advice, _ = ai_engine.predict(sel_code)
+                            score, advice = ai_predict(sel_code)
                             st.info(f"AI 评分: **{score}** | 建议: {advice}")
 
         except Exception:
             st.warning("暂无行情数据")
 
+
+st.subheader("💼 模拟盘持仓")
+portfolio_panel()
+st.divider()
+
+csv_file = load_result()
+
+if csv_file:
+    df = read_result(csv_file, os.path.getmtime(csv_file))
+
+    st.subheader(f"📊 观察池: {csv_file}")
+    quote_panel(df)
+
+    st.divider()
+    chart_panel(df)
+
 else:
-    st.info("请点击左侧【立即选股】生成数据。")
\ No newline at end of file
+    st.info("请点击左侧【立即选股】生成数据。")
+
+# --- ⏱️ 盘中循环耗时 (paper_bot / day_radar 每 10 秒落盘一次) ---
+loop_stats = read_metrics()
+if loop_stats:
+    with st.expander("⏱️ 盘中循环耗时 (最近窗口，毫秒)"):
+        for name, snap in loop_stats.items():
+            st.caption(f"{name} | 更新于 {snap['updated']} | 轮数 {snap['loops']} | "
+                       f"超时 {snap['overruns']} 次 (节拍 {snap['budget_s']}s)"
+                       + "".join(f" | {k} {v}" for k, v in snap.get("counters", {}).items()))
+            counters = snap.get("counters", {})
+            if counters.get("quotes_seen"):
+                st.caption(f"行情未变化、跳过评估: {1 - counters['quotes_changed'] / counters['quotes_seen']:.1%}")
+            if snap["recent"]:
+                st.dataframe(pd.DataFrame(snap["recent"]).T[["count", "p50_ms", "p99_ms", "max_ms"]],
+                             use_container_width=True)